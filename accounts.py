@@ -0,0 +1,125 @@
+# accounts.py – varias cuentas spot en un mismo proceso
+# =====================================================================
+"""
+Cada cuenta tiene su propio cliente Binance, ``state_dict``, ``exclusion_dict``
+y, opcionalmente, sus propios stops / tamaño de entrada.  Todo lo demás
+(universo de símbolos, caché de klines, indicadores y escaneo de Fase 1) se
+comparte entre cuentas; sólo las órdenes y la sincronización de balances son
+por cuenta.
+
+Las cuentas extra se leen del entorno::
+
+    BINANCE_API_KEY_<CUENTA>_spot=...
+    BINANCE_API_SECRET_<CUENTA>_spot=...
+    STOP_DELTA_USDT_<CUENTA>=0.8        # opcional, sobrescribe config
+
+Los ajustes que una cuenta no sobrescribe se leen en caliente de *config*,
+así que ``/set`` sigue aplicando a todas ellas.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+import config
+from cooldowns import CooldownStore
+
+# ajustes que una cuenta puede sobrescribir y su tipo
+ACCOUNT_SETTINGS = {
+    "STOP_DELTA_USDT": float,
+    "STOP_ABS_USDT": float,
+    "MIN_ENTRY_USDT": float,
+    "MAX_OPERACIONES_ACTIVAS": int,
+}
+
+PRIMARY = "main"
+_KEY_RE = re.compile(r"^BINANCE_API_KEY_(?P<name>.+)_spot$")
+
+
+@dataclass
+class Account:
+    name: str
+    api_key: Optional[str] = None
+    api_secret: Optional[str] = None
+    state: dict = field(default_factory=dict)
+    exclusion: Optional[CooldownStore] = None     # se crea con el nombre de la cuenta
+    overrides: dict = field(default_factory=dict)
+    _no_balance_until: float = field(default=0.0, repr=False)
+    _client: object = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.exclusion is None:
+            self.exclusion = CooldownStore(self.name)
+
+    @property
+    def primary(self) -> bool:
+        return self.name == PRIMARY
+
+    @property
+    def client(self):
+        """Cliente perezoso; la cuenta principal reutiliza ``config.client``."""
+        if self.primary:
+            return config.get_client()
+        if self._client is None:
+            from binance.client import Client
+            self._client = Client(self.api_key, self.api_secret)
+        return self._client
+
+    @property
+    def no_balance_until(self) -> float:
+        """Fin del cooldown por saldo insuficiente (``config`` en la principal)."""
+        return config.NO_BALANCE_UNTIL if self.primary else self._no_balance_until
+
+    @no_balance_until.setter
+    def no_balance_until(self, ts: float):
+        if self.primary:
+            config.NO_BALANCE_UNTIL = ts
+        else:
+            self._no_balance_until = ts
+
+    @property
+    def tag(self) -> str:
+        """Prefijo para mensajes; vacío en la cuenta principal."""
+        return "" if self.primary else f"[{self.name}] "
+
+    def get(self, key: str):
+        """Valor del ajuste ``key`` para esta cuenta (override o config)."""
+        if key in self.overrides:
+            return self.overrides[key]
+        return getattr(config, key)
+
+
+def setting(account: Optional[Account], key: str):
+    """Atajo para las fases: ``account.get(key)`` o ``config.<key>``."""
+    return account.get(key) if account is not None else getattr(config, key)
+
+
+def _overrides_for(name: str) -> dict:
+    out = {}
+    for key, cast in ACCOUNT_SETTINGS.items():
+        raw = os.getenv(f"{key}_{name}")
+        if raw is None:
+            continue
+        try:
+            out[key] = cast(raw)
+        except ValueError:
+            config.logger.warning(f"[accounts] {key}_{name}={raw!r} no es {cast.__name__}")
+    return out
+
+
+def load_accounts(state_dict: dict, exclusion_dict: CooldownStore) -> list[Account]:
+    """Cuenta principal (con los dicts dados) + cuentas extra del entorno."""
+    accounts = [Account(PRIMARY, config.API_KEY, config.API_SECRET,
+                        state=state_dict, exclusion=exclusion_dict)]
+    for var in sorted(os.environ):
+        m = _KEY_RE.match(var)
+        if not m:
+            continue
+        name = m["name"]
+        secret = os.getenv(f"BINANCE_API_SECRET_{name}_spot")
+        if not secret:
+            config.logger.warning(f"[accounts] {name}: falta BINANCE_API_SECRET_{name}_spot")
+            continue
+        accounts.append(Account(name, os.environ[var], secret,
+                                overrides=_overrides_for(name)))
+    return accounts
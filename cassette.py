@@ -0,0 +1,190 @@
+# cassette.py – grabación y reproducción del tráfico con Binance
+# =====================================================================
+"""
+Para medir optimizaciones con entradas idénticas: se graba cada llamada que
+el bot hace a través de ``config.client`` (método, argumentos, respuesta o
+excepción y duración) en un *cassette* y luego se reproduce sin red.
+
+Variables de entorno (las lee ``config.get_client``)::
+
+    BINANCE_CASSETTE_RECORD=ciclo.cassette.gz     # graba contra Binance real
+    BINANCE_CASSETTE_REPLAY=ciclo.cassette.gz     # reproduce, sin red
+    BINANCE_REPLAY_SPEED=recorded|fast            # latencias grabadas o ya
+
+Formato: JSON por líneas comprimido con gzip; una línea por llamada::
+
+    {"t": 1.234, "dt": 0.087, "m": "get_klines",
+     "a": [], "k": {"symbol": "BTCUSDT", ...}, "r": <respuesta> | "e": {...}}
+
+En reproducción cada ``(método, argumentos)`` se sirve en el orden grabado;
+si el código pide la misma llamada más veces de las grabadas se repite la
+última respuesta, y una llamada nunca grabada lanza :class:`CassetteMiss`.
+
+Resumen de un cassette::
+
+    python cassette.py ciclo.cassette.gz
+"""
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any
+
+
+class CassetteMiss(LookupError):
+    """Llamada que no está en el cassette."""
+
+
+def _key(method: str, args, kwargs) -> str:
+    return json.dumps([method, list(args), kwargs], sort_keys=True, default=str)
+
+
+def _error_payload(exc: Exception) -> dict:
+    return {
+        "type": type(exc).__name__,
+        "code": getattr(exc, "code", None),
+        "status_code": getattr(exc, "status_code", None),
+        "message": getattr(exc, "message", str(exc)),
+    }
+
+
+def _rebuild_error(err: dict) -> Exception:
+    """Reconstruye la excepción grabada (``BinanceAPIException`` si aplica)."""
+    if err.get("type") == "BinanceAPIException":
+        try:
+            from binance.exceptions import BinanceAPIException
+            exc = BinanceAPIException.__new__(BinanceAPIException)
+            Exception.__init__(exc, err["message"])
+            exc.code = err["code"]
+            exc.message = err["message"]
+            exc.status_code = err["status_code"]
+            exc.response = exc.request = None
+            return exc
+        except ImportError:
+            pass
+    return RuntimeError(f"{err.get('type')}: {err.get('message')}")
+
+# ─────────────────────────────────────────────────────────────
+#  Grabación
+# ─────────────────────────────────────────────────────────────
+class RecordingClient:
+    """Envuelve un ``binance.Client`` y graba cada llamada a un método."""
+
+    def __init__(self, client, path: str):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_fh", gzip.open(path, "at", encoding="utf-8"))
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_t0", time.perf_counter())
+        atexit.register(self.close)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def _recorded(*args, **kwargs):
+            start = time.perf_counter()
+            entry: dict[str, Any] = {"m": name, "a": list(args), "k": kwargs}
+            try:
+                entry["r"] = result = attr(*args, **kwargs)
+                return result
+            except Exception as e:
+                entry["e"] = _error_payload(e)
+                raise
+            finally:
+                entry["t"] = round(start - self._t0, 6)
+                entry["dt"] = round(time.perf_counter() - start, 6)
+                line = json.dumps(entry, default=str, separators=(",", ":"))
+                with self._lock:
+                    if not self._fh.closed:
+                        self._fh.write(line + "\n")
+        return _recorded
+
+    def __setattr__(self, name: str, value):
+        setattr(self._client, name, value)          # p. ej. timestamp_offset
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+# ─────────────────────────────────────────────────────────────
+#  Reproducción
+# ─────────────────────────────────────────────────────────────
+def load_cassette(path: str) -> list[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class ReplayClient:
+    """Sirve un cassette como si fuera ``binance.Client`` (sin red).
+
+    ``speed="recorded"`` duerme la duración grabada de cada llamada (las
+    llamadas corren en ``asyncio.to_thread``, así que se emula la latencia);
+    ``speed="fast"`` responde al momento.
+    """
+
+    def __init__(self, path: str, speed: str = "recorded"):
+        self.speed = speed
+        self.timestamp_offset = 0
+        self.misses: Counter = Counter()
+        self.served = 0
+        self._queues: dict[str, deque] = defaultdict(deque)
+        self._last: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        for entry in load_cassette(path):
+            self._queues[_key(entry["m"], entry["a"], entry["k"])].append(entry)
+
+    def _next(self, key: str) -> dict:
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                self._last[key] = entry = queue.popleft()
+            elif key in self._last:
+                entry = self._last[key]           # repetición de la última
+            else:
+                self.misses[key] += 1
+                raise CassetteMiss(key)
+            self.served += 1
+            return entry
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def _replayed(*args, **kwargs):
+            entry = self._next(_key(name, args, kwargs))
+            if self.speed == "recorded":
+                time.sleep(entry["dt"])
+            if "e" in entry:
+                raise _rebuild_error(entry["e"])
+            return entry["r"]
+        return _replayed
+
+    def remaining(self) -> int:
+        """Llamadas grabadas que todavía no se han pedido."""
+        return sum(len(q) for q in self._queues.values())
+
+
+def summary(path: str) -> str:
+    entries = load_cassette(path)
+    if not entries:
+        return "cassette vacío"
+    by_method = Counter(e["m"] for e in entries)
+    busy = defaultdict(float)
+    for e in entries:
+        busy[e["m"]] += e["dt"]
+    span = max(e["t"] + e["dt"] for e in entries)
+    lines = [f"{len(entries)} llamadas en {span:.1f}s"]
+    for m, n in by_method.most_common():
+        lines.append(f"  {m:<24} {n:>6}  {1000 * busy[m] / n:>8.1f} ms/llamada")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(summary(sys.argv[1]) if len(sys.argv) == 2 else __doc__)
@@ -2,28 +2,69 @@
 # =====================================================================
 import os, logging
 from dotenv import load_dotenv
-from binance.client import Client
-from telegram import Bot
 from typing import Optional
 import asyncio
+from event_bus import publish, SettingsChanged
 
 load_dotenv()
 
 # ───── Credenciales ────────────────────────────────────────────────
 API_KEY        = os.getenv("BINANCE_API_KEY")
 API_SECRET     = os.getenv("BINANCE_API_SECRET")
-client         = Client(API_KEY, API_SECRET)
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-telegram_bot   = Bot(token=TELEGRAM_TOKEN)
+
+# klines desde el demonio ``market_data.py`` (memoria compartida) si está activo
+MARKET_DATA_SHM = os.getenv("MARKET_DATA_SHM", "0") == "1"
+# detector de picos de volumen por websocket (``fases/fase0.py``); opt-in
+FASE0_ENABLED = os.getenv("FASE0_ENABLED", "0") == "1"
+
+# ───── Clientes perezosos ──────────────────────────────────────────
+# ``Client(...)`` hace un ping de red y ``Bot`` arrastra telegram/httpx;
+# se construyen en el primer uso (``config.client`` / ``config.telegram_bot``
+# siguen funcionando vía ``__getattr__`` de módulo).
+_client = None
+_telegram_bot = None
+
+# grabación / reproducción del tráfico (ver ``cassette.py``)
+CASSETTE_RECORD = os.getenv("BINANCE_CASSETTE_RECORD")
+CASSETTE_REPLAY = os.getenv("BINANCE_CASSETTE_REPLAY")
+REPLAY_SPEED    = os.getenv("BINANCE_REPLAY_SPEED", "recorded")   # recorded | fast
+
+def get_client():
+    """Devuelve el ``binance.Client`` global, creándolo en el primer uso."""
+    global _client
+    if _client is None:
+        if CASSETTE_REPLAY:
+            from cassette import ReplayClient
+            _client = ReplayClient(CASSETTE_REPLAY, REPLAY_SPEED)
+            return _client
+        from binance.client import Client
+        _client = Client(API_KEY, API_SECRET)
+        if CASSETTE_RECORD:
+            from cassette import RecordingClient
+            _client = RecordingClient(_client, CASSETTE_RECORD)
+    return _client
+
+def get_telegram_bot():
+    """Devuelve el ``telegram.Bot`` global, creándolo en el primer uso."""
+    global _telegram_bot
+    if _telegram_bot is None:
+        from telegram import Bot
+        _telegram_bot = Bot(token=TELEGRAM_TOKEN)
+    return _telegram_bot
+
+def __getattr__(name: str):
+    if name == "client":
+        return get_client()
+    if name == "telegram_bot":
+        return get_telegram_bot()
+    raise AttributeError(f"module 'config' has no attribute {name!r}")
 
 # ───── Logger ───────────────────────────────────────────────────────
-logging.basicConfig(
-    level   = logging.INFO,
-    format  = "%(asctime)s - %(levelname)s - %(message)s",
-    filename= "app.log",
-    filemode= "a")
+# los ficheros (``app.log``, ``events.jsonl``) los instala quien arranca el
+# proceso con ``logging_setup.setup_logging``: importar config no crea nada.
 logger = logging.getLogger(__name__)
 
 # silenciar ruido extra
@@ -47,6 +88,7 @@ LIGHT_MODE               = True          # True → Fase2 sólo entradas
 # ciclo y slots
 CHECK_INTERVAL           = 600            # seg – Fase 2
 SYNC_POS_INTERVAL        = 900            # seg – balance sync
+STOP_WATCH_INTERVAL      = 5              # seg – stops intrabar (precios en bloque)
 NEW_LISTINGS_INTERVAL    = 300            # seg – Fase 0
 INITIAL_PRECANDIDATES_LIMIT = 5
 MAX_TRACKED_COINS        = 20
@@ -57,20 +99,25 @@ INSUFFICIENT_BALANCE_COOLDOWN = 600      # 10 min
 NO_BALANCE_UNTIL = 0.0                   # timestamp; 0 = sin cooldown
 # bloqueo tras venta
 COOLDOWN_HOURS           = 12          # bloqueo post-venta (horas)
+SELL_RETRY_MINUTES       = 15          # pausa antes de reintentar una venta fallida
 # límite de posiciones abiertas simultáneas
 MAX_OPERACIONES_ACTIVAS  = 10
 # EMA / HMA
 EMA_SHORT  = 8
 EMA_LONG   = 24
 MIN_24H_VOL_USDT = 1_000_000
-ETA_MAX_BARS     = 12
+ETA_MAX_BARS     = 12                    # velas del CVD de Fase 1
 RVOL_MIN         = 2.0
-CVD_MIN          = 0
+CVD_MIN          = 0                     # USDT
+# filtros opcionales de Fase 1 (columnas taker de las klines, sin peticiones)
+FILTER_RVOL      = False
+FILTER_CVD       = False
 
 # ───── K-line intervalos ────────────────────────────────────────────
-KLINE_INTERVAL_FASE0 = Client.KLINE_INTERVAL_15MINUTE
-KLINE_INTERVAL_FASE1 = Client.KLINE_INTERVAL_4HOUR
-KLINE_INTERVAL_FASE2 = Client.KLINE_INTERVAL_4HOUR
+# (literales de Binance para no importar ``binance.client`` al cargar config)
+KLINE_INTERVAL_FASE0 = "15m"
+KLINE_INTERVAL_FASE1 = "4h"
+KLINE_INTERVAL_FASE2 = "4h"
 # ─────────────────────────────────────────────────────────────
 #  Ajustes DINÁMICOS (modificables vía Telegram) – Fase 0 y tamaño entrada
 # ─────────────────────────────────────────────────────────────
@@ -116,6 +163,53 @@ def update_max_operaciones_activas(new_val: str) -> Optional[str]:
         return "Debe ser numérico"
     return None
 
+# ------------- ajustes genéricos (API de control) -------------
+_BOOL_TRUE = {"1", "true", "on", "yes", "si", "sí"}
+_BOOL_FALSE = {"0", "false", "off", "no"}
+_SETTINGS_TYPES = {
+    "STOP_DELTA_USDT": float,
+    "STOP_ABS_USDT": float,
+    "MIN_ENTRY_USDT": float,
+    "MAX_OPERACIONES_ACTIVAS": int,
+    "LIGHT_MODE": bool,
+    "DRY_RUN": bool,
+    "RVOL_MIN": float,
+    "CVD_MIN": float,
+    "ETA_MAX_BARS": int,
+    "FILTER_RVOL": bool,
+    "FILTER_CVD": bool,
+}
+
+def update_setting(key: str, value) -> Optional[str]:
+    """Cambia un ajuste global en caliente; ``None`` si OK o mensaje de error.
+
+    ``key`` es el nombre en config (``STOP_DELTA_USDT``…) o
+    ``fase0.<clave>`` para ``FASE0_SETTINGS``.
+    """
+    if key.startswith("fase0."):
+        err = update_fase0_setting(key[6:], str(value))
+        if err is None:
+            publish(SettingsChanged(key=key, value=FASE0_SETTINGS.get(key[6:])))
+        return err
+    cast = _SETTINGS_TYPES.get(key)
+    if cast is None:
+        return f"Clave no válida: {key}"
+    if cast is bool:
+        raw = str(value).lower()
+        if raw not in _BOOL_TRUE | _BOOL_FALSE:
+            return f"{key} debe ser on/off"
+        value = raw in _BOOL_TRUE
+    else:
+        try:
+            value = cast(value)
+        except (TypeError, ValueError):
+            return f"{key} debe ser numérico"
+        if key == "MIN_ENTRY_USDT" and value < 5:
+            return "MIN_ENTRY_USDT debe ser ≥ 5 USDT"
+    globals()[key] = value
+    publish(SettingsChanged(key=key, value=value))
+    return None
+
 # config.py  (al final del archivo)
 
 
@@ -0,0 +1,296 @@
+# control_api.py – API local de control (HTTP sobre asyncio)
+# =====================================================================
+"""
+Servidor HTTP/JSON mínimo servido por el propio event-loop del bot.  Escucha
+en ``127.0.0.1:CONTROL_API_PORT`` o, si se define ``CONTROL_API_SOCKET``, en
+ese socket Unix.  Sustituye al sondeo de ``manual_candidates.txt``.
+
+Rutas::
+
+    GET  /state                 estado completo de todas las cuentas
+    GET  /positions             sólo posiciones COMPRADA*
+    POST /candidates            {"symbols": ["BTC", "ETHUSDT"], "account": "main"}
+    POST /settings              {"STOP_DELTA_USDT": 0.8, "fase0.min_vol": 300000}
+    POST /unblock               {"symbols": ["BTC"], "account": "main"}
+
+Los candidatos se validan contra el universo en caché y se añaden como
+``RESERVADA_PRE`` y se publican como ``CandidateAdded``: Fase 2 los evalúa
+al momento.
+Los ajustes pasan por ``config.update_setting`` y se leen en caliente.
+``/unblock`` levanta bloqueos (venta reciente o fallida) como ``/elimina``,
+en cualquier cuenta.
+
+Seguridad: cualquier proceso del host (o una página web, con un POST
+``text/plain`` entre sitios) puede llegar a ``127.0.0.1``, así que por TCP
+se exige ``CONTROL_API_TOKEN`` (``Authorization: Bearer <token>``), un
+``Host`` local (contra *DNS rebinding*) y ``Content-Type: application/json``
+en los POST.  Sin token definido sólo se sirve el socket Unix, creado con
+permisos ``0600`` (``umask`` durante el ``bind``); si hay token, también se
+exige ahí.  Cada petición debe llegar entera en ``REQUEST_TIMEOUT`` segundos
+con cabeceras de hasta ``MAX_HEADER`` bytes.
+
+Ejemplo::
+
+    curl -s localhost:8765/candidates -H "Authorization: Bearer $CONTROL_API_TOKEN" \
+         -H 'Content-Type: application/json' -d '{"symbols": ["SOL", "ARB"]}'
+"""
+import asyncio
+import hmac
+import json
+import os
+from typing import Optional
+
+import config
+import execution
+from config import logger
+from utils import get_all_usdt_symbols, send_telegram_message
+from event_bus import BUS, CandidateAdded
+from quotes import normalize_symbol
+
+CONTROL_API_HOST = "127.0.0.1"
+CONTROL_API_PORT = int(os.getenv("CONTROL_API_PORT", "8765"))
+CONTROL_API_SOCKET = os.getenv("CONTROL_API_SOCKET")    # ruta de socket Unix
+CONTROL_API_TOKEN = os.getenv("CONTROL_API_TOKEN", "")
+MAX_BODY = 1 << 20
+MAX_HEADER = 16 * 1024          # bytes de línea de petición + cabeceras
+REQUEST_TIMEOUT = 10.0          # seg para recibir la petición entera
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+            404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+            413: "Payload Too Large", 415: "Unsupported Media Type",
+            431: "Request Header Fields Too Large"}
+_LOCAL_HOSTS = {"127.0.0.1", "localhost", "[::1]"}
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+
+def _is_open(rec) -> bool:
+    return isinstance(rec, dict) and str(rec.get("status", "")).startswith("COMPRADA")
+
+
+def _normalize(raw: str) -> str:
+    return normalize_symbol(raw)
+
+
+def _settings_view() -> dict:
+    return {
+        "STOP_DELTA_USDT": config.STOP_DELTA_USDT,
+        "STOP_ABS_USDT": config.STOP_ABS_USDT,
+        "MIN_ENTRY_USDT": config.MIN_ENTRY_USDT,
+        "MAX_OPERACIONES_ACTIVAS": config.MAX_OPERACIONES_ACTIVAS,
+        "LIGHT_MODE": config.LIGHT_MODE,
+        "DRY_RUN": config.DRY_RUN,
+        "FILTER_RVOL": config.FILTER_RVOL,
+        "RVOL_MIN": config.RVOL_MIN,
+        "FILTER_CVD": config.FILTER_CVD,
+        "CVD_MIN": config.CVD_MIN,
+        "ETA_MAX_BARS": config.ETA_MAX_BARS,
+        "FASE0_SETTINGS": config.FASE0_SETTINGS,
+        "paused": not config.PAUSED.is_set(),
+    }
+
+
+class ControlAPI:
+    def __init__(self, accounts: list, unix: bool = False, token: str = CONTROL_API_TOKEN):
+        self.accounts = {a.name: a for a in accounts}
+        self.unix = unix
+        self.token = token
+
+    # ───── rutas ────────────────────────────────────────────────
+    async def state(self, _body):
+        return {
+            "settings": _settings_view(),
+            "accounts": {
+                name: {"state": acc.state, "exclusion": acc.exclusion.snapshot(),
+                       "overrides": acc.overrides}
+                for name, acc in self.accounts.items()
+            },
+        }
+
+    async def positions(self, _body):
+        return {
+            name: {s: r for s, r in acc.state.items() if _is_open(r)}
+            for name, acc in self.accounts.items()
+        }
+
+    async def candidates(self, body: dict):
+        symbols = body.get("symbols")
+        if not isinstance(symbols, list) or not symbols:
+            raise _HTTPError(400, "symbols debe ser una lista no vacía")
+        acc = self.accounts.get(body.get("account", "main"))
+        if acc is None:
+            raise _HTTPError(404, f"cuenta desconocida: {body.get('account')}")
+
+        universe = set(await get_all_usdt_symbols())
+        added, skipped, invalid = [], [], []
+        for raw in symbols:
+            sym = _normalize(raw)
+            if sym not in universe:
+                invalid.append(sym)
+            elif sym in acc.state or acc.exclusion.is_blocked(sym):
+                skipped.append(sym)
+            else:
+                acc.state[sym] = {"status": "RESERVADA_PRE", "manual": True}
+                added.append(sym)
+                BUS.publish(CandidateAdded(account=acc.name, symbol=sym, source="api"))
+
+        if added:
+            txt = f"📥 {acc.tag}Añadidos por API:\n" + "\n".join(added)
+            execution.defer(send_telegram_message(txt))
+            logger.info(txt)
+        return {"added": added, "skipped": skipped, "invalid": invalid}
+
+    async def settings(self, body: dict):
+        if not isinstance(body, dict) or not body:
+            raise _HTTPError(400, "cuerpo JSON con ajustes requerido")
+        errors = {}
+        for key, value in body.items():
+            err = config.update_setting(key, value)
+            if err:
+                errors[key] = err
+            else:
+                logger.info(f"[api] {key} = {value}")
+        return {"settings": _settings_view(), "errors": errors}
+
+    async def unblock(self, body: dict):
+        symbols = body.get("symbols")
+        if not isinstance(symbols, list) or not symbols:
+            raise _HTTPError(400, "symbols debe ser una lista no vacía")
+        acc = self.accounts.get(body.get("account", "main"))
+        if acc is None:
+            raise _HTTPError(404, f"cuenta desconocida: {body.get('account')}")
+        unblocked, missing = [], []
+        for raw in symbols:
+            sym = _normalize(raw)
+            (unblocked if acc.exclusion.unblock(sym) else missing).append(sym)
+        if unblocked:
+            logger.info(f"[api] {acc.tag}desbloqueados: {', '.join(unblocked)}")
+        return {"unblocked": unblocked, "missing": missing}
+
+    _ROUTES = {
+        ("GET", "/state"): state,
+        ("GET", "/positions"): positions,
+        ("POST", "/candidates"): candidates,
+        ("POST", "/settings"): settings,
+        ("POST", "/unblock"): unblock,
+    }
+
+    # ───── HTTP ─────────────────────────────────────────────────
+    def _check(self, method: str, headers: dict[str, str]):
+        """Token, ``Host`` local y JSON en los POST (ver cabecera del módulo)."""
+        if self.token or not self.unix:
+            scheme, _, given = headers.get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(
+                    given.strip().encode(), self.token.encode()):
+                raise _HTTPError(401, "token requerido")
+        if not self.unix:
+            host = headers.get("host", "")
+            host = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+            if host not in _LOCAL_HOSTS:
+                raise _HTTPError(403, f"Host no permitido: {host}")
+        if method == "POST":
+            ctype = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+            if ctype != "application/json":
+                raise _HTTPError(415, "Content-Type debe ser application/json")
+
+    async def _dispatch(self, method: str, path: str, raw: bytes):
+        route = self._ROUTES.get((method, path.split("?", 1)[0]))
+        if route is None:
+            known = {p for _, p in self._ROUTES}
+            raise _HTTPError(405 if path in known else 404, f"{method} {path}")
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise _HTTPError(400, "JSON inválido")
+        return await route(self, body)
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """``(método, ruta, cuerpo)`` con cabeceras limitadas a ``MAX_HEADER`` bytes."""
+        seen = 0
+
+        async def _line() -> bytes:
+            nonlocal seen
+            try:
+                line = await reader.readline()   # el límite del stream corta líneas largas
+            except ValueError:
+                raise _HTTPError(431, "cabeceras demasiado grandes")
+            seen += len(line)
+            if seen > MAX_HEADER:
+                raise _HTTPError(431, "cabeceras demasiado grandes")
+            return line
+
+        request_line = (await _line()).decode("latin-1").split()
+        if len(request_line) < 2:
+            raise _HTTPError(400, "petición vacía")
+        method, path = request_line[0].upper(), request_line[1]
+        headers: dict[str, str] = {}
+        while (line := await _line()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        self._check(method, headers)
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY:
+            raise _HTTPError(413, "cuerpo demasiado grande")
+        raw = await reader.readexactly(length) if length else b""
+        return method, path, raw
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        status, payload = 200, None
+        try:
+            try:                         # un cliente lento u ocioso no retiene la conexión
+                method, path, raw = await asyncio.wait_for(
+                    self._read_request(reader), REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise _HTTPError(408, "petición incompleta")
+            payload = await self._dispatch(method, path, raw)
+        except _HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            logger.exception("[api] error")
+            status, payload = 400, {"error": str(e)}
+
+        data = json.dumps(payload, default=str, ensure_ascii=False).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + data
+        )
+        try:
+            await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve_control_api(accounts: list, socket_path: Optional[str] = None):
+    """Sirve la API hasta ``/apagar``."""
+    socket_path = socket_path or CONTROL_API_SOCKET
+    api = ControlAPI(accounts, unix=bool(socket_path))
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        old = os.umask(0o177)            # nace 0600: sin ventana antes del chmod
+        try:
+            server = await asyncio.start_unix_server(api.handle, path=socket_path,
+                                                     limit=MAX_HEADER)
+        finally:
+            os.umask(old)
+        os.chmod(socket_path, 0o600)               # sólo el usuario del bot
+        where = socket_path
+    elif not api.token:
+        logger.warning("[api] CONTROL_API_TOKEN vacío: API de control TCP desactivada")
+        await config.SHUTTING_DOWN.wait()
+        return
+    else:
+        server = await asyncio.start_server(api.handle, CONTROL_API_HOST, CONTROL_API_PORT,
+                                            limit=MAX_HEADER)
+        where = f"{CONTROL_API_HOST}:{CONTROL_API_PORT}"
+    logger.info(f"[api] control escuchando en {where}")
+    async with server:
+        await config.SHUTTING_DOWN.wait()
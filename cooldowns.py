@@ -0,0 +1,214 @@
+# cooldowns.py – bloqueos por símbolo con vencimiento (cooldowns)
+# =====================================================================
+"""
+Sustituye al antiguo ``exclusion_dict`` (mezcla de ``True`` y fechas ISO que
+se parseaban en cada consulta y sólo se limpiaban al consultarlas):
+
+* cada bloqueo es un :class:`Block` con vencimiento en epoch
+  (``math.inf`` = hasta ``/elimina``) y un motivo; una venta fallida
+  bloquea ``SELL_RETRY_MINUTES`` y luego el motor la reintenta;
+* :meth:`CooldownStore.is_blocked` es una búsqueda en dict más una
+  comparación de floats, la misma para todas las fases;
+* un montículo (``heapq``) ordena los vencimientos: :meth:`CooldownStore.reap`
+  quita los vencidos en O(log n) cada uno y :func:`run_reaper` lo llama en
+  segundo plano;
+* los bloqueos se guardan en ``COOLDOWN_FILE`` (JSON, escritura atómica)
+  en cuanto cambian y se recuperan al arrancar, así un reinicio no libera
+  un símbolo recién vendido.  Un cambio sólo cuenta como guardado cuando la
+  escritura terminó bien; si falla, se reintenta en la pasada siguiente.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import lanes
+from config import logger, SHUTTING_DOWN
+
+COOLDOWN_FILE = os.getenv("COOLDOWN_FILE", "cooldowns.json")
+REAP_INTERVAL = 60               # seg entre pasadas del reaper
+
+# motivos
+SOLD = "venta"                   # bloqueo post-venta (COOLDOWN_HOURS)
+SELL_FAILED = "venta fallida"    # pausa los reintentos (SELL_RETRY_MINUTES)
+
+
+@dataclass(frozen=True)
+class Block:
+    until: float                 # epoch; ``math.inf`` = sin vencimiento
+    reason: str
+
+
+class CooldownStore:
+    """Bloqueos de una cuenta; se persisten bajo ``name`` en ``COOLDOWN_FILE``."""
+
+    def __init__(self, name: str = "main"):
+        self.name = name
+        self._blocks: dict[str, Block] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._version = 0            # cambios hechos
+        self._saved = 0              # cambios ya escritos en disco
+        _STORES[name] = self
+
+    @property
+    def dirty(self) -> bool:
+        return self._version != self._saved
+
+    def _changed(self):
+        self._version += 1
+        if _WAKE is not None:        # el reaper guarda ya, no en la próxima pasada
+            _WAKE.set()
+
+    # ───── consulta ──────────────────────────────────────────────
+    def is_blocked(self, symbol: str, now: Optional[float] = None) -> bool:
+        block = self._blocks.get(symbol)
+        return block is not None and (now or time.time()) < block.until
+
+    def __contains__(self, symbol: str) -> bool:
+        return self.is_blocked(symbol)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def get(self, symbol: str) -> Optional[Block]:
+        block = self._blocks.get(symbol)
+        return block if block is not None and time.time() < block.until else None
+
+    # ───── cambios ───────────────────────────────────────────────
+    def block(self, symbol: str, seconds: Optional[float], reason: str):
+        """Bloquea ``symbol`` ``seconds`` segundos (``None`` = sin vencimiento)."""
+        until = math.inf if seconds is None else time.time() + seconds
+        self._set(symbol, Block(until, reason))
+
+    def _set(self, symbol: str, block: Block):
+        self._blocks[symbol] = block
+        if block.until != math.inf:
+            heapq.heappush(self._heap, (block.until, next(self._seq), symbol))
+        self._changed()
+
+    def unblock(self, symbol: str) -> bool:
+        """Quita el bloqueo; la entrada del montículo se descarta al salir."""
+        if self._blocks.pop(symbol, None) is None:
+            return False
+        self._changed()
+        return True
+
+    def reap(self, now: Optional[float] = None) -> list[str]:
+        """Elimina los bloqueos vencidos; devuelve sus símbolos."""
+        now = now or time.time()
+        out = []
+        while self._heap and self._heap[0][0] <= now:
+            until, _, symbol = heapq.heappop(self._heap)
+            block = self._blocks.get(symbol)
+            if block is not None and block.until == until:   # no renovado/quitado
+                del self._blocks[symbol]
+                out.append(symbol)
+        if out:
+            self._version += 1       # vencidos: basta con la pasada normal
+        return out
+
+    # ───── serialización ─────────────────────────────────────────
+    def snapshot(self) -> dict:
+        """Vista JSON: ``{símbolo: {"until": epoch | None, "reason": ...}}``."""
+        return {
+            sym: {"until": None if b.until == math.inf else b.until, "reason": b.reason}
+            for sym, b in self._blocks.items()
+        }
+
+    def restore(self, data: dict, now: Optional[float] = None):
+        now = now or time.time()
+        for sym, raw in data.items():
+            reason = raw.get("reason", SOLD)
+            if raw.get("until") is None and reason == SELL_FAILED:
+                continue                 # de versiones que la bloqueaban para siempre
+            until = math.inf if raw.get("until") is None else float(raw["until"])
+            if until > now:
+                self._set(sym, Block(until, reason))
+        self._saved = self._version
+
+
+_STORES: dict[str, CooldownStore] = {}
+_WAKE: Optional[asyncio.Event] = None      # lo crea ``run_reaper`` en su loop
+
+# ─────────────────────────────────────────────────────────────
+#  Persistencia
+# ─────────────────────────────────────────────────────────────
+def load_all(path: str = COOLDOWN_FILE):
+    """Recupera los bloqueos guardados de las cuentas ya creadas."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning(f"[cooldowns] no se pudo leer {path}: {e}")
+        return
+    for name, store in _STORES.items():
+        store.restore(data.get(name, {}))
+    logger.info(f"[cooldowns] {sum(len(s) for s in _STORES.values())} bloqueos recuperados")
+
+
+def _dump() -> tuple[dict, dict[str, int]]:
+    # en el hilo del loop: el fichero se escribe después en otro hilo
+    data = {name: store.snapshot() for name, store in _STORES.items()}
+    return data, {name: store._version for name, store in _STORES.items()}
+
+
+def _mark_saved(versions: dict[str, int]):
+    # los cambios posteriores a la foto siguen pendientes
+    for name, version in versions.items():
+        _STORES[name]._saved = version
+
+
+def save_all(path: str = COOLDOWN_FILE, data: Optional[dict] = None):
+    versions = None
+    if data is None:
+        data, versions = _dump()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)                  # nunca queda medio fichero
+    if versions is not None:
+        _mark_saved(versions)
+
+
+async def _save():
+    data, versions = _dump()
+    try:
+        await lanes.run("bulk", save_all, COOLDOWN_FILE, data)
+    except OSError as e:
+        logger.warning(f"[cooldowns] no se pudo guardar {COOLDOWN_FILE}: {e}")
+        return                             # sigue sucio: se reintenta
+    _mark_saved(versions)
+
+
+async def run_reaper(interval: float = REAP_INTERVAL):
+    """Quita vencidos cada ``interval`` segundos y guarda los cambios.
+
+    ``block``/``unblock`` despiertan al reaper, así que una venta o un
+    ``/elimina`` llegan a disco al momento y no en la pasada siguiente.
+    """
+    global _WAKE
+    _WAKE = asyncio.Event()
+    try:
+        while not SHUTTING_DOWN.is_set():
+            _WAKE.clear()
+            for store in _STORES.values():
+                for sym in store.reap():
+                    logger.debug(f"[cooldowns] {store.name}: fin del bloqueo de {sym}")
+            if any(s.dirty for s in _STORES.values()):
+                await _save()
+            try:
+                await asyncio.wait_for(_WAKE.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _WAKE = None
+        if any(s.dirty for s in _STORES.values()):
+            save_all()
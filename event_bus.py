@@ -0,0 +1,94 @@
+# event_bus.py – bus pub/sub de eventos entre fases
+# =====================================================================
+"""
+Las fases se avisan con eventos tipados en lugar de sondear ``state_dict``:
+
+======================  ===============================  =====================
+evento                  lo publica                       reacciona
+======================  ===============================  =====================
+``CandidateAdded``      Fase 1, Fase 3, API de control   Fase 2 (evalúa ya)
+``PositionOpened``      Fase 2                           —  (observadores)
+``ExitTriggered``       position_engine                  —  (observadores)
+``PositionClosed``      position_engine                  Fase 3 (repone)
+``SettingsChanged``     ``config.update_setting``        position_engine
+======================  ===============================  =====================
+
+Cada suscriptor tiene su propia ``asyncio.Queue``; ``publish`` nunca
+bloquea ni espera a nadie.  El bus guarda las colas con referencias fuertes
+(una tarea que sólo espera en su cola depende de ellas para no ser recogida
+por el GC), así que cada consumidor llama a ``unsubscribe`` en su
+``finally``: si ``supervise`` la reinicia, la cola vieja no se acumula.
+El trabajo periódico queda sólo para lo que depende del tiempo (pullbacks,
+stops por precio, escaneo por vela).
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(frozen=True, kw_only=True)
+class Event:
+    account: str = "main"
+    ts: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True, kw_only=True)
+class CandidateAdded(Event):
+    symbol: str
+    source: str                      # fase1 | fase3 | api
+
+
+@dataclass(frozen=True, kw_only=True)
+class PositionOpened(Event):
+    symbol: str
+    price: float
+    qty: float
+    cost: float
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExitTriggered(Event):
+    symbol: str
+    reason: str
+    price: float
+
+
+@dataclass(frozen=True, kw_only=True)
+class PositionClosed(Event):
+    symbol: str
+    reason: str
+    ok: bool                         # el motor sólo publica cierres con venta hecha
+
+
+@dataclass(frozen=True, kw_only=True)
+class SettingsChanged(Event):
+    key: str
+    value: Any
+
+
+class EventBus:
+    def __init__(self):
+        self._subs: dict[type, set[asyncio.Queue]] = {}
+
+    def subscribe(self, *types: type) -> asyncio.Queue:
+        """Cola que recibirá los eventos de ``types`` hasta ``unsubscribe``."""
+        q: asyncio.Queue = asyncio.Queue()
+        for t in types:
+            self._subs.setdefault(t, set()).add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        for subs in self._subs.values():
+            subs.discard(q)
+
+    def publish(self, event: Event):
+        for q in list(self._subs.get(type(event), ())):
+            q.put_nowait(event)
+
+
+BUS = EventBus()
+
+
+def publish(event: Event):
+    BUS.publish(event)
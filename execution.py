@@ -0,0 +1,150 @@
+# execution.py – ruta rápida de órdenes y medición de latencia
+# =====================================================================
+"""
+Camino de ejecución de órdenes de mercado:
+
+* los prerrequisitos (filtros LOT_SIZE/MIN_NOTIONAL, offset de reloj para
+  las peticiones firmadas y precio BNB para las comisiones) se preparan de
+  antemano con :func:`prepare` y :func:`keep_warm`;
+* :func:`submit_market_order` envía la orden y mide la latencia;
+* la contabilidad secundaria (Telegram, Excel) se lanza después con
+  :func:`defer` para no retrasar la actualización del estado.
+
+Cada orden real deja un registro ``signal → submit → ack`` más el
+``transactTime`` del exchange (fill), consultable con ``/latencia``.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import config
+import lanes
+from config import logger
+
+LATENCY_HISTORY  = 200          # órdenes guardadas para /latencia
+TIME_SYNC_INTERVAL = 1800       # seg – resincroniza offset de reloj
+BNB_REFRESH      = 300          # seg – refresco del precio BNB
+
+_LATENCIES: deque = deque(maxlen=LATENCY_HISTORY)
+_BACKGROUND: set = set()
+
+# ─────────────────────────────────────────────────────────────
+#  Trabajo diferido
+# ─────────────────────────────────────────────────────────────
+def _log_failure(task: asyncio.Task):
+    _BACKGROUND.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"[exec] tarea diferida falló: {task.exception()!r}")
+
+
+def defer(coro) -> asyncio.Task:
+    """Ejecuta ``coro`` en segundo plano (notificaciones, registros)."""
+    task = asyncio.create_task(coro)
+    _BACKGROUND.add(task)
+    task.add_done_callback(_log_failure)
+    return task
+
+# ─────────────────────────────────────────────────────────────
+#  Prerrequisitos
+# ─────────────────────────────────────────────────────────────
+async def _prepare(symbol: str, client):
+    from utils import get_market_filters, get_full_market_filters
+    await asyncio.gather(
+        get_market_filters(symbol),
+        get_full_market_filters(client, symbol),
+    )
+
+
+def prepare(symbol: str, client=None) -> Optional[asyncio.Task]:
+    """Precarga en segundo plano los filtros de ``symbol`` si faltan."""
+    from utils import filters_cached
+    if filters_cached(symbol):
+        return None
+    return defer(_prepare(symbol, client or config.get_client()))
+
+
+async def sync_time(client):
+    """Ajusta ``client.timestamp_offset`` al reloj del servidor."""
+    t0 = time.time()
+    server = await lanes.run("account", client.get_server_time)
+    t1 = time.time()
+    client.timestamp_offset = int(server["serverTime"] - (t0 + t1) * 500)
+
+
+async def keep_warm(clients):
+    """Mantiene offset de reloj y precio BNB listos para la ruta de órdenes."""
+    from utils import get_bnb_price
+    last_sync = 0.0
+    while not config.SHUTTING_DOWN.is_set():
+        if time.time() - last_sync >= TIME_SYNC_INTERVAL:
+            for client in clients:
+                try:
+                    await sync_time(client)
+                except Exception as e:
+                    logger.warning(f"[exec] sync_time: {e}")
+            last_sync = time.time()
+        try:
+            await get_bnb_price(clients[0], force=True)
+        except Exception as e:
+            logger.warning(f"[exec] precio BNB: {e}")
+        await asyncio.sleep(BNB_REFRESH)
+
+# ─────────────────────────────────────────────────────────────
+#  Envío y latencia
+# ─────────────────────────────────────────────────────────────
+async def submit_market_order(client, symbol: str, side: str,
+                              signal_ts: Optional[float] = None, **params) -> dict:
+    """``create_order`` MARKET midiendo signal→submit→ack y el fill."""
+    t_submit = time.time()
+    order = await lanes.run(
+        "orders", client.create_order, symbol=symbol, side=side, type="MARKET", **params)
+    t_ack = time.time()
+
+    signal_ts = signal_ts or t_submit
+    rec = {
+        "ts": t_ack,
+        "symbol": symbol,
+        "side": side,
+        "signal_ms": 1000 * (t_submit - signal_ts),
+        "ack_ms": 1000 * (t_ack - t_submit),
+        "total_ms": 1000 * (t_ack - signal_ts),
+        "fill_ms": None,
+    }
+    if "transactTime" in order:
+        offset = getattr(client, "timestamp_offset", 0)
+        rec["fill_ms"] = order["transactTime"] - (1000 * t_submit + offset)
+    _LATENCIES.append(rec)
+    logger.info(
+        f"[exec] {side} {symbol} signal→submit={rec['signal_ms']:.0f}ms "
+        f"submit→ack={rec['ack_ms']:.0f}ms"
+    )
+    return order
+
+
+def _pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_report(last: int = 10) -> str:
+    """Resumen de latencias para Telegram."""
+    if not _LATENCIES:
+        return "Sin órdenes registradas."
+    recs = list(_LATENCIES)
+    lines = [f"⏱️ Latencia de órdenes (n={len(recs)})"]
+    for key in ("signal_ms", "ack_ms", "total_ms"):
+        vals = [r[key] for r in recs]
+        lines.append(f"{key}: p50={_pct(vals, .5):.0f}  p95={_pct(vals, .95):.0f}  "
+                     f"max={max(vals):.0f}")
+    fills = [r["fill_ms"] for r in recs if r["fill_ms"] is not None]
+    if fills:
+        lines.append(f"fill_ms: p50={_pct(fills, .5):.0f}  p95={_pct(fills, .95):.0f}")
+    lines.append("")
+    for r in recs[-last:]:
+        fill = f"{r['fill_ms']:.0f}" if r["fill_ms"] is not None else "?"
+        lines.append(
+            f"{r['side']} {r['symbol']}: {r['signal_ms']:.0f}/{r['ack_ms']:.0f}/"
+            f"{fill} ms"
+        )
+    return "\n".join(lines)
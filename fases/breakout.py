@@ -0,0 +1,64 @@
+# fases/breakout.py – cálculo puro de la ruptura de Fase 1
+# =====================================================================
+"""
+Indicadores de Fase 1 sobre una matriz de klines, sin estado ni E/S, para
+poder ejecutarlos en un proceso aparte (``FASE1_PROCESS_WORKERS``): el
+event-loop principal sólo descarga las velas y aplica el resultado, así que
+los picos de CPU del escaneo no retrasan stops ni comandos.
+"""
+from typing import Optional
+
+import numpy as np
+
+from klines import Klines
+from fases.score_index import breakout_score
+from fases.scan_tiers import breakout_distance
+from utils import (
+    get_bollinger_bands,
+    get_rsi,
+    get_volume_avg,
+    get_rvol,
+    get_cvd,
+)
+
+
+def breakout_metrics(m: np.ndarray, filters: Optional[dict] = None) -> dict:
+    """Ruptura, puntuación y distancia de una matriz ``Klines.to_matrix()``.
+
+    ``filters`` lleva los ajustes opcionales de flujo (``FILTER_RVOL``,
+    ``RVOL_MIN``, ``FILTER_CVD``, ``CVD_MIN``, ``ETA_MAX_BARS``) leídos en
+    el proceso principal y, con el filtro CVD, ``QUOTE_RATE``: el tipo de la
+    cotización del par a USDT para comparar con ``CVD_MIN``.
+    """
+    filters = filters or {}
+    kl = Klines.from_matrix(m)
+    close = kl.series("close")
+    volume = kl.series("volume")
+
+    bb_upper, bb_mid, _ = get_bollinger_bands(close)
+    rsi_val = float(get_rsi(close).iloc[-1])
+    vol_avg = get_volume_avg(volume)
+
+    last_close = float(close.iloc[-1])
+    last_vol = float(volume.iloc[-1])
+    upper = float(bb_upper.iloc[-1])
+
+    passed = bool(last_close > upper and last_vol >= 2 * vol_avg and rsi_val > 50)
+    # filtros opcionales de flujo: mismas velas, sin peticiones extra
+    if passed and filters.get("FILTER_RVOL"):
+        passed = get_rvol(kl.volume) >= filters["RVOL_MIN"]
+    if passed and filters.get("FILTER_CVD"):
+        cvd = get_cvd(kl, filters["ETA_MAX_BARS"]) * filters.get("QUOTE_RATE", 1.0)
+        passed = cvd >= filters["CVD_MIN"]
+
+    vol_ratio = last_vol / vol_avg if vol_avg else 0.0
+    bb_std = (upper - float(bb_mid.iloc[-1])) / 2
+    return {
+        "passed": passed,
+        "score": breakout_score(last_close, upper, vol_ratio, rsi_val),
+        "distance": 0.0 if passed else breakout_distance(last_close, upper, bb_std,
+                                                         vol_ratio, rsi_val),
+        "bb_upper": upper,
+        "bb_std": bb_std,
+        "open_time": int(kl.open_time[-1]),
+    }
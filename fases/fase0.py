@@ -0,0 +1,275 @@
+# fases/fase0.py – detector de picos de volumen sobre el stream de Binance
+# =====================================================================
+"""
+Fase 0 consume los streams combinados de Binance (``<sym>@kline_1m`` por
+defecto, o ``<sym>@aggTrade`` con ``FASE0_STREAM=aggTrade``) y mantiene por
+símbolo el volumen (pasado a USDT con ``quotes.CROSS_RATES`` en pares de
+otra cotización) y el ratio de compras *taker* de la ventana
+``FASE0_SETTINGS["interval"]`` (1m/5m/15m).  Cuando un símbolo supera
+``min_vol`` y ``min_ratio`` se marca ``RESERVADA_PRE`` en las cuentas libres y
+se publica ``CandidateAdded`` — segundos después del pico, sin pedir klines.
+Las reservas pasan por los mismos límites que Fase 1 (saldo, operaciones
+activas, ``MAX_TRACKED_COINS`` y la oferta entre nodos en modo shards).
+
+Memoria constante por símbolo: un anillo de 15 cubos de un minuto
+(:class:`FlowWindow`).  Un evento de kline fija el cubo de su minuto (los
+valores del stream son acumulados); un aggTrade suma a su cubo.
+
+El universo se refresca cada ``NEW_LISTINGS_INTERVAL`` segundos y, si cambia
+(nuevos listados o rebalanceo de shards), se reconecta con los streams
+nuevos.
+
+Para probarlo sin Binance:
+
+* ``FASE0_STREAM_URL=ws://127.0.0.1:9000`` apunta a un servidor local que
+  emita mensajes con el formato de los streams combinados, o
+* ``FASE0_STREAM_FILE=mensajes.jsonl`` reproduce un mensaje JSON por línea.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import config
+import lanes
+from config import logger, PAUSED, SHUTTING_DOWN, FASE0_SETTINGS, NEW_LISTINGS_INTERVAL
+from accounts import Account
+from event_bus import BUS, CandidateAdded
+from logging_setup import log_event
+from quotes import CROSS_RATES, quote_of
+from sharding import SHARDS
+from utils import get_all_usdt_symbols, send_telegram_message
+from fases.fase1 import _accounts_ready
+import execution
+
+FASE0_STREAM      = os.getenv("FASE0_STREAM", "kline")         # kline | aggTrade
+FASE0_STREAM_URL  = os.getenv("FASE0_STREAM_URL", "wss://stream.binance.com:9443")
+FASE0_STREAM_FILE = os.getenv("FASE0_STREAM_FILE")
+STREAMS_PER_CONN  = 200          # Binance admite 1024; conexiones más ligeras
+RECV_TIMEOUT      = 1.0          # seg máx. esperando un mensaje (apagado, refresco)
+_SLOTS = 15                      # minutos del anillo (= ventana máxima)
+_WINDOW_MIN = {"1m": 1, "5m": 5, "15m": 15}
+
+# ─────────────────────────────────────────────────────────────
+#  Ventana deslizante por símbolo
+# ─────────────────────────────────────────────────────────────
+class FlowWindow:
+    """Volumen y compras taker (en la cotización del par) por minuto en un anillo fijo."""
+
+    __slots__ = ("minute", "quote", "taker", "last")
+
+    def __init__(self):
+        self.minute = [-1] * _SLOTS
+        self.quote = [0.0] * _SLOTS
+        self.taker = [0.0] * _SLOTS
+        self.last = -1                       # último minuto visto
+
+    def _slot(self, minute: int) -> int:
+        i = minute % _SLOTS
+        if self.minute[i] != minute:         # cubo de hace 15 min → reciclar
+            self.minute[i] = minute
+            self.quote[i] = self.taker[i] = 0.0
+        self.last = max(self.last, minute)
+        return i
+
+    def set(self, minute: int, quote: float, taker: float):
+        """Valores acumulados del minuto (evento de kline)."""
+        i = self._slot(minute)
+        self.quote[i], self.taker[i] = quote, taker
+
+    def add(self, minute: int, quote: float, taker: float):
+        """Suma una operación (evento aggTrade)."""
+        i = self._slot(minute)
+        self.quote[i] += quote
+        self.taker[i] += taker
+
+    def totals(self, window: int) -> tuple[float, float]:
+        """``(volumen, ratio taker)`` de los últimos ``window`` minutos."""
+        lo = self.last - window
+        quote = taker = 0.0
+        for m, q, t in zip(self.minute, self.quote, self.taker):
+            if lo < m <= self.last:
+                quote += q
+                taker += t
+        return quote, (taker / quote if quote else 0.0)
+
+
+class SpikeDetector:
+    """Procesa mensajes del stream y devuelve los símbolos que disparan."""
+
+    def __init__(self):
+        self.windows: dict[str, FlowWindow] = {}
+        self._flagged: dict[str, int] = {}   # símbolo → minuto del aviso
+        self.messages = 0
+
+    def feed(self, msg: dict) -> Optional[tuple[str, float, float]]:
+        data = msg.get("data", msg)
+        if data.get("e") == "kline":
+            k = data["k"]
+            sym, minute = k["s"], int(k["t"]) // 60_000
+            self._window(sym).set(minute, float(k["q"]), float(k["Q"]))
+        elif data.get("e") == "aggTrade":
+            sym, minute = data["s"], int(data["T"]) // 60_000
+            quote = float(data["p"]) * float(data["q"])
+            # m = comprador es maker → el taker vendió
+            self._window(sym).add(minute, quote, 0.0 if data["m"] else quote)
+        else:
+            return None
+        self.messages += 1
+        return self._check(sym, minute)
+
+    def _window(self, sym: str) -> FlowWindow:
+        w = self.windows.get(sym)
+        if w is None:
+            w = self.windows[sym] = FlowWindow()
+        return w
+
+    def _check(self, sym: str, minute: int) -> Optional[tuple[str, float, float]]:
+        window = _WINDOW_MIN.get(FASE0_SETTINGS["interval"], 5)   # en caliente (/set fase0)
+        flagged = self._flagged.get(sym)
+        if flagged is not None and minute - flagged < window:
+            return None                      # un aviso por ventana
+        quote, ratio = self.windows[sym].totals(window)
+        if quote_of(sym) != "USDT":          # volumen del stream en la cotización del par
+            quote = CROSS_RATES.to_usdt(quote, quote_of(sym)) or 0.0
+        if quote >= float(FASE0_SETTINGS["min_vol"]) and ratio >= float(FASE0_SETTINGS["min_ratio"]):
+            self._flagged[sym] = minute
+            return sym, quote, ratio
+        return None
+
+# ─────────────────────────────────────────────────────────────
+#  Fuentes de mensajes
+# ─────────────────────────────────────────────────────────────
+def stream_urls(symbols: list[str], kind: str = FASE0_STREAM,
+                base: str = FASE0_STREAM_URL) -> list[str]:
+    suffix = "kline_1m" if kind == "kline" else "aggTrade"
+    names = [f"{s.lower()}@{suffix}" for s in symbols]
+    return [
+        f"{base}/stream?streams=" + "/".join(names[i:i + STREAMS_PER_CONN])
+        for i in range(0, len(names), STREAMS_PER_CONN)
+    ]
+
+
+async def _ws_messages(url: str, out: asyncio.Queue):
+    import websockets                         # dependencia de python-binance
+    backoff = 1
+    while not SHUTTING_DOWN.is_set():
+        try:
+            async with websockets.connect(url, ping_interval=20,
+                                          max_size=2 ** 22) as ws:
+                backoff = 1
+                async for raw in ws:
+                    await out.put(json.loads(raw))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[fase0] stream caído ({e}); reintento en {backoff}s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+def live_stream(symbols: list[str], out: asyncio.Queue) -> list[asyncio.Task]:
+    """Abre todas las conexiones necesarias; los mensajes llegan a ``out``."""
+    return [asyncio.create_task(_ws_messages(u, out)) for u in stream_urls(symbols)]
+
+
+async def file_stream(path: str) -> AsyncIterator[dict]:
+    """Sustituto local: un mensaje JSON por línea."""
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+                await asyncio.sleep(0)
+
+
+async def _pump(source: AsyncIterator[dict], out: asyncio.Queue):
+    """Pasa ``source`` a la cola; ``None`` marca el final."""
+    async for msg in source:
+        await out.put(msg)
+    await out.put(None)
+
+# ─────────────────────────────────────────────────────────────
+#  Bucle de Fase 0
+# ─────────────────────────────────────────────────────────────
+async def _reserve(accounts: list[Account], sym: str) -> list[str]:
+    """Reserva ``sym`` con los mismos límites que Fase 1."""
+    names = []
+    for acc in _accounts_ready(accounts):     # saldo y operaciones activas
+        if sym in acc.state or acc.exclusion.is_blocked(sym):
+            continue
+        if len(acc.state) >= config.MAX_TRACKED_COINS:
+            continue
+        if SHARDS.enabled and not await lanes.run("bulk", SHARDS.offer, acc.name, sym, "fase0"):
+            continue
+        acc.state[sym] = {"status": "RESERVADA_PRE", "source": "fase0"}
+        names.append(acc.name)
+        BUS.publish(CandidateAdded(account=acc.name, symbol=sym, source="fase0"))
+    return names
+
+
+async def _consume(inbox: asyncio.Queue, detector: SpikeDetector,
+                   accounts: list[Account], until: float) -> bool:
+    """Procesa mensajes hasta ``until`` (monotonic); ``False`` si la fuente acabó."""
+    while not SHUTTING_DOWN.is_set():
+        left = until - time.monotonic()
+        if left <= 0:
+            return True
+        try:                                  # un stream callado no bloquea el refresco
+            msg = await asyncio.wait_for(inbox.get(), min(left, RECV_TIMEOUT))
+        except asyncio.TimeoutError:
+            continue
+        if msg is None:
+            return False
+        hit = detector.feed(msg)
+        if hit is None or not PAUSED.is_set():
+            continue
+        sym, quote, ratio = hit
+        names = await _reserve(accounts, sym)
+        log_event("fase0_spike", symbol=sym, quote=round(quote, 2),
+                  ratio=round(ratio, 3), accounts=names)
+        if names:
+            execution.prepare(sym)
+            execution.defer(send_telegram_message(
+                f"⚡ Fase 0 – pico de volumen {sym}: {quote:,.0f} USDT "
+                f"({ratio:.0%} compras, {FASE0_SETTINGS['interval']})"
+            ))
+
+
+async def run_fase0(accounts: list[Account], source: Optional[AsyncIterator[dict]] = None):
+    """Detector continuo; ``source`` sustituye al stream (pruebas).
+
+    Una fuente finita (``source`` o ``FASE0_STREAM_FILE``) se consume una
+    sola vez: al agotarse se espera al apagado en lugar de volver, porque
+    ``supervise`` relanzaría la fase y reproduciría el fichero en bucle.
+    """
+    detector = SpikeDetector()
+    if source is None and FASE0_STREAM_FILE:
+        source = file_stream(FASE0_STREAM_FILE)
+    if source is not None:
+        inbox: asyncio.Queue = asyncio.Queue(maxsize=10_000)
+        pump = asyncio.create_task(_pump(source, inbox))
+        try:
+            await _consume(inbox, detector, accounts, float("inf"))
+        finally:
+            pump.cancel()
+        logger.info("[fase0] fuente agotada; sin más picos hasta reiniciar")
+        await SHUTTING_DOWN.wait()
+        return
+
+    while not SHUTTING_DOWN.is_set():
+        symbols = SHARDS.mine(await get_all_usdt_symbols())   # shard de este nodo
+        logger.info(f"[fase0] escuchando {len(symbols)} símbolos ({FASE0_STREAM})")
+        inbox = asyncio.Queue(maxsize=10_000)
+        conns = live_stream(symbols, inbox)
+        try:
+            # cada NEW_LISTINGS_INTERVAL se mira el universo; sólo si cambió
+            # (nuevos listados) se reconecta con los streams nuevos
+            while not SHUTTING_DOWN.is_set():
+                await _consume(inbox, detector, accounts,
+                               time.monotonic() + NEW_LISTINGS_INTERVAL)
+                if set(SHARDS.mine(await get_all_usdt_symbols())) != set(symbols):
+                    break
+        finally:
+            for t in conns:
+                t.cancel()
@@ -8,25 +8,67 @@ fase 2 valide el pullback y ejecute la entrada.
 """
 
 import asyncio
+import os
 import time
-from binance.client import Client
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional
 
 import config
 from config import PAUSED, SHUTTING_DOWN
+from accounts import Account
+import execution
+import lanes
+from logging_setup import log_event
+from event_bus import BUS, CandidateAdded
+from fases.score_index import SCORE_INDEX
+from fases.scan_tiers import SCAN_SCHEDULER
+from fases.breakout import breakout_metrics
+from fases.scan_pipeline import ScanPipeline
+from quotes import quote_of, usdt_rate
+from sharding import SHARDS
 from utils import (
     get_all_usdt_symbols,
-    get_historical_data,
+    get_klines,
     send_telegram_message,
-    get_bollinger_bands,
-    get_rsi,
-    get_volume_avg,
-    cooldown_active,
 )
 
 # ----------------------------------------------------------------------
-SCAN_INTERVAL = 1800  # segundos
-INITIAL_DELAY = 60  # segundos de espera tras el arranque
+SCAN_INTERVAL = 1800  # segundos; ``SCAN_SCHEDULER`` decide qué símbolos toca pedir
+# >0 → indicadores en un pool de procesos aparte (el loop sólo descarga velas)
+FASE1_PROCESS_WORKERS = int(os.getenv("FASE1_PROCESS_WORKERS", "0"))
+_FILTER_KEYS = ("FILTER_RVOL", "RVOL_MIN", "FILTER_CVD", "CVD_MIN", "ETA_MAX_BARS")
+_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _pool() -> Optional[ProcessPoolExecutor]:
+    global _POOL
+    if _POOL is None and FASE1_PROCESS_WORKERS > 0:
+        # spawn: el padre ya tiene hilos (logging, carriles)
+        _POOL = ProcessPoolExecutor(FASE1_PROCESS_WORKERS, mp_context=get_context("spawn"))
+    return _POOL
+
+
+async def _metrics(kl, sym: str) -> dict:
+    """``breakout_metrics`` en el pool si está activo; si no, en el loop."""
+    global _POOL
+    filters = {k: getattr(config, k) for k in _FILTER_KEYS}
+    if filters["FILTER_CVD"]:            # CVD_MIN va en USDT; el CVD, en la cotización
+        try:
+            filters["QUOTE_RATE"] = await usdt_rate(quote_of(sym))
+        except ValueError:               # sin tipo: el filtro no pasa (NaN < CVD_MIN)
+            filters["QUOTE_RATE"] = float("nan")
+    pool = _pool()
+    if pool is not None:
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, breakout_metrics, kl.to_matrix(), filters)
+        except BrokenProcessPool:
+            config.logger.warning("[fase1] pool de procesos caído; se recrea")
+            _POOL = None
+    return breakout_metrics(kl.to_matrix(), filters)
+
 
 def _active_positions(state: dict) -> int:
     return sum(
@@ -35,71 +77,144 @@ def _active_positions(state: dict) -> int:
     )
 
 
-async def _is_candidate(sym: str, state: dict) -> bool:
-    """Devuelve True si ``sym`` cumple la ruptura inicial."""
+def _is_reserved(sym: str, state: dict) -> bool:
     rec = state.get(sym)
     status = rec.get("status") if isinstance(rec, dict) else rec
+    return isinstance(status, str) and (
+        status.startswith("COMPRADA") or status.startswith("RESERVADA_PRE")
+    )
 
-    if isinstance(status, str):
-        if status.startswith("COMPRADA") or status.startswith("RESERVADA_PRE"):
-            return False
 
-    df = await get_historical_data(sym, Client.KLINE_INTERVAL_4HOUR, 40)
-    if df is None or len(df) < 25:
-        return False
+def _cycle() -> int:
+    return int(time.time() // SCAN_INTERVAL)
 
-    close = df["close"].astype(float)
-    volume = df["volume"].astype(float)
 
-    bb_upper, _, _ = get_bollinger_bands(close)
-    rsi_val = get_rsi(close).iloc[-1]
-    vol_avg = get_volume_avg(volume)
+async def _is_breakout(sym: str, cycle: Optional[int] = None) -> bool:
+    """Ruptura inicial de ``sym``; sólo datos de mercado (común a cuentas).
 
-    last_close = close.iloc[-1]
-    last_vol = volume.iloc[-1]
+    Deja la puntuación del símbolo en ``SCORE_INDEX`` para Fase 3 y su
+    distancia a la ruptura en ``SCAN_SCHEDULER``.  ``cycle`` es el ciclo en
+    que el escaneo lo pidió: si el escaneo cruza el borde de ciclo, el
+    nivel se cuenta desde ese, no desde el siguiente.
+    """
+    cycle = _cycle() if cycle is None else cycle
+    kl = await get_klines(sym, config.KLINE_INTERVAL_FASE1, 40)
+    if kl is None:
+        return False
+    if len(kl) < 25:
+        SCAN_SCHEDULER.record(sym, cycle, float("inf"))
+        return False
 
-    if last_close > bb_upper.iloc[-1] and last_vol >= 2 * vol_avg and rsi_val > 50:
-        return True
-    return False
+    res = await _metrics(kl, sym)
+    SCORE_INDEX.update(sym, res["score"], res["open_time"], res["passed"])
+    SCAN_SCHEDULER.record(sym, cycle, res["distance"], res["bb_upper"], res["bb_std"])
+    return res["passed"]
 
 
-async def phase1_search_20_candidates(state_dict: dict, exclusion_dict: dict):
-    """Escanea continuamente en busca de rupturas."""
-    await asyncio.sleep(INITIAL_DELAY)  # espera inicial
+async def _is_candidate(sym: str, state: dict) -> bool:
+    """Devuelve True si ``sym`` cumple la ruptura inicial."""
+    if _is_reserved(sym, state):
+        return False
+    return await _is_breakout(sym)
+
+
+def _accounts_ready(accounts: list[Account]) -> list[Account]:
+    """Cuentas que pueden recibir candidatos (saldo y límite de operaciones)."""
+    now = time.time()
+    ready = []
+    for acc in accounts:
+        if now < acc.no_balance_until:
+            config.logger.info(
+                f"[fase1] {acc.tag}Cool‑off por saldo insuficiente: "
+                f"{acc.no_balance_until - now:.0f}s"
+            )
+            continue
+        active = max(_active_positions(acc.state), SHARDS.global_open(acc.name))
+        if active >= acc.get("MAX_OPERACIONES_ACTIVAS"):
+            config.logger.debug(f"[fase1] {acc.tag}límite de operaciones activas alcanzado")
+            continue
+        ready.append(acc)
+    return ready
+
+
+async def phase1_search_20_candidates(accounts: list[Account]):
+    """Escanea continuamente en busca de rupturas.
+
+    Un único escaneo sirve a todas las ``accounts``: cada símbolo se evalúa
+    una vez y se reserva en las cuentas que no lo tengan bloqueado.  El
+    escaneo corre en un :class:`ScanPipeline` (workers acotados, pausable) y
+    cada ruptura se reserva y notifica en cuanto aparece.
+    No hay espera inicial: ``main.warm_up`` ya dejó el universo en caché.
+    En cada ciclo sólo se piden klines de los símbolos que
+    ``SCAN_SCHEDULER`` da por vencidos o que la foto de precios acerca a su
+    banda.
+    """
     while not SHUTTING_DOWN.is_set():
         await PAUSED.wait()
 
-        # --- respeta cooldown de saldo ---
-        now = time.time()
-        if now < config.NO_BALANCE_UNTIL:
-            wait = config.NO_BALANCE_UNTIL - now
-            config.logger.info(f"[fase1] Cool‑off por saldo insuficiente: {wait:.0f}s")
-            await asyncio.sleep(wait)
+        ready = _accounts_ready(accounts)
+        if not ready:
+            # --- respeta el cooldown de saldo más corto ---
+            wait = min(
+                (a.no_balance_until - time.time() for a in accounts
+                 if a.no_balance_until > time.time()),
+                default=SCAN_INTERVAL,
+            )
+            await asyncio.sleep(min(wait, SCAN_INTERVAL))
             continue
 
-        if _active_positions(state_dict) >= config.MAX_OPERACIONES_ACTIVAS:
-            config.logger.debug("[fase1] límite de operaciones activas alcanzado")
-            await asyncio.sleep(SCAN_INTERVAL)
-            continue
-
-        symbols = await get_all_usdt_symbols()
-        added: list[str] = []
-
-        async def _eval(sym: str):
-            if cooldown_active(exclusion_dict, sym):
-                return
-            try:
-                ok = await _is_candidate(sym, state_dict)
-                if ok:
-                    state_dict[sym] = {"status": "RESERVADA_PRE"}
-                    added.append(sym)
-            except Exception:
-                config.logger.exception(f"[fase1] error evaluando {sym}")
-
-        await asyncio.gather(*[_eval(s) for s in symbols])
-
-        if added:
-            msg = "Fase 1 – nuevas rupturas:\n" + ", ".join(added)
-            await send_telegram_message(msg)
+        universe = SHARDS.mine(await get_all_usdt_symbols())   # shard de este nodo
+        t0 = time.perf_counter()
+        try:
+            from fases.position_engine import snapshot   # evita import circular
+            _, prices = await snapshot(max_age=SCAN_INTERVAL / 3)
+        except Exception as e:
+            config.logger.warning(f"[fase1] foto de precios: {e}")
+            prices = None
+        cycle = _cycle()
+        symbols = SCAN_SCHEDULER.due(universe, cycle, prices)
+        added: dict[str, list[str]] = {}
+
+        def _targets(sym: str) -> list[Account]:
+            return [
+                a for a in ready
+                if not a.exclusion.is_blocked(sym)
+                and not _is_reserved(sym, a.state)
+            ]
+
+        async def _check(sym: str):
+            if not _targets(sym):
+                return None
+            return await _is_breakout(sym, cycle)
+
+        # cada ruptura se reserva y se avisa en cuanto aparece
+        pipeline = ScanPipeline(_check, name="fase1")
+        async for sym, _ in pipeline.run(symbols):
+            targets = _targets(sym)          # el estado pudo cambiar mientras tanto
+            if SHARDS.enabled:               # otro nodo pudo ofrecerlo antes
+                targets = [a for a in targets
+                           if await lanes.run("bulk", SHARDS.offer, a.name, sym, "fase1")]
+            for acc in targets:
+                acc.state[sym] = {"status": "RESERVADA_PRE"}
+                added.setdefault(sym, []).append(acc.name)
+                BUS.publish(CandidateAdded(account=acc.name, symbol=sym, source="fase1"))
+            if not targets:
+                continue
+            execution.prepare(sym)           # filtros listos para Fase 2
+            names = f" ({'/'.join(added[sym])})" if len(accounts) > 1 else ""
+            msg = f"Fase 1 – nueva ruptura: {sym}{names}"
+            execution.defer(send_telegram_message(msg))
             config.logger.info(msg)
-        await asyncio.sleep(SCAN_INTERVAL)
+
+        SCORE_INDEX.rebuild()
+        config.logger.info(
+            f"[fase1] {pipeline.scanned}/{len(symbols)} símbolos en "
+            f"{pipeline.elapsed:.1f}s ({pipeline.rate:.1f} sym/s), {len(added)} rupturas"
+        )
+        log_event("fase1_cycle", universe=len(universe), symbols=len(symbols),
+                  scanned=pipeline.scanned, added=len(added), accounts=len(ready),
+                  tiers=SCAN_SCHEDULER.counts(),
+                  seconds=round(pipeline.elapsed, 3),
+                  sym_per_s=round(pipeline.rate, 2))
+        # ritmo fijo: el nivel 0 no se salta ciclos
+        await asyncio.sleep(max(0.0, SCAN_INTERVAL - (time.perf_counter() - t0)))
@@ -1,114 +1,156 @@
-"""Fase 2 – validación de pullback y gestión de posiciones.
+"""Fase 2 – validación de pullback y entrada.
 
 Cada símbolo marcado como ``RESERVADA_PRE`` por la Fase 1 se
 monitorea para detectar un pullback hacia la zona comprendida
 entre la banda superior de Bollinger y la EMA(9).  Si el precio
 rebota desde esa área se ejecuta una compra de mercado.  Las
-posiciones abiertas se cierran si el precio cierra por debajo de
-la EMA(9) o por los stops existentes (trailing ATR, Δ-stop y
-stop absoluto).
+posiciones abiertas las gestiona ``fases.position_engine``
+(salida por EMA, Δ-stop y stop absoluto).
+
+Un ``CandidateAdded`` del bus se evalúa al instante; el barrido completo
+cada ``CHECK_INTERVAL`` queda sólo para re-chequear pullbacks pendientes.
+Las klines se piden una vez por vela cerrada (``fases.signal_plan``); entre
+cierres cada evaluación compara el plan con la foto de precios en bloque.
 """
 
 import asyncio
 import time
 import config
 from config import PAUSED, SHUTTING_DOWN
-from binance.helpers import round_step_size
-from binance import exceptions as bexc
-from binance.exceptions import BinanceAPIException
 from config import (
-    logger, DRY_RUN, LIGHT_MODE,
+    logger,
     KLINE_INTERVAL_FASE2, CHECK_INTERVAL,
 )
 from utils import (
-    get_historical_data, send_telegram_message,
-    get_bollinger_bands, get_ema,
-    get_market_filters, update_light_stops,
-    set_cooldown, fee_to_usdt, process_sell_and_notify,
+    get_klines, send_telegram_message,
+    get_market_filters, fee_to_usdt,
+    bexc,
 )
-from fases.fase3 import phase3_replenish
-
-
-async def _buy_market(sym, client, usdt, hint_price):
-    if DRY_RUN:
-        return dict(qty=usdt / hint_price, price=hint_price,
+from accounts import setting
+import execution
+import lanes
+from logging_setup import log_event
+from event_bus import BUS, CandidateAdded, PositionOpened
+from quotes import quote_of, usdt_rate
+from sharding import SHARDS
+from fases.position_engine import snapshot
+from fases.signal_plan import SIGNAL_PLANS, PLAN_BARS, build_plan
+
+
+async def _buy_market(sym, client, usdt, hint_price, account=None, signal_ts=None):
+    # ``usdt`` es el importe en USDT; precios y órdenes van en la cotización del par
+    quote = quote_of(sym)
+    rate = await usdt_rate(quote)
+    if config.DRY_RUN:                   # leído en caliente (/set dry, API)
+        return dict(qty=usdt / rate / hint_price, price=hint_price,
                     entry_cost=usdt, commission=0.0)
     try:
-        o = await asyncio.to_thread(
-            client.create_order,
-            symbol=sym, side="BUY", type="MARKET", quoteOrderQty=usdt,
+        o = await execution.submit_market_order(
+            client, sym, "BUY", signal_ts, quoteOrderQty=round(usdt / rate, 8),
         )
-    except BinanceAPIException as e:
+    except bexc.BinanceAPIException as e:
         if e.code == -2010:   # balance insuficiente
-            logger.warning(f"{sym}: saldo insuficiente para {usdt} USDT")
-            await send_telegram_message(
-                f"⚠️ Sin saldo para comprar {sym}. Ajusta /set entry o recarga USDT."
-            )
-            # --- activar cooldown global ---
-            config.NO_BALANCE_UNTIL = time.time() + config.INSUFFICIENT_BALANCE_COOLDOWN
+            tag = account.tag if account else ""
+            logger.warning(f"{tag}{sym}: saldo insuficiente para {usdt} USDT")
+            execution.defer(send_telegram_message(
+                f"⚠️ {tag}Sin saldo para comprar {sym}. Ajusta /set entry o recarga {quote}."
+            ))
+            # --- activar cooldown (global o de la cuenta) ---
+            until = time.time() + config.INSUFFICIENT_BALANCE_COOLDOWN
+            if account is not None:
+                account.no_balance_until = until
+            else:
+                config.NO_BALANCE_UNTIL = until
             return None
         raise
 
     qty = float(o["executedQty"])
-    cost = float(o["cummulativeQuoteQty"])
-    fee = await fee_to_usdt(client, o.get("fills", []))
-    price = cost / qty if qty else hint_price
+    quote_cost = float(o["cummulativeQuoteQty"])
+    fee = await fee_to_usdt(client, o.get("fills", []), quote)   # BNB en caché (keep_warm)
+    price = quote_cost / qty if qty else hint_price
+    cost = quote_cost * rate
     return dict(qty=qty, price=price, entry_cost=cost + fee, commission=fee)
 
 
-async def _evaluate(sym, state, client, freed, exclusion_dict):
+async def _signal_plan(sym: str):
+    """Plan de entrada de la vela en curso; se recalcula al cerrar la vela."""
+    now = time.time()
+    plan = SIGNAL_PLANS.get(sym, now)
+    if plan is None:
+        kl = await get_klines(sym, KLINE_INTERVAL_FASE2, PLAN_BARS)
+        plan = build_plan(kl, KLINE_INTERVAL_FASE2)
+        if plan is not None and plan.expires <= now:   # caché de la vela anterior
+            kl = await get_klines(sym, KLINE_INTERVAL_FASE2, PLAN_BARS, ttl=0)
+            plan = build_plan(kl, KLINE_INTERVAL_FASE2)
+        if plan is not None:
+            SIGNAL_PLANS.put(sym, plan)
+    return plan
+
+
+async def _evaluate(sym, state, client, exclusion_dict, account=None):
+    tag = account.tag if account else ""
+    max_ops = setting(account, "MAX_OPERACIONES_ACTIVAS")
+    entry_usdt = setting(account, "MIN_ENTRY_USDT")
     rec = state.get(sym)
+    if rec is None:                      # vendida/eliminada por otra tarea
+        return
     status = rec if isinstance(rec, str) else rec.get("status")
+    if status != "RESERVADA_PRE":        # la gestión es del position_engine
+        return
 
     # 2.1 Chequeo de límite
     activas = sum(
         1 for rec in state.values()
         if isinstance(rec, dict) and str(rec.get("status", "")).startswith("COMPRADA")
     )
-    if activas >= config.MAX_OPERACIONES_ACTIVAS:
+    name = account.name if account else "main"
+    activas = max(activas, SHARDS.global_open(name))   # todos los nodos (modo shards)
+    if activas >= max_ops:
         logger.info(
-            f"❌ Límite de operaciones ({activas}/{config.MAX_OPERACIONES_ACTIVAS}) alcanzado, no compro {sym}"
+            f"❌ {tag}Límite de operaciones ({activas}/{max_ops}) alcanzado, no compro {sym}"
         )
         return
 
     # -------- ENTRADA --------
     if status == "RESERVADA_PRE":
-        # 1. Obtener datos suficientes para EMAs largas
-        df = await get_historical_data(sym, KLINE_INTERVAL_FASE2, 250)
-        if df is None or len(df) < 201:
+        # 1. Plan de la vela (klines sólo una vez por vela cerrada)
+        plan = await _signal_plan(sym)
+        if plan is None:
+            return
+        _, prices = await snapshot(client)
+        price = prices.get(sym)
+        if price is None:
             return
-        close = df["close"].astype(float)
-
-        # 2. Implementar filtro de tendencia (EMA50 > EMA200)
-        ema50 = get_ema(close, 50)
-        ema200 = get_ema(close, 200)
 
-        if ema50.iloc[-1] <= ema200.iloc[-1]:
-            logger.info(f"Filtro tendencia {sym}: EMA50 <= EMA200. Descartado.")
+        # 2. Filtro de tendencia (EMA50 > EMA200 con el precio actual)
+        if not plan.trend_ok(price):
+            logger.info(f"Filtro tendencia {sym}: EMA50 <= EMA200. Descartado.",
+                        extra={"symbol": sym})
             state.pop(sym, None)  # Eliminar para no reevaluar
+            SIGNAL_PLANS.discard(sym)
             return
 
-        # 3. Continuar con la lógica de pullback si la tendencia es alcista
-        high = df["high"].astype(float); low = df["low"].astype(float)
-
-        bb_upper, _, _ = get_bollinger_bands(close)
-        ema9 = get_ema(close, 9)
-
-        pull_low = low.iloc[-2]
-        in_zone = ema9.iloc[-2] <= pull_low <= bb_upper.iloc[-2]
-        rebound = close.iloc[-1] > close.iloc[-2]
-        if not (in_zone and rebound):
+        # 3. Pullback en zona (vela −2) y rebote sobre su cierre
+        if not plan.entry(price):
             return
+        signal_ts = time.time()
 
-        step, min_notional = await get_market_filters(sym)
-        if config.MIN_ENTRY_USDT < min_notional:
+        step, min_notional = await get_market_filters(sym)   # precargado por Fase 1
+        quote = quote_of(sym)                               # min_notional va en la cotización
+        if entry_usdt / await usdt_rate(quote) < min_notional:
             await send_telegram_message(
-                f"⚠️ {sym}: min\u202Fnotional {min_notional:.2f}\u202FUSDT • ajusta /set entry"
+                f"⚠️ {tag}{sym}: min\u202Fnotional {min_notional:.2f}\u202F{quote} • ajusta /set entry"
             )
             return
 
-        trade = await _buy_market(sym, client, config.MIN_ENTRY_USDT, close.iloc[-1])
+        # hueco del presupuesto global, reservado de forma atómica entre nodos
+        if not await lanes.run("account", SHARDS.acquire, name, sym, max_ops):
+            logger.info(f"❌ {tag}Límite global de operaciones alcanzado, no compro {sym}")
+            return
+        trade = await _buy_market(sym, client, entry_usdt, price, account,
+                                  signal_ts)
         if trade is None:
+            await lanes.run("account", SHARDS.release, name, sym)
             state.pop(sym, None)
             return
 
@@ -118,56 +160,49 @@ async def _evaluate(sym, state, client, freed, exclusion_dict):
             "entry_cost":  trade["entry_cost"],
             "quantity":    trade["qty"],
             "max_value":   trade["entry_cost"],
-            "stop_delta":  trade["entry_cost"] - config.STOP_DELTA_USDT,
+            "stop_delta":  trade["entry_cost"] - setting(account, "STOP_DELTA_USDT"),
         }
-        await send_telegram_message(
-            f"✅ COMPRA {sym} @ {trade['price']:.4f} (Qty {trade['qty']:.4f})\n"
+        execution.defer(send_telegram_message(
+            f"✅ {tag}COMPRA {sym} @ {trade['price']:.4f} (Qty {trade['qty']:.4f})\n"
             f"🧾 Coste total: {trade['entry_cost']:.2f} USDT (Fee {trade['commission']:.4f})"
-        )
-        logger.info(f"BUY {sym} qty={trade['qty']} price={trade['price']} cost={trade['entry_cost']}")
+        ))
+        BUS.publish(PositionOpened(account=name, symbol=sym, price=trade["price"],
+                                   qty=trade["qty"], cost=trade["entry_cost"]))
+        log_event("buy", account=name, symbol=sym,
+                  qty=trade["qty"], price=trade["price"], cost=trade["entry_cost"],
+                  fee=trade["commission"])
         return
 
-    # -------- GESTIÓN --------
-    if isinstance(rec, dict) and rec.get("status", "").startswith("COMPRADA"):
-        df = await get_historical_data(sym, KLINE_INTERVAL_FASE2, 30)
-        if df is None or df.empty:
-            return
-        last = float(df["close"].iloc[-1])
-        ema_long = get_ema(df["close"].astype(float), config.EMA_LONG)
-        value_now = rec["quantity"] * last
-
-        # --- disparadores ---
-        if last < ema_long.iloc[-1]:
-            rec["exit_reason"] = f"EMA{config.EMA_LONG}-EXIT"; freed.append(sym)
-        elif update_light_stops(rec, rec["quantity"], last, config.STOP_DELTA_USDT):
-            rec["exit_reason"] = "Δ-STOP"; freed.append(sym)
-        elif value_now <= config.STOP_ABS_USDT:
-            rec["exit_reason"] = "ABS-STOP"; freed.append(sym)
-
-        if sym in freed:
-            exit_reason = rec.pop("exit_reason", "EXIT")
-            await process_sell_and_notify(
-                client, sym, rec, last, exit_reason, exclusion_dict
-            )
 
-            state.pop(sym, None)
-
-
-async def phase2_monitor(state, client, exclusion_dict):
-    while True:
-        await PAUSED.wait()
-        if SHUTTING_DOWN.is_set():
-            break
-        freed = []
-        try:
-            await asyncio.gather(*[
-                _evaluate(s, state, client, freed, exclusion_dict)
-                for s in list(state.keys())
-            ])
-        except Exception:
-            logger.exception("[fase2] crash")
-            raise
-
-        if freed:
-            await phase3_replenish(state, exclusion_dict, len(freed))
-        await asyncio.sleep(CHECK_INTERVAL)
+async def phase2_monitor(state, client, exclusion_dict, account=None):
+    name = account.name if account else "main"
+    inbox = BUS.subscribe(CandidateAdded)
+    next_sweep = 0.0
+    try:
+        while True:
+            await PAUSED.wait()
+            if SHUTTING_DOWN.is_set():
+                break
+            try:
+                if time.monotonic() >= next_sweep:       # pullbacks pendientes
+                    SIGNAL_PLANS.expire(time.time())
+                    await asyncio.gather(*[
+                        _evaluate(s, state, client, exclusion_dict, account)
+                        for s in list(state.keys())
+                    ])
+                    next_sweep = time.monotonic() + CHECK_INTERVAL
+            except Exception:
+                logger.exception("[fase2] crash")
+                raise
+
+            try:                                         # candidato nuevo → al momento
+                ev = await asyncio.wait_for(inbox.get(), next_sweep - time.monotonic())
+            except asyncio.TimeoutError:
+                continue
+            if ev.account == name:
+                try:
+                    await _evaluate(ev.symbol, state, client, exclusion_dict, account)
+                except Exception:
+                    logger.exception(f"[fase2] error evaluando {ev.symbol}")
+    finally:
+        BUS.unsubscribe(inbox)
@@ -1,24 +1,62 @@
 # fases/fase3.py – Reposición Precandidatos mejorada (near‑cross 30 m)
 # --------------------------------------------------------------------
-# Usa la misma lógica de Fase 1 para rellenar huecos cuando se liberan
-# posiciones.  Limita la búsqueda al top‑N por volumen para ahorrar API.
+# Rellena huecos cuando se liberan posiciones.  Primero toma los mejores
+# símbolos del ranking que mantiene Fase 1 (``SCORE_INDEX``, sin API); sólo
+# si el índice está viejo escanea el top‑N por volumen con la misma lógica
+# de Fase 1, con pocos workers y parando en cuanto se cubre el cupo.
+# Se dispara con cada ``PositionClosed`` del bus (``phase3_listener``).
 # --------------------------------------------------------------------
-import asyncio
+from contextlib import aclosing
+from config import SHUTTING_DOWN
 from config import (
     logger,
     PRECANDIDATES_PER_FREED_COIN,
     MAX_TRACKED_COINS,
+    KLINE_INTERVAL_FASE1,
 )
 from utils import (
     get_all_usdt_symbols,
     send_telegram_message,
+    interval_seconds,
 )
-from fases.fase1 import _is_candidate   # reutilizamos la función
+from fases.fase1 import _is_candidate, SCAN_INTERVAL   # reutilizamos la función
+from fases.score_index import SCORE_INDEX
+from fases.scan_pipeline import ScanPipeline
+from logging_setup import log_event
+from event_bus import BUS, CandidateAdded, PositionClosed
+from sharding import SHARDS
+
+PHASE3_SCAN_LIMIT = 200      # top‑N símbolos del escaneo de respaldo
+PHASE3_WORKERS    = 5        # evaluaciones simultáneas en el respaldo
+_CANDLE_SECONDS = interval_seconds(KLINE_INTERVAL_FASE1)
+
+
+async def _fallback_scan(state_dict: dict, exclusion_dict: dict, to_add: int) -> list[str]:
+    """Escaneo cancelable que se detiene al alcanzar ``to_add``."""
+    symbols = SHARDS.mine(await get_all_usdt_symbols())[:PHASE3_SCAN_LIMIT]
+    added: list[str] = []
+
+    async def _check(sym: str) -> bool:
+        if sym in state_dict or exclusion_dict.is_blocked(sym):
+            return False
+        return await _is_candidate(sym, state_dict)
+
+    pipeline = ScanPipeline(_check, workers=PHASE3_WORKERS, name="fase3")
+    async with aclosing(pipeline.run(symbols)) as found:
+        async for sym, _ in found:
+            if sym in state_dict or exclusion_dict.is_blocked(sym):
+                continue
+            state_dict[sym] = "RESERVADA_PRE"
+            added.append(sym)
+            if len(added) >= to_add:
+                break                       # cancela los workers restantes
+    return added
 
 
 async def phase3_replenish(state_dict: dict,
                            exclusion_dict: dict,
-                           freed_coins: int):
+                           freed_coins: int,
+                           account=None):
     """Añade precandidatos cuando se liberan posiciones."""
     to_add = min(
         freed_coins * PRECANDIDATES_PER_FREED_COIN,
@@ -27,30 +65,46 @@ async def phase3_replenish(state_dict: dict,
     if to_add <= 0:
         return exclusion_dict
 
-    symbols = await get_all_usdt_symbols()
-    # ordena por volumen (ya devuelve volumen descendente)
-    added = []
-
-    async def _eval(sym):
-        if len(added) >= to_add:
-            return
-        if sym in state_dict or sym in exclusion_dict:
-            return
-        ok = await _is_candidate(sym, state_dict)
-        if ok:
+    if SCORE_INDEX.is_fresh(_CANDLE_SECONDS, 2 * SCAN_INTERVAL):
+        added = list(SCORE_INDEX.best(
+            to_add,
+            lambda s: s not in state_dict and not exclusion_dict.is_blocked(s),
+        ))
+        for sym in added:
             state_dict[sym] = "RESERVADA_PRE"
-            added.append(sym)
-
-    await asyncio.gather(*[_eval(s) for s in symbols[:200]])  # solo top 200
+        origin = "índice"
+    else:
+        added = await _fallback_scan(state_dict, exclusion_dict, to_add)
+        origin = "escaneo"
 
+    name = account.name if account else "main"
+    for sym in added:
+        BUS.publish(CandidateAdded(account=name, symbol=sym, source="fase3"))
     if added:
-        await send_telegram_message("Fase 3: nuevos candidatos:\n" + ", ".join(added))
-        logger.info(f"Fase 3 añadió {len(added)} símbolos: {added}")
-    else:
-        logger.info("Fase 3 sin candidatos relevantes.")
+        tag = account.tag if account else ""
+        await send_telegram_message(f"Fase 3: {tag}nuevos candidatos:\n" + ", ".join(added))
+    log_event("fase3_cycle", origin=origin, wanted=to_add, added=added)
 
     return exclusion_dict
 
+
+async def phase3_listener(accounts: list):
+    """Repone en cuanto el position_engine cierra una posición."""
+    by_name = {a.name: a for a in accounts}
+    inbox = BUS.subscribe(PositionClosed)
+    try:
+        while not SHUTTING_DOWN.is_set():
+            ev = await inbox.get()
+            acc = by_name.get(ev.account)
+            if acc is None or not ev.ok:
+                continue
+            try:
+                await phase3_replenish(acc.state, acc.exclusion, 1, acc)
+            except Exception:
+                logger.exception("[fase3] error reponiendo")
+    finally:
+        BUS.unsubscribe(inbox)
+
 # Alias para compatibilidad con fase2 / telegram_commands
 async def phase3_search_new_candidates(state_dict, freed_coins, exclusion_dict):
     return await phase3_replenish(state_dict, exclusion_dict, freed_coins)
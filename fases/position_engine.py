@@ -0,0 +1,214 @@
+# fases/position_engine.py – motor único de gestión de posiciones
+# =====================================================================
+"""
+Único dueño de los registros ``COMPRADA*`` de todas las cuentas.  Fase 2 sólo
+abre posiciones y sync sólo refleja balances; las salidas se deciden aquí.
+
+En cada tick (``STOP_WATCH_INTERVAL`` segundos) se toma una foto de precios
+en bloque (:func:`snapshot`, compartida también con sync) y cada posición
+se evalúa una sola vez: Δ‑stop y stop absoluto contra el precio actual, y
+salida por EMA sólo al cierre de vela de ``KLINE_INTERVAL_FASE2`` (único
+momento en que hacen falta klines).  Al cierre los stops se evalúan primero
+con la foto y las klines de todas las posiciones se piden después, en
+paralelo.
+
+Las salidas pasan por :func:`exit_position`, que serializa por
+``(cuenta, símbolo)`` con un ``asyncio.Lock`` y marca el registro como
+``VENDIENDO`` para que nadie más intente vender el mismo símbolo.  Si la
+venta falla, el registro (con su ``entry_cost`` y ``max_value``) vuelve a
+``COMPRADA*`` y el motor lo reintenta cuando vence el bloqueo de venta
+fallida (``SELL_RETRY_MINUTES``, o antes con ``/elimina``).  La
+latencia disparo → venta se consulta con ``/stops``.
+
+Los stops se comparan en USDT: en pares de otra cotización el precio se
+multiplica por :data:`quotes.CROSS_RATES`; la orden usa el precio del par.
+
+Publica ``ExitTriggered`` y ``PositionClosed`` en el bus (Fase 3 repone al
+recibir el cierre) y reevalúa al instante ante ``SettingsChanged``.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+import config
+import cooldowns
+import lanes
+from config import logger, PAUSED, SHUTTING_DOWN
+from accounts import Account
+from utils import (
+    get_klines, get_ema, update_light_stops, process_sell_and_notify,
+    interval_seconds,
+)
+from event_bus import BUS, ExitTriggered, PositionClosed, SettingsChanged
+from quotes import CROSS_RATES, quote_of
+
+TRIGGER_HISTORY = 200
+_TRIGGER_LAT: deque = deque(maxlen=TRIGGER_HISTORY)   # (symbol, reason, ms)
+_EXIT_LOCKS: dict[tuple[str, str], asyncio.Lock] = {}
+
+# ─────────────────────────────────────────────────────────────
+#  Foto de mercado compartida
+# ─────────────────────────────────────────────────────────────
+_SNAPSHOT: dict = {"ts": 0.0, "prices": {}}
+_SNAP_LOCK: Optional[asyncio.Lock] = None
+
+
+async def snapshot(client=None, max_age: Optional[float] = None) -> tuple[float, dict[str, float]]:
+    """``(ts, {symbol: precio})`` de una sola petición en bloque.
+
+    Reutiliza la última foto si tiene menos de ``max_age`` segundos
+    (por defecto ``STOP_WATCH_INTERVAL``); llamadas simultáneas comparten
+    la misma petición.
+    """
+    global _SNAP_LOCK
+    if _SNAP_LOCK is None:
+        _SNAP_LOCK = asyncio.Lock()
+    max_age = config.STOP_WATCH_INTERVAL if max_age is None else max_age
+    async with _SNAP_LOCK:
+        if time.time() - _SNAPSHOT["ts"] >= max_age:
+            client = client or config.get_client()
+            ts = time.time()
+            tickers = await lanes.run("market", client.get_all_tickers)
+            _SNAPSHOT["prices"] = {t["symbol"]: float(t["price"]) for t in tickers}
+            _SNAPSHOT["ts"] = ts
+            CROSS_RATES.update(_SNAPSHOT["prices"], ts)   # misma foto, sin petición
+    return _SNAPSHOT["ts"], _SNAPSHOT["prices"]
+
+# ─────────────────────────────────────────────────────────────
+#  Evaluación y salida
+# ─────────────────────────────────────────────────────────────
+def _open_positions(acc: Account):
+    for sym, rec in list(acc.state.items()):
+        if isinstance(rec, dict) and str(rec.get("status", "")).startswith("COMPRADA"):
+            yield sym, rec
+
+
+async def _ema_exit(sym: str) -> Optional[float]:
+    """Último cierre si la vela cerrada de ``sym`` quedó bajo la EMA larga."""
+    kl = await get_klines(sym, config.KLINE_INTERVAL_FASE2, 30, ttl=0, lane="market")
+    if kl is None or len(kl) < 2:
+        return None
+    ema_long = get_ema(kl.series("close"), config.EMA_LONG)
+    return float(kl.close[-1]) if kl.close[-2] < ema_long.iloc[-2] else None
+
+
+async def _ema_exits(acc: Account) -> dict[str, float]:
+    """Símbolos cuya última vela cerrada quedó bajo la EMA larga (klines en paralelo)."""
+    syms = [sym for sym, _ in _open_positions(acc)]
+    closes = await asyncio.gather(*[_ema_exit(s) for s in syms])
+    return {sym: c for sym, c in zip(syms, closes) if c is not None}
+
+
+def evaluate(acc: Account, sym: str, rec: dict, price: float,
+             ema_exit: bool = False) -> Optional[str]:
+    """Motivo de salida para ``rec`` al precio ``price`` o ``None``."""
+    qty = rec["quantity"]
+    if ema_exit:
+        return f"EMA{config.EMA_LONG}-EXIT"
+    if update_light_stops(rec, qty, price, acc.get("STOP_DELTA_USDT")):
+        return "Δ-STOP"
+    if qty * price <= acc.get("STOP_ABS_USDT"):
+        return "ABS-STOP"
+    return None
+
+
+async def exit_position(acc: Account, sym: str, price: float, reason: str,
+                        trigger_ts: Optional[float] = None) -> bool:
+    """Vende ``sym`` de ``acc`` una sola vez aunque lo pidan varias tareas."""
+    trigger_ts = trigger_ts or time.time()
+    lock = _EXIT_LOCKS.setdefault((acc.name, sym), asyncio.Lock())
+    async with lock:
+        rec = acc.state.get(sym)
+        if not (isinstance(rec, dict) and str(rec.get("status", "")).startswith("COMPRADA")):
+            return False                      # ya vendida o en otra venta
+        status, rec["status"] = rec["status"], "VENDIENDO"
+        ok = False
+        BUS.publish(ExitTriggered(account=acc.name, symbol=sym, reason=reason, price=price))
+        try:
+            ok = await process_sell_and_notify(
+                acc.client, sym, rec, price, reason, acc.exclusion,
+                tag=acc.tag, signal_ts=trigger_ts,
+            )
+        finally:
+            if ok:
+                acc.state.pop(sym, None)
+            elif acc.state.get(sym) is rec:
+                rec["status"] = status       # sigue abierta: el próximo tick reintenta
+        if ok:
+            BUS.publish(PositionClosed(account=acc.name, symbol=sym, reason=reason, ok=True))
+    if ok:
+        ms = 1000 * (time.time() - trigger_ts)
+        _TRIGGER_LAT.append((sym, reason, ms))
+        logger.info(f"[engine] {acc.tag}{reason} {sym} disparo→venta {ms:.0f}ms")
+    return ok
+
+
+async def _tick_account(acc: Account, prices: dict[str, float], snap_ts: float,
+                        ema_exits: Optional[dict[str, float]] = None):
+    """Stops de ``acc`` con la foto; con ``ema_exits``, sólo esas salidas por EMA."""
+    for sym, rec in _open_positions(acc):
+        if ema_exits is None:
+            price = prices.get(sym)
+        else:
+            price = ema_exits.get(sym)
+        if price is None:
+            continue
+        rate = CROSS_RATES.rate(quote_of(sym))
+        if rate is None:
+            continue
+        reason = evaluate(acc, sym, rec, price * rate, ema_exits is not None)
+        block = acc.exclusion.get(sym)
+        if block is not None and block.reason == cooldowns.SELL_FAILED:
+            continue                         # venta fallida: reintento al vencer
+        if reason:
+            await exit_position(acc, sym, price, reason, snap_ts)
+
+
+async def run_engine(accounts: list[Account]):
+    """Bucle del motor: un tick por ``STOP_WATCH_INTERVAL`` para todas las cuentas."""
+    period = interval_seconds(config.KLINE_INTERVAL_FASE2)
+    last_bar = int(time.time() // period)
+    inbox = BUS.subscribe(SettingsChanged)
+    try:
+        while not SHUTTING_DOWN.is_set():
+            await PAUSED.wait()
+            if any(next(_open_positions(a), None) for a in accounts):
+                try:
+                    snap_ts, prices = await snapshot(accounts[0].client)
+
+                    # pesado (klines + EMA) sólo al cierre de vela
+                    bar = int(snap_ts // period)
+                    closed = bar != last_bar and snap_ts - bar * period >= 2
+                    if closed:
+                        last_bar = bar
+                    # los stops no esperan a las klines del cierre de vela
+                    for acc in accounts:
+                        await _tick_account(acc, prices, snap_ts)
+                    if closed:
+                        exits = await asyncio.gather(*[_ema_exits(a) for a in accounts])
+                        for acc, ema_exits in zip(accounts, exits):
+                            await _tick_account(acc, prices, snap_ts, ema_exits)
+                except Exception:
+                    logger.exception("[engine] error en el tick")
+            try:                                 # un ajuste nuevo se aplica ya
+                await asyncio.wait_for(inbox.get(), config.STOP_WATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        BUS.unsubscribe(inbox)
+
+
+def stops_report() -> str:
+    """Distribución de latencia disparo → venta para Telegram."""
+    if not _TRIGGER_LAT:
+        return "Sin stops disparados todavía."
+    vals = sorted(ms for _, _, ms in _TRIGGER_LAT)
+    pct = lambda q: vals[min(len(vals) - 1, int(q * len(vals)))]
+    lines = [
+        f"🛑 Stops disparados: {len(vals)}",
+        f"disparo→venta p50={pct(.5):.0f}ms  p95={pct(.95):.0f}ms  max={vals[-1]:.0f}ms",
+    ]
+    for sym, reason, ms in list(_TRIGGER_LAT)[-10:]:
+        lines.append(f"{reason} {sym}: {ms:.0f}ms")
+    return "\n".join(lines)
@@ -1,126 +1,87 @@
-# fases/position_sync.py – sincroniza balances, trailing y repuebla Fase 3
+# fases/position_sync.py – sincroniza balances con el estado
 # =====================================================================
 """
-Sincroniza el balance spot → state_dict, aplica trailing Δ‑stop en USDT y un stop
-absoluto dinámico por símbolo.  Tras cada venta repuebla precandidatos con Fase 3.
-Todos los parámetros (`STOP_DELTA_USDT`, `STOP_ABS_USDT`, `LIGHT_MODE`) se leen
-directamente desde el módulo *config* en cada ciclo para que cambios vía /set se
-reflejen sin reiniciar el bot.
+Sincroniza el balance spot → state_dict: registra posiciones abiertas desde
+otro dispositivo (``COMPRADA_SYNC``), ajusta ``quantity`` al balance real y
+limpia las vacías.  Los precios salen de la foto en bloque del
+``position_engine``, que es quien evalúa stops y vende; sync ya no vende.
+Los parámetros (`STOP_DELTA_USDT`) se leen en cada ciclo para que cambios vía
+/set se reflejen sin reiniciar el bot.
 """
-from typing import Iterable
 from config import PAUSED, SHUTTING_DOWN
 import asyncio
 import config                    # ← leer valores en caliente
-from binance import exceptions as bexc
-from binance.helpers import round_step_size
+import lanes
 from config import (
-    logger, MIN_SYNC_USDT, DRY_RUN,
+    logger, MIN_SYNC_USDT,
 )
-from utils import (
-    get_all_usdt_symbols, get_step_size, send_telegram_message,
-    update_light_stops, get_historical_data, get_ema,
-    safe_market_sell, set_cooldown,
-    process_sell_and_notify,
-)
-from fases.fase3 import phase3_search_new_candidates
-
-_BIN_SEM = asyncio.Semaphore(3)
-
-def asset_ok(asset: str, valid_assets: set[str]) -> bool:
-    """Comprueba si *assetUSDT* está listado en Binance usando un set previo."""
-    return asset in valid_assets
-def _ensure_int(x):
-    assert isinstance(x, int), "freed slots debe ser int"
-    return x
+from utils import get_all_usdt_symbols, send_telegram_message
+from accounts import setting
+from fases.position_engine import snapshot
+from sharding import SHARDS
+from quotes import QUOTE_ASSETS, CROSS_RATES, quote_of, symbol_for_asset
 # ----------------------------------------------------------------------
-async def sync_positions(state: dict, client, exclusion_dict: dict, interval: int = 900):
+async def sync_positions(state: dict, client, exclusion_dict: dict, interval: int = 900,
+                         account=None):
     """Sincroniza balances en tiempo real.
 
-    Aplica trailing con ``update_light_stops`` y vende cuando se activa un stop.
-    ``state`` es un diccionario compartido con Fase 2.
+    ``state`` es un diccionario compartido con Fase 2 y el position_engine.
+    ``account`` (opcional) aporta los ajustes propios de la cuenta en modo
+    multi-cuenta.
     """
+    tag = account.tag if account else ""
     while True:
         await PAUSED.wait()                     # ← respeta /pausa
         if SHUTTING_DOWN.is_set():              # ← sale en /apagar
             break
         try:
-            account = await asyncio.to_thread(client.get_account)
-            valid_assets = {s[:-4] for s in await get_all_usdt_symbols()}
+            info = await lanes.run("account", client.get_account)
+            universe = set(await get_all_usdt_symbols())
+            _, prices = await snapshot(client)
 
             # -- recorrer balances --
-            for bal in account["balances"]:
+            for bal in info["balances"]:
                 asset = bal["asset"]
-                if asset == "USDT":
+                if asset in QUOTE_ASSETS:         # saldo para comprar, no posición
                     continue
 
                 qty = float(bal["free"]) + float(bal["locked"])
-                symbol = f"{asset}USDT"
+                # par ya gestionado o el de la primera cotización listada
+                symbol = symbol_for_asset(asset, universe, held=state)
+                if symbol is None:
+                    continue
+                if symbol not in state and not SHARDS.owns(symbol):
+                    continue                    # la adopta el nodo de su shard
 
                 # Saltar si se vendió desde otra fase
-                if exclusion_dict.get(symbol):
+                if exclusion_dict.is_blocked(symbol):
                     continue
 
                 # limpiar si posición vacía
-                if qty == 0 or not asset_ok(asset, valid_assets):
+                if qty == 0:
                     if not (isinstance(state.get(symbol), str) and state[symbol].startswith("RESERVADA")):
                         state.pop(symbol, None)
                     continue
 
-                # precio puntual
-                try:
-                    price = float((await asyncio.to_thread(
-                        client.get_symbol_ticker, symbol=symbol))["price"])
-                except bexc.BinanceAPIException:
+                price = prices.get(symbol)
+                rate = CROSS_RATES.rate(quote_of(symbol))
+                if price is None or rate is None:
                     continue
 
-                current_value = qty * price
+                rec = state.get(symbol)
+                if isinstance(rec, dict) and rec.get("status") == "VENDIENDO":
+                    continue                    # el engine la está vendiendo
+
+                current_value = qty * price * rate
                 if current_value < MIN_SYNC_USDT:
                     state.pop(symbol, None)
                     continue
 
-                # leer parámetros vivos
-                stop_delta_usdt = config.STOP_DELTA_USDT
-                light_mode      = config.LIGHT_MODE
-
-                rec = state.get(symbol)
-
                 # -------- posición ya sincronizada --------
                 if rec and isinstance(rec, dict):
-                    if light_mode:
-                        df = await get_historical_data(symbol, config.KLINE_INTERVAL_FASE2, 30)
-                        triggers = []
-                        if df is not None and not df.empty:
-                            closes = df["close"].astype(float)
-                            ema_long = get_ema(closes, config.EMA_LONG)
-                            if price <= ema_long.iloc[-1]:
-                                rec["exit_reason"] = f"EMA{config.EMA_LONG}-EXIT"
-                                triggers.append(symbol)
-
-                        value_now = qty * price
-
-                        stop_trigger = update_light_stops(
-                            rec, qty, price, stop_delta_usdt
-                        )
-                        if stop_trigger:
-                            rec["exit_reason"] = "Δ-STOP"
-                            triggers.append(symbol)
-                        elif value_now <= config.STOP_ABS_USDT:
-                            rec["exit_reason"] = "ABS-STOP"
-                            triggers.append(symbol)
-
-                        if triggers:
-                            async with _BIN_SEM:
-                                step = await get_step_size(symbol)
-                                qty_sell = round_step_size(qty, step)
-                                exit_reason = rec.pop("exit_reason", "EXIT")
-                                # La cantidad a vender es `qty`, no `qty_sell` para el PnL
-                                rec["quantity"] = qty
-                                await process_sell_and_notify(
-                                    client, symbol, rec, price, exit_reason, exclusion_dict
-                                )
-
-                            state.pop(symbol, None)
-                            await phase3_search_new_candidates(state, _ensure_int(1), exclusion_dict)
+                    # la cantidad a vender (y para el PnL) es el balance real
+                    if str(rec.get("status", "")).startswith("COMPRADA"):
+                        rec["quantity"] = qty
                     continue
 
                 # -------- registrar nueva posición --------
@@ -130,10 +91,10 @@ async def sync_positions(state: dict, client, exclusion_dict: dict, interval: in
                     "entry_cost":  current_value,
                     "quantity":    qty,
                     "max_value":   current_value,
-                    "stop_delta":  current_value - config.STOP_DELTA_USDT,
+                    "stop_delta":  current_value - setting(account, "STOP_DELTA_USDT"),
                 }
                 await send_telegram_message(
-                    f"📡 Sincronizada {symbol} • value={current_value:.2f} USDT"
+                    f"📡 {tag}Sincronizada {symbol} • value={current_value:.2f} USDT"
                 )
         except Exception:
             logger.exception("[sync] crash")
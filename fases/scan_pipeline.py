@@ -0,0 +1,96 @@
+# fases/scan_pipeline.py – escaneo productor/consumidor con workers acotados
+# =====================================================================
+"""
+En lugar de lanzar una tarea por símbolo con ``gather`` (todas compitiendo
+por el semáforo de Binance y resultados sólo al final), un productor llena
+una cola acotada y ``workers`` consumidores la vacían:
+
+* resultados progresivos: :meth:`ScanPipeline.run` es un generador
+  asíncrono que entrega cada hallazgo en cuanto aparece;
+* contrapresión: la cola mide ``2 × workers``; si las descargas van lentas
+  el productor espera;
+* ``/pausa`` detiene el escaneo entre símbolos y ``/apagar`` o
+  :meth:`ScanPipeline.cancel` lo cortan a mitad;
+* salir del ``async for`` (con ``contextlib.aclosing``) cancela los workers,
+  útil para parar al cubrir un cupo.
+
+Tras cada pasada, ``scanned``, ``found``, ``elapsed`` y ``rate`` (símbolos/s)
+quedan en la instancia.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+from config import logger, PAUSED, SHUTTING_DOWN
+
+SCAN_WORKERS = 5                 # = semáforo de Binance en utils
+_DONE = object()
+
+
+class ScanPipeline:
+    def __init__(self, evaluate: Callable[[str], Awaitable[Any]],
+                 workers: int = SCAN_WORKERS, name: str = "scan"):
+        self.evaluate = evaluate
+        self.workers = workers
+        self.name = name
+        self.scanned = 0
+        self.found = 0
+        self.elapsed = 0.0
+        self._cancelled = False
+
+    @property
+    def rate(self) -> float:
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    def cancel(self):
+        """Corta la pasada en curso tras los símbolos ya en evaluación."""
+        self._cancelled = True
+
+    async def run(self, symbols: Iterable[str]) -> AsyncIterator[tuple[str, Any]]:
+        """Entrega ``(símbolo, resultado)`` por cada resultado verdadero."""
+        self.scanned = self.found = 0
+        self._cancelled = False
+        start = time.perf_counter()
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=2 * self.workers)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def _producer():
+            for sym in symbols:
+                await jobs.put(sym)
+            for _ in range(self.workers):
+                await jobs.put(None)
+
+        async def _worker():
+            try:
+                while (sym := await jobs.get()) is not None:
+                    await PAUSED.wait()
+                    if self._cancelled or SHUTTING_DOWN.is_set():
+                        break
+                    try:
+                        res = await self.evaluate(sym)
+                    except Exception:
+                        logger.exception(f"[{self.name}] error evaluando {sym}",
+                                         extra={"symbol": sym})
+                        res = None
+                    self.scanned += 1
+                    if res:
+                        results.put_nowait((sym, res))
+            finally:
+                results.put_nowait(_DONE)
+
+        tasks = [asyncio.create_task(_producer())]
+        tasks += [asyncio.create_task(_worker()) for _ in range(self.workers)]
+        try:
+            pending = self.workers
+            while pending:
+                item = await results.get()
+                if item is _DONE:
+                    pending -= 1
+                    continue
+                self.found += 1
+                yield item
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.elapsed = time.perf_counter() - start
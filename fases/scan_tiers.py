@@ -0,0 +1,92 @@
+# fases/scan_tiers.py – frecuencia de escaneo adaptativa para Fase 1
+# =====================================================================
+"""
+La mayoría de los pares está lejos de una ruptura; no hace falta pedir sus
+klines en cada ciclo.  Tras cada evaluación se mide la distancia a las tres
+condiciones de Fase 1 y se asigna un nivel:
+
+    distancia = (BB_sup − close)/σ  +  (50 − RSI)/10  +  (2 − vol/vol_media)/4
+
+(σ = desviación de las Bollinger; cada término cuenta sólo si falta).
+
+=====  ==========  =============================
+nivel  distancia   se reescanea cada
+=====  ==========  =============================
+0      ≤ 0.5       ciclo (``SCAN_INTERVAL``)
+1      ≤ 1         2 ciclos
+2      ≤ 2         8 ciclos (una vela de 4h)
+3      ≤ 3         16 ciclos (2 velas)
+4      ≤ 4.5       32 ciclos (4 velas)
+5      resto       48 ciclos (6 velas)
+=====  ==========  =============================
+
+Los niveles fríos abarcan varias velas, así que sólo una fracción pequeña
+del universo se pide en cada ciclo.  Para no perder rupturas bruscas, cada
+ciclo compara el precio de la foto en bloque (una sola petición) con la
+banda guardada del símbolo: si ya está a ≤ 0.5σ de la banda se escanea
+aunque no le toque.
+"""
+from typing import Iterable, Optional
+
+TIER_BOUNDS  = (0.5, 1.0, 2.0, 3.0, 4.5)
+TIER_PERIODS = (1, 2, 8, 16, 32, 48)    # en ciclos de Fase 1
+
+
+def breakout_distance(close: float, bb_upper: float, bb_std: float,
+                      vol_ratio: float, rsi: float) -> float:
+    """0 = cumple las tres condiciones; mayor = más lejos de la ruptura."""
+    price_gap = (bb_upper - close) / bb_std if bb_std > 0 else 0.0
+    dist = max(0.0, price_gap) + max(0.0, 50 - rsi) / 10 + max(0.0, 2 - vol_ratio) / 4
+    return dist if dist == dist else float("inf")      # NaN → nivel más frío
+
+
+def tier_for(distance: float) -> int:
+    for tier, bound in enumerate(TIER_BOUNDS):
+        if distance <= bound:
+            return tier
+    return len(TIER_BOUNDS)
+
+
+class ScanScheduler:
+    """Próximo ciclo en el que toca reescanear cada símbolo."""
+
+    def __init__(self):
+        self._next: dict[str, int] = {}                      # símbolo → ciclo
+        self._tier: dict[str, int] = {}
+        self._band: dict[str, tuple[float, float]] = {}      # BB_sup, σ
+
+    def record(self, sym: str, cycle: int, distance: float,
+               bb_upper: float = 0.0, bb_std: float = 0.0):
+        """Actualiza el nivel de ``sym`` tras evaluarlo en ``cycle``."""
+        tier = tier_for(distance)
+        self._tier[sym] = tier
+        self._next[sym] = cycle + TIER_PERIODS[tier]
+        if bb_std > 0:
+            self._band[sym] = (bb_upper, bb_std)
+
+    def due(self, symbols: Iterable[str], cycle: int,
+            prices: Optional[dict[str, float]] = None) -> list[str]:
+        """Símbolos a escanear en ``cycle`` (nuevos, vencidos o acercándose)."""
+        out = []
+        for sym in symbols:
+            if self._next.get(sym, cycle) <= cycle:
+                out.append(sym)
+                continue
+            band = self._band.get(sym)
+            price = prices.get(sym) if prices else None
+            if band and price and (band[0] - price) / band[1] <= TIER_BOUNDS[0]:
+                out.append(sym)
+        return out
+
+    def tier(self, sym: str) -> Optional[int]:
+        return self._tier.get(sym)
+
+    def counts(self) -> dict[int, int]:
+        """Número de símbolos por nivel."""
+        out = {t: 0 for t in range(len(TIER_PERIODS))}
+        for t in self._tier.values():
+            out[t] += 1
+        return out
+
+
+SCAN_SCHEDULER = ScanScheduler()
@@ -0,0 +1,72 @@
+# fases/score_index.py – ranking de candidatos mantenido por Fase 1
+# =====================================================================
+"""
+Fase 1 puntúa cada símbolo que escanea (fuerza de ruptura, ratio de volumen
+y RSI) y deja aquí el ranking, etiquetado con la vela a la que pertenece.
+Fase 3 toma de este índice los mejores símbolos libres en O(k) y sin
+peticiones; sólo si el índice está viejo vuelve a escanear.
+
+Puntuación (heurística, mayor = mejor)::
+
+    100·(close/BB_sup − 1) + 0.5·(vol/vol_media) + (RSI − 50)/10
+"""
+import time
+from typing import Callable, Iterator, Optional
+
+
+def breakout_score(close: float, bb_upper: float, vol_ratio: float, rsi: float) -> float:
+    return 100 * (close / bb_upper - 1) + 0.5 * vol_ratio + (rsi - 50) / 10
+
+
+class ScoreIndex:
+    """Puntuaciones por símbolo más el orden de la última pasada completa."""
+
+    def __init__(self):
+        self._scores: dict[str, tuple[float, int, bool]] = {}   # score, vela, ok
+        self._ranked: list[str] = []
+        self.candle_ms: int = 0          # open_time de la vela indexada
+        self.built_at: float = 0.0       # time.time() del último ``rebuild``
+
+    def update(self, sym: str, score: float, candle_ms: int, passed: bool):
+        """Registra la evaluación de ``sym`` (``passed`` = ruptura completa)."""
+        if score != score:               # NaN (pocas velas)
+            return
+        self._scores[sym] = (score, candle_ms, passed)
+
+    def rebuild(self):
+        """Reordena tras una pasada de Fase 1 y fija la vela vigente."""
+        self._ranked = sorted(self._scores, key=lambda s: self._scores[s][0], reverse=True)
+        self.candle_ms = max((c for _, c, _ in self._scores.values()), default=0)
+        self.built_at = time.time()
+
+    def is_fresh(self, candle_seconds: int, max_age: float) -> bool:
+        """True si el índice es de la vela en curso y tiene < ``max_age`` seg."""
+        now = time.time()
+        current = int(now // candle_seconds) * candle_seconds * 1000
+        return (bool(self._ranked) and self.candle_ms == current
+                and now - self.built_at < max_age)
+
+    def best(self, k: int, accept: Callable[[str], bool],
+             only_passed: bool = True) -> Iterator[str]:
+        """Hasta ``k`` mejores símbolos de la vela vigente que ``accept``."""
+        if k <= 0:
+            return
+        for sym in self._ranked:
+            _, candle, passed = self._scores[sym]
+            if candle != self.candle_ms or (only_passed and not passed):
+                continue
+            if accept(sym):
+                yield sym
+                k -= 1
+                if k == 0:
+                    return
+
+    def score(self, sym: str) -> Optional[float]:
+        entry = self._scores.get(sym)
+        return entry[0] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._ranked)
+
+
+SCORE_INDEX = ScoreIndex()
@@ -0,0 +1,93 @@
+# fases/signal_plan.py – plan de entrada de Fase 2 precalculado por vela
+# =====================================================================
+"""
+Casi todo lo que mira Fase 2 queda fijo hasta el cierre de la siguiente vela
+de ``KLINE_INTERVAL_FASE2``: la zona de pullback (EMA9 y banda superior de la
+vela −2), el mínimo de esa vela y el cierre con el que se compara el rebote.
+Sólo el filtro de tendencia usa la vela en curso, y como las EMA son
+recursivas (``ewm(adjust=False)``) basta guardar su valor en la vela −2:
+
+    EMA_t = EMA_{t−1} + α·(precio − EMA_{t−1}),   α = 2/(span+1)
+
+Así :class:`SignalPlan` se calcula una vez por vela cerrada y símbolo (250
+klines) y la evaluación intravela son unas pocas comparaciones contra el
+último precio de la foto en bloque, sin pedir klines.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from klines import Klines
+from utils import get_ema, get_bollinger_bands, interval_seconds
+
+PLAN_BARS = 250                  # velas para la EMA200
+_MIN_BARS = 201
+
+
+def _alpha(span: int) -> float:
+    return 2 / (span + 1)
+
+
+@dataclass(frozen=True)
+class SignalPlan:
+    bar_open_ms: int             # vela en curso cuando se calculó
+    expires: float               # cierre de esa vela (time.time())
+    ema50: float                 # EMA50/EMA200 de la vela −2 (última cerrada)
+    ema200: float
+    in_zone: bool                # EMA9 ≤ mínimo −2 ≤ BB superior (vela −2)
+    rebound_above: float         # cierre de la vela −2
+
+    def trend_ok(self, price: float) -> bool:
+        """EMA50 > EMA200 con ``price`` como cierre de la vela en curso."""
+        e50 = self.ema50 + _alpha(50) * (price - self.ema50)
+        e200 = self.ema200 + _alpha(200) * (price - self.ema200)
+        return e50 > e200
+
+    def entry(self, price: float) -> bool:
+        """Pullback en zona y rebote sobre el cierre anterior."""
+        return self.in_zone and price > self.rebound_above
+
+
+def build_plan(kl: Klines, interval: str) -> Optional[SignalPlan]:
+    """Plan a partir de las velas (la última es la vela en curso)."""
+    if kl is None or len(kl) < _MIN_BARS:
+        return None
+    close = kl.series("close")[:-1]          # sólo velas cerradas
+    bb_upper, _, _ = get_bollinger_bands(close)
+    ema9 = get_ema(close, 9)
+    pull_low = float(kl.low[-2])
+    bar_open_ms = int(kl.open_time[-1])
+    return SignalPlan(
+        bar_open_ms=bar_open_ms,
+        expires=bar_open_ms / 1000 + interval_seconds(interval),
+        ema50=float(get_ema(close, 50).iloc[-1]),
+        ema200=float(get_ema(close, 200).iloc[-1]),
+        in_zone=bool(ema9.iloc[-1] <= pull_low <= bb_upper.iloc[-1]),
+        rebound_above=float(close.iloc[-1]),
+    )
+
+
+class PlanCache:
+    """Un :class:`SignalPlan` por símbolo, válido hasta el cierre de su vela."""
+
+    def __init__(self):
+        self._plans: dict[str, SignalPlan] = {}
+        self.builds = 0
+
+    def get(self, sym: str, now: float) -> Optional[SignalPlan]:
+        plan = self._plans.get(sym)
+        return plan if plan is not None and now < plan.expires else None
+
+    def put(self, sym: str, plan: SignalPlan):
+        self._plans[sym] = plan
+        self.builds += 1
+
+    def discard(self, sym: str):
+        self._plans.pop(sym, None)
+
+    def expire(self, now: float):
+        """Olvida los planes de velas ya cerradas."""
+        for sym in [s for s, p in self._plans.items() if now >= p.expires]:
+            del self._plans[sym]
+
+
+SIGNAL_PLANS = PlanCache()
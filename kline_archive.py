@@ -0,0 +1,252 @@
+# kline_archive.py – histórico de klines en disco (memory-mapped)
+# =====================================================================
+"""
+Importa los archivos públicos de klines de Binance (``data.binance.vision``,
+ZIP mensuales/diarios ya descargados, p. ej. ``BTCUSDT-15m-2024-01.zip``) a
+un formato columnar por símbolo e intervalo que se lee con ``np.memmap``:
+años de historia sin cargarlos en RAM y sin el límite de 1000 barras por
+petición REST.
+
+Uso::
+
+    python kline_archive.py import ~/descargas/klines/      # ZIP/CSV o carpetas
+    python kline_archive.py info BTCUSDT 15m
+
+Formato (``KLINE_ARCHIVE_DIR/<SYMBOL>/<interval>.npy``): matriz ``float64``
+de ``len(COLUMNS)`` filas (una por columna de :mod:`klines`) y una columna
+por vela, en rejilla regular: los huecos del exchange (mantenimientos) se
+rellenan con velas planas al cierre anterior y volumen 0.  Así la vela de un
+timestamp está en ``(ts − inicio) // paso``: acceso O(1), sin búsqueda.
+
+Lectura::
+
+    arch = KlineArchive.open("BTCUSDT", "15m")
+    kl = arch.window(start_ms, end_ms)      # Klines, vistas del memmap
+"""
+from __future__ import annotations
+
+import io
+import os
+import re
+import sys
+import zipfile
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from klines import COLUMNS, Klines
+
+KLINE_ARCHIVE_DIR = Path(os.getenv("KLINE_ARCHIVE_DIR", "data/klines"))
+
+_NCOL = len(COLUMNS)
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+_COPY_CHUNK = 1 << 20           # velas por bloque al copiar el archivo previo
+_FILE_RE = re.compile(r"^(?P<symbol>[A-Z0-9]+)-(?P<interval>\d+[a-zA-Z])-")
+# como ``utils.interval_seconds`` más ``1s``; sin importar utils/config (dotenv,
+# logging) en la CLI.  ``1M`` no tiene paso fijo y no cabe en la rejilla.
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _step_ms(interval: str) -> int:
+    return int(interval[:-1]) * _UNITS[interval[-1]] * 1000
+
+
+def archive_path(symbol: str, interval: str, root: Path = KLINE_ARCHIVE_DIR) -> Path:
+    return Path(root) / symbol / f"{interval}.npy"
+
+# ─────────────────────────────────────────────────────────────
+#  Lectura
+# ─────────────────────────────────────────────────────────────
+class KlineArchive:
+    """Histórico de un símbolo/intervalo abierto como ``memmap`` de sólo lectura."""
+
+    def __init__(self, matrix: np.ndarray, interval: str):
+        self.matrix = matrix
+        self.interval = interval
+        self.step_ms = _step_ms(interval)
+        self.start_ms = int(matrix[_COL["open_time"], 0]) if matrix.shape[1] else 0
+
+    @classmethod
+    def open(cls, symbol: str, interval: str,
+             root: Path = KLINE_ARCHIVE_DIR) -> Optional["KlineArchive"]:
+        path = archive_path(symbol, interval, root)
+        if not path.exists():
+            return None
+        return cls(np.load(path, mmap_mode="r"), interval)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def end_ms(self) -> int:
+        """``open_time`` de la última vela."""
+        return self.start_ms + (len(self) - 1) * self.step_ms
+
+    def index_of(self, ts_ms: int) -> int:
+        """Posición de la vela que contiene ``ts_ms`` (``IndexError`` si fuera)."""
+        i = (int(ts_ms) - self.start_ms) // self.step_ms
+        if not 0 <= i < len(self):
+            raise IndexError(f"{ts_ms} fuera del archivo")
+        return i
+
+    def window(self, start_ms: Optional[int] = None,
+               end_ms: Optional[int] = None) -> Klines:
+        """Velas con ``start_ms <= open_time <= end_ms`` sin copiar nada."""
+        n = len(self)
+        a = 0 if start_ms is None else max(0, -(-(int(start_ms) - self.start_ms) // self.step_ms))
+        b = n if end_ms is None else min(n, (int(end_ms) - self.start_ms) // self.step_ms + 1)
+        return Klines.from_matrix(self.matrix[:, a:max(a, b)], cast_ints=False)
+
+    def tail(self, n: int) -> Klines:
+        return Klines.from_matrix(self.matrix[:, max(0, len(self) - n):], cast_ints=False)
+
+# ─────────────────────────────────────────────────────────────
+#  Importación
+# ─────────────────────────────────────────────────────────────
+def _parse_csv(raw: bytes) -> np.ndarray:
+    """CSV de Binance → matriz ``(COLUMNS, n)``; acepta cabecera y µs."""
+    lines = [ln for ln in raw.splitlines() if ln[:1].isdigit()]
+    if not lines:
+        return np.empty((_NCOL, 0))
+    rows = np.loadtxt(io.BytesIO(b"\n".join(lines)), delimiter=",",
+                      usecols=range(_NCOL), dtype=np.float64, ndmin=2)
+    m = rows.T.copy()
+    for name in ("open_time", "close_time"):        # spot desde 2025: µs
+        col = m[_COL[name]]
+        col[col > 1e14] //= 1000
+    return m
+
+
+def _read_source(path: Path) -> np.ndarray:
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            parts = [_parse_csv(zf.read(n)) for n in zf.namelist() if n.endswith(".csv")]
+        return np.concatenate(parts, axis=1) if parts else np.empty((_NCOL, 0))
+    return _parse_csv(path.read_bytes())
+
+
+def _dedupe(m: np.ndarray) -> np.ndarray:
+    """Ordena por ``open_time`` y quita duplicados (la última copia gana)."""
+    order = np.argsort(m[_COL["open_time"]], kind="stable")
+    m = m[:, order]
+    t = m[_COL["open_time"]]
+    keep = np.ones(len(t), dtype=bool)
+    keep[:-1] = t[1:] != t[:-1]
+    return m[:, keep]
+
+
+def _fill(block: np.ndarray, filled: np.ndarray, start_ms: float, step_ms: int):
+    """Rellena en sitio las velas no ``filled`` y fija la rejilla de tiempos.
+
+    ``block[:, 0]`` debe ser una vela real: su cierre se propaga hacia
+    delante en OHLC; volúmenes y trades quedan en 0.
+    """
+    n = block.shape[1]
+    if not filled.all():
+        last = np.maximum.accumulate(np.where(filled, np.arange(n), 0))
+        prev_close = block[_COL["close"], last]
+        for name in ("open", "high", "low", "close"):
+            block[_COL[name], ~filled] = prev_close[~filled]
+    grid = start_ms + np.arange(n, dtype=np.float64) * step_ms
+    block[_COL["open_time"]] = grid
+    block[_COL["close_time"]] = grid + step_ms - 1
+
+
+def _merge(dest: Path, m: np.ndarray, step_ms: int) -> int:
+    """Escribe en ``dest`` lo ya importado más las velas ``m``; devuelve el total.
+
+    El archivo previo se lee con ``mmap_mode="r"`` y se copia por bloques a
+    un ``open_memmap`` nuevo: en RAM sólo están las velas nuevas y el hueco
+    que haya entre ellas y el archivo, nunca la historia entera.
+    """
+    old = np.load(dest, mmap_mode="r") if dest.exists() else None
+    t = m[_COL["open_time"]]
+    if old is not None and old.shape[1]:
+        o_start = float(old[_COL["open_time"], 0])
+        start = min(o_start, float(t[0]))
+        o0 = int((o_start - start) // step_ms)
+        o1 = o0 + old.shape[1]
+    else:
+        start, o0, o1 = float(t[0]), 0, 0
+    pos = ((t - start) // step_ms).astype(np.int64)
+    n0, n1 = int(pos[0]), int(pos[-1]) + 1
+    n = max(o1, n1)
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(".tmp.npy")
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=(_NCOL, n))
+    for i in range(0, o1 - o0, _COPY_CHUNK):          # historia: memmap → memmap
+        j = min(i + _COPY_CHUNK, o1 - o0)
+        out[:, o0 + i:o0 + j] = old[:, i:j]
+
+    # tramo a rellenar: las velas nuevas y el hueco con el archivo; si van
+    # detrás, desde la última vela del archivo para propagar su cierre
+    r0 = o1 - 1 if o1 > o0 and n0 > o1 else n0
+    r1 = o0 if o1 > o0 and n1 < o0 else n1
+    block = np.array(out[:, r0:r1])
+    filled = np.zeros(r1 - r0, dtype=bool)
+    lo, hi = max(o0, r0), min(o1, r1)
+    if lo < hi:
+        filled[lo - r0:hi - r0] = True
+    block[:, pos - r0] = m                              # lo nuevo gana
+    filled[pos - r0] = True
+    _fill(block, filled, start + r0 * step_ms, step_ms)
+    out[:, r0:r1] = block
+    out.flush()
+    del out, old
+    os.replace(tmp, dest)                              # lectores nunca ven medio fichero
+    return n
+
+
+def import_files(files: Iterable[Path], root: Path = KLINE_ARCHIVE_DIR) -> dict[tuple[str, str], int]:
+    """Importa/fusiona ficheros; devuelve ``{(símbolo, intervalo): velas}``."""
+    groups: dict[tuple[str, str], list[Path]] = {}
+    for f in files:
+        match = _FILE_RE.match(f.name)
+        if not match:
+            continue
+        if match["interval"][-1] not in _UNITS:
+            print(f"{f.name}: intervalo {match['interval']} no soportado, se omite",
+                  file=sys.stderr)
+            continue
+        groups.setdefault((match["symbol"], match["interval"]), []).append(f)
+
+    result = {}
+    for (symbol, interval), paths in sorted(groups.items()):
+        m = np.concatenate([_read_source(p) for p in sorted(paths)], axis=1)
+        if not m.shape[1]:
+            continue
+        dest = archive_path(symbol, interval, root)
+        result[(symbol, interval)] = _merge(dest, _dedupe(m), _step_ms(interval))
+    return result
+
+
+def _expand(args: list[str]) -> list[Path]:
+    files = []
+    for a in args:
+        p = Path(a).expanduser()
+        if p.is_dir():
+            files += [f for f in p.rglob("*") if f.suffix in (".zip", ".csv")]
+        else:
+            files.append(p)
+    return files
+
+
+def main(argv: list[str]):
+    if len(argv) >= 2 and argv[0] == "import":
+        for (sym, iv), n in import_files(_expand(argv[1:])).items():
+            print(f"{sym} {iv}: {n} velas")
+    elif len(argv) == 3 and argv[0] == "info":
+        arch = KlineArchive.open(argv[1], argv[2])
+        if arch is None:
+            print("sin archivo")
+            return
+        print(f"{argv[1]} {argv[2]}: {len(arch)} velas "
+              f"{arch.start_ms} → {arch.end_ms} ({arch.matrix.nbytes / 1e6:.1f} MB)")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+# klines.py – contenedor compacto de velas sobre arrays NumPy
+# =====================================================================
+"""
+``Klines`` guarda una serie de velas como arrays NumPy contiguos y tipados
+(tiempos ``int64``, OHLCV y volúmenes taker ``float64``, nº de trades
+``int64``) en lugar de un DataFrame de 12 columnas por petición.
+
+* :meth:`Klines.from_payload` parsea directamente la respuesta de
+  ``client.get_klines`` en una sola conversión;
+* rebanar (``kl[-40:]``) devuelve vistas, sin copiar;
+* :meth:`Klines.series` y :meth:`Klines.to_frame` construyen objetos pandas
+  sólo cuando un indicador los necesita.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# orden de columnas de la API de Binance (se descarta "ignore")
+COLUMNS = ("open_time", "open", "high", "low", "close", "volume",
+           "close_time", "qav", "num_trades", "tbbav", "tbqav")
+_INT_COLUMNS = {"open_time", "close_time", "num_trades"}
+
+
+class Klines:
+    """Velas de un símbolo/intervalo en arrays columnares."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, **cols: np.ndarray):
+        for name in COLUMNS:
+            setattr(self, name, cols[name])
+
+    # ───── construcción ──────────────────────────────────────────
+    @classmethod
+    def from_payload(cls, payload: list) -> "Klines":
+        """Parsea la lista de listas (strings) que devuelve ``get_klines``."""
+        if not payload:
+            return cls.empty()
+        width = len(COLUMNS)
+        m = np.array([row[:width] for row in payload], dtype=np.float64).T.copy()
+        return cls.from_matrix(m)
+
+    @classmethod
+    def from_matrix(cls, m: np.ndarray, cast_ints: bool = True) -> "Klines":
+        """Desde una matriz ``float64`` de ``len(COLUMNS)`` filas (una por
+        columna).  Las columnas float son vistas; las enteras se convierten
+        salvo ``cast_ints=False`` (todo vistas, p. ej. sobre un ``memmap``)."""
+        cols = {}
+        for i, name in enumerate(COLUMNS):
+            cast = cast_ints and name in _INT_COLUMNS
+            cols[name] = m[i].astype(np.int64) if cast else m[i]
+        return cls(**cols)
+
+    @classmethod
+    def empty(cls) -> "Klines":
+        return cls.from_matrix(np.empty((len(COLUMNS), 0), dtype=np.float64))
+
+    # ───── acceso ────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def __getitem__(self, item: slice) -> "Klines":
+        if not isinstance(item, slice):
+            raise TypeError("Klines sólo admite rebanadas; usa kl.close[i]")
+        return Klines(**{name: getattr(self, name)[item] for name in COLUMNS})
+
+    def to_matrix(self) -> np.ndarray:
+        """Matriz ``float64`` (una fila por columna); inversa de ``from_matrix``."""
+        return np.array([getattr(self, name) for name in COLUMNS], dtype=np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    def series(self, name: str):
+        """``pd.Series`` sobre la columna ``name`` (sin copia, índice 0..n-1)."""
+        import pandas as pd
+        return pd.Series(getattr(self, name), copy=False)
+
+    def to_frame(self):
+        """DataFrame con el formato histórico de ``get_historical_data``."""
+        import pandas as pd
+        df = pd.DataFrame(
+            {name: getattr(self, name) for name in COLUMNS[1:]}, copy=False)
+        df.index = pd.to_datetime(self.open_time, unit="ms")
+        df.index.name = "open_time"
+        return df
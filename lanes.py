@@ -0,0 +1,126 @@
+# lanes.py – pools de hilos separados por tipo de llamada bloqueante
+# =====================================================================
+"""
+Todas las llamadas bloqueantes al cliente de Binance compartían el pool por
+defecto de ``asyncio.to_thread``: una ráfaga de 400 klines de Fase 1 podía
+dejar la venta de un stop esperando un hilo libre.  Aquí cada tipo de
+trabajo tiene su carril (``lane``) con su propio pool:
+
+========  =====  ==============================================  =========
+carril    hilos  uso                                             prioridad
+========  =====  ==============================================  =========
+orders    2      ``create_order`` (compras, ventas, liquidación)  0
+account   2      ``get_account``, balances, hora del servidor     1
+market    4      foto de precios, filtros, precio BNB, EMA-exit   2
+bulk      6      klines de escaneo, ``exchangeInfo``, subprocesos 3
+========  =====  ==============================================  =========
+
+Prioridad: mientras haya una orden en vuelo, los carriles ``market`` y
+``bulk`` no empiezan trabajos nuevos (esperan hasta ``PRIORITY_WAIT`` s), así
+la orden no compite por ancho de banda ni por el peso de la API.
+
+Cada carril mide la espera en cola (envío → inicio en un hilo) y la
+duración; :func:`lanes_report` las resume para ``/lanes``.  Los tamaños se
+ajustan con ``LANE_<CARRIL>_WORKERS``.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+LANE_HISTORY  = 500              # esperas guardadas por carril
+PRIORITY_WAIT = 0.5              # seg máx. que un carril cede ante órdenes
+
+
+class Lane:
+    def __init__(self, name: str, workers: int, priority: int):
+        self.name = name
+        self.workers = int(os.getenv(f"LANE_{name.upper()}_WORKERS", workers))
+        self.priority = priority
+        self.submitted = 0
+        self.in_flight = 0               # enviados y sin terminar (cola + hilos)
+        self.waits: deque = deque(maxlen=LANE_HISTORY)   # ms en cola
+        self.runs: deque = deque(maxlen=LANE_HISTORY)    # ms en el hilo
+        self.idle = threading.Event()
+        self.idle.set()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._yield_to: tuple["Lane", ...] = ()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix=f"lane-{self.name}")
+        return self._pool
+
+    async def run(self, fn: Callable, /, *args, **kwargs):
+        """Como ``asyncio.to_thread`` pero en el pool de este carril."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        queued = time.perf_counter()
+
+        def _job():
+            for lane in self._yield_to:
+                lane.idle.wait(PRIORITY_WAIT)
+            start = time.perf_counter()
+            self.waits.append(1000 * (start - queued))
+            try:
+                return call()
+            finally:
+                self.runs.append(1000 * (time.perf_counter() - start))
+
+        self.submitted += 1
+        self.in_flight += 1
+        self.idle.clear()
+        try:
+            return await loop.run_in_executor(self._executor(), _job)
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self.idle.set()
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        pct = lambda q: waits[min(len(waits) - 1, int(q * len(waits)))] if waits else 0.0
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "in_flight": self.in_flight,
+            "wait_p50_ms": round(pct(.5), 1),
+            "wait_p95_ms": round(pct(.95), 1),
+            "wait_max_ms": round(waits[-1], 1) if waits else 0.0,
+        }
+
+
+LANES: dict[str, Lane] = {
+    lane.name: lane for lane in (
+        Lane("orders", 2, 0),
+        Lane("account", 2, 1),
+        Lane("market", 4, 2),
+        Lane("bulk", 6, 3),
+    )
+}
+for _lane in LANES.values():
+    if _lane.priority >= 2:
+        _lane._yield_to = (LANES["orders"],)
+
+
+async def run(lane: str, fn: Callable, /, *args, **kwargs):
+    """Ejecuta ``fn(*args, **kwargs)`` en el carril ``lane``."""
+    return await LANES[lane].run(fn, *args, **kwargs)
+
+
+def lanes_report() -> str:
+    """Espera en cola por carril para Telegram."""
+    lines = ["🛣️ Carriles (espera en cola)"]
+    for lane in sorted(LANES.values(), key=lambda l: l.priority):
+        s = lane.stats()
+        lines.append(
+            f"{lane.name}: {s['in_flight']} en curso/{s['workers']} hilos • "
+            f"p50={s['wait_p50_ms']:.0f}ms p95={s['wait_p95_ms']:.0f}ms "
+            f"max={s['wait_max_ms']:.0f}ms (n={s['submitted']})"
+        )
+    return "\n".join(lines)
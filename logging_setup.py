@@ -0,0 +1,184 @@
+# logging_setup.py – logging no bloqueante para el event-loop
+# =====================================================================
+"""
+Pipeline ``QueueHandler`` → ``QueueListener``: el event-loop sólo encola el
+registro (sin formatear ni tocar disco) y un hilo de fondo formatea, incluidas
+las trazas de excepción, y escribe.  Lo instala el punto de entrada
+(``main.py``, ``market_data.py``, ``virtual_time.py``) con
+:func:`setup_logging`; importar los módulos no crea ficheros.
+
+* ``app.log``: texto, rota por tamaño (``LOG_MAX_BYTES``) y a medianoche;
+  los ficheros rotados se comprimen con gzip.
+* ``events.jsonl``: eventos estructurados (una línea JSON por evento) para
+  operaciones y ciclos, emitidos con :func:`log_event`.
+* Mensajes repetidos del mismo símbolo (``extra={"symbol": ...}``) se
+  limitan a uno cada ``RATE_LIMIT_SECONDS``; el siguiente que pasa indica
+  cuántos se suprimieron.
+"""
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import time
+from typing import Optional
+
+LOG_MAX_BYTES      = 20 * 1024 * 1024
+LOG_BACKUPS        = 10
+LOG_ROTATE_SECONDS = 86400             # además de por tamaño, una vez al día
+RATE_LIMIT_SECONDS = 60.0
+EVENTS_LOGGER      = "codigo.events"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# ─────────────────────────────────────────────────────────────
+#  Handlers del hilo de fondo
+# ─────────────────────────────────────────────────────────────
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rota por tamaño o por calendario y comprime los ficheros rotados.
+
+    Los cortes por tiempo caen cada ``interval`` segundos contados desde la
+    medianoche local (como ``TimedRotatingFileHandler``): un fichero escrito
+    ayer rota con la primera línea de hoy, aunque el proceso acabe de arrancar.
+    """
+
+    def __init__(self, filename: str, max_bytes: int, backups: int, interval: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups,
+                         encoding="utf-8")
+        self.interval = interval
+        last = (os.path.getmtime(filename)
+                if os.path.exists(filename) else time.time())
+        self.rollover_at = self._next_rollover(last)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._gzip_rotate
+
+    def _next_rollover(self, ts: float) -> float:
+        """Primer corte de calendario posterior a ``ts``."""
+        t = time.localtime(ts)
+        midnight = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1))
+        return midnight + ((ts - midnight) // self.interval + 1) * self.interval
+
+    @staticmethod
+    def _gzip_rotate(source: str, dest: str):
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+    def shouldRollover(self, record) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_rollover(time.time())
+
+
+class JsonEventFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "ts": round(record.created, 3),
+            "event": getattr(record, "event", record.getMessage()),
+            **getattr(record, "fields", {}),
+        }, default=str, ensure_ascii=False)
+
+
+class _OnlyEvents(logging.Filter):
+    def filter(self, record) -> bool:
+        return hasattr(record, "event")
+
+# ─────────────────────────────────────────────────────────────
+#  Lado del event-loop
+# ─────────────────────────────────────────────────────────────
+_DIGITS = re.compile(r"[\d.]+")
+
+
+class SymbolRateLimit(logging.Filter):
+    """Deja pasar un mensaje por (símbolo, plantilla) cada ``window`` seg."""
+
+    def __init__(self, window: float = RATE_LIMIT_SECONDS):
+        super().__init__()
+        self.window = window
+        self._seen: dict[tuple, list] = {}      # clave → [último_ts, suprimidos]
+
+    def filter(self, record) -> bool:
+        sym = getattr(record, "symbol", None)
+        if sym is None:
+            return True
+        key = (sym, record.levelno, _DIGITS.sub("#", str(record.msg)))
+        now = record.created
+        entry = self._seen.get(key)
+        if entry and now - entry[0] < self.window:
+            entry[1] += 1
+            return False
+        if entry and entry[1]:
+            record.msg = f"{record.msg} (+{entry[1]} repetidos)"
+        self._seen[key] = [now, 0]
+        if len(self._seen) > 10_000:            # poda simple
+            cutoff = now - self.window
+            self._seen = {k: v for k, v in self._seen.items() if v[0] >= cutoff}
+        return True
+
+
+class LightQueueHandler(logging.handlers.QueueHandler):
+    """Encola casi sin formatear: la traza se formatea en el hilo del listener.
+
+    El mensaje sí se interpola aquí: los argumentos (dicts, listas del
+    estado) podrían cambiar antes de que el hilo de fondo los lea.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def setup_logging(path: str = "app.log", events_path: str = "events.jsonl",
+                  level: int = logging.INFO):
+    """Instala el pipeline en el logger raíz (idempotente)."""
+    global _listener
+    if _listener is not None or multiprocessing.parent_process() is not None:
+        return                     # idempotente; los workers no escriben logs
+
+    text = CompressedRotatingFileHandler(path, LOG_MAX_BYTES, LOG_BACKUPS,
+                                         LOG_ROTATE_SECONDS)
+    text.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    events = CompressedRotatingFileHandler(events_path, LOG_MAX_BYTES, LOG_BACKUPS,
+                                           LOG_ROTATE_SECONDS)
+    events.setFormatter(JsonEventFormatter())
+    events.addFilter(_OnlyEvents())
+
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    qh = LightQueueHandler(q)
+    qh.addFilter(SymbolRateLimit())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(qh)
+
+    _listener = logging.handlers.QueueListener(q, text, events,
+                                               respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Vacía la cola y detiene el hilo de escritura."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(event: str, **fields):
+    """Evento estructurado (``events.jsonl`` y una línea en ``app.log``)."""
+    logging.getLogger(EVENTS_LOGGER).info(
+        "%s %s", event, fields, extra={"event": event, "fields": fields})
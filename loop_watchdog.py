@@ -0,0 +1,174 @@
+# loop_watchdog.py – detector de bloqueos del event-loop
+# =====================================================================
+"""
+Mide continuamente el retraso (*lag*) del event-loop y, cuando algo lo
+bloquea más de ``WATCHDOG_THRESHOLD_MS``, captura la pila del código
+culpable mientras sigue bloqueando.
+
+* Una tarea del loop late cada ``WATCHDOG_INTERVAL`` segundos y anota cuánto
+  tarde despertó (lag).
+* Un hilo vigía compara ese latido con el reloj: si el loop lleva más del
+  umbral sin latir, toma la pila del hilo del loop con
+  ``sys._current_frames()`` (el código que está bloqueando), la tarea en
+  curso y la fase (primer módulo de ``fases/`` en la pila).
+* Al recuperarse el loop, el bloqueo queda en ``slow_callbacks.log`` (pila
+  completa), como evento ``loop_stall`` en ``events.jsonl`` y en
+  :func:`watchdog_report` (``/lag``).  Con ``WATCHDOG_TELEGRAM=1`` también se
+  avisa por Telegram (uno cada ``ALERT_COOLDOWN`` s).
+
+Coste: un ``asyncio.sleep`` cada 100 ms en el loop y un hilo que despierta
+con la misma frecuencia; pensado para quedarse activo en producción
+(``WATCHDOG_ENABLED=0`` lo apaga).
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from config import logger
+from logging_setup import log_event
+
+WATCHDOG_ENABLED      = os.getenv("WATCHDOG_ENABLED", "1") == "1"
+WATCHDOG_INTERVAL     = 0.1                                         # seg entre latidos
+WATCHDOG_THRESHOLD_MS = float(os.getenv("WATCHDOG_THRESHOLD_MS", "250"))
+WATCHDOG_TELEGRAM     = os.getenv("WATCHDOG_TELEGRAM", "0") == "1"
+SLOW_LOG              = os.getenv("WATCHDOG_SLOW_LOG", "slow_callbacks.log")
+ALERT_COOLDOWN        = 300                                         # seg entre avisos
+LAG_HISTORY           = 3000                                        # ~5 min de latidos
+STALL_HISTORY         = 50
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _attribute(frames: list[traceback.FrameSummary]) -> tuple[str, str]:
+    """``(fase, culpable)``: primer módulo de ``fases/`` y último frame propio."""
+    own = [f for f in frames if f.filename.startswith(_ROOT)
+           and "site-packages" not in f.filename]
+    phase = next((os.path.splitext(os.path.basename(f.filename))[0] for f in own
+                  if os.sep + "fases" + os.sep in f.filename), "")
+    f = own[-1] if own else (frames[-1] if frames else None)
+    if f is None:
+        return phase, ""
+    path = os.path.relpath(f.filename, _ROOT) if own else os.path.basename(f.filename)
+    return phase, f"{path}:{f.lineno} {f.name}"
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float = WATCHDOG_THRESHOLD_MS,
+                 interval: float = WATCHDOG_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.lags: deque = deque(maxlen=LAG_HISTORY)        # ms
+        self.stalls: deque = deque(maxlen=STALL_HISTORY)    # dicts
+        self.stall_count = 0
+        self._beat = 0.0
+        self._pending: Optional[dict] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None       # el loop sólo la referencia débilmente
+        self._loop_thread = 0
+        self._stop = threading.Event()
+        self._last_alert = 0.0
+
+    # ───── arranque ──────────────────────────────────────────────
+    def start(self):
+        """Arranca latido y vigía sobre el loop en curso."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._beats(), name="watchdog")
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    async def _beats(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lags.append(1000 * (now - t0 - self.interval))
+            self._beat = now
+
+    # ───── hilo vigía ────────────────────────────────────────────
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked > self.threshold:
+                if self._pending is None:               # primera muestra del bloqueo
+                    self._pending = self._capture()
+            elif self._pending is not None:             # el loop volvió a latir
+                stall, self._pending = self._pending, None
+                stall["ms"] = round(max(self.lags[-1] if self.lags else 0.0,
+                                        1000 * self.threshold), 1)
+                self._record(stall)
+
+    def _capture(self) -> dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = traceback.extract_stack(frame) if frame is not None else []
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        phase, culprit = _attribute(frames)
+        return {
+            "ts": time.time(),
+            "task": task.get_name() if task is not None else "",
+            "phase": phase,
+            "culprit": culprit,
+            "stack": "".join(traceback.format_list(frames)),
+        }
+
+    def _record(self, stall: dict):
+        self.stall_count += 1
+        self.stalls.append(stall)
+        try:
+            with open(SLOW_LOG, "a", encoding="utf-8") as fh:   # hilo propio: no bloquea el loop
+                fh.write(
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stall['ts']))} "
+                    f"loop bloqueado {stall['ms']:.0f}ms • tarea={stall['task']} "
+                    f"fase={stall['phase']} • {stall['culprit']}\n{stall['stack']}\n"
+                )
+        except OSError as e:
+            logger.warning(f"[watchdog] {SLOW_LOG}: {e}")
+        log_event("loop_stall", ms=stall["ms"], task=stall["task"],
+                  phase=stall["phase"], culprit=stall["culprit"])
+        if WATCHDOG_TELEGRAM and stall["ts"] - self._last_alert >= ALERT_COOLDOWN:
+            self._last_alert = stall["ts"]
+            from utils import send_telegram_message
+            asyncio.run_coroutine_threadsafe(send_telegram_message(
+                f"🐢 Event-loop bloqueado {stall['ms']:.0f}ms en "
+                f"{stall['phase'] or stall['task']}: {stall['culprit']}"
+            ), self._loop)
+
+    # ───── métricas ──────────────────────────────────────────────
+    def stats(self) -> dict:
+        lags = sorted(self.lags)
+        pct = lambda q: lags[min(len(lags) - 1, int(q * len(lags)))] if lags else 0.0
+        return {
+            "lag_p50_ms": round(pct(.5), 1),
+            "lag_p99_ms": round(pct(.99), 1),
+            "lag_max_ms": round(lags[-1], 1) if lags else 0.0,
+            "stalls": self.stall_count,
+        }
+
+
+WATCHDOG = LoopWatchdog()
+
+
+def watchdog_report(last: int = 5) -> str:
+    """Lag del loop y últimos bloqueos para Telegram."""
+    s = WATCHDOG.stats()
+    lines = [
+        f"🐢 Lag del loop: p50={s['lag_p50_ms']:.1f}ms p99={s['lag_p99_ms']:.1f}ms "
+        f"max={s['lag_max_ms']:.0f}ms • bloqueos>{WATCHDOG.threshold * 1000:.0f}ms: "
+        f"{s['stalls']}"
+    ]
+    for st in list(WATCHDOG.stalls)[-last:]:
+        when = time.strftime("%H:%M:%S", time.localtime(st["ts"]))
+        lines.append(f"{when} {st['ms']:.0f}ms {st['phase'] or st['task']}: {st['culprit']}")
+    return "\n".join(lines)
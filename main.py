@@ -1,14 +1,21 @@
 # main.py – Orquestador con /pausa /reanudar /apagar /restart
 # ===========================================================
 
+import time
+_T0 = time.perf_counter()                # arranque del proceso (medición)
+
 import asyncio
 from datetime import datetime
 import sys
 
+from logging_setup import setup_logging
+if __name__ == "__main__":               # antes de importar: los imports ya registran
+    setup_logging("app.log", "events.jsonl")
+
 import config
+import lanes
 from config import (
     logger,
-    client,
     SYNC_POS_INTERVAL,
     PAUSED,
     SHUTTING_DOWN,
@@ -16,6 +23,7 @@ from config import (
 
 # ─── supervise simple: solo reinicia si crashea ──────────────
 async def supervise(coro_factory, *args):
+    asyncio.current_task().set_name(coro_factory.__name__)   # atribución en el watchdog
     while not SHUTTING_DOWN.is_set():
         try:
             await coro_factory(*args)            # la fase maneja /pausa
@@ -23,36 +31,134 @@ async def supervise(coro_factory, *args):
             logger.exception(f"❌ {coro_factory.__name__} crasheó; reinicio en 5 s")
             await asyncio.sleep(5)
 
+# el loop sólo guarda referencias débiles a sus tareas: una tarea que espera
+# en una cola sin temporizador la recogería el GC
+_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _TASKS.add(task)
+    task.add_done_callback(_TASKS.discard)
+    return task
+
 # ─── Importes dependientes de eventos ────────────────────────
+from accounts import load_accounts
+import cooldowns
+from cooldowns import CooldownStore
+from loop_watchdog import WATCHDOG, WATCHDOG_ENABLED
+from quotes import QUOTE_ASSETS, symbol_for_asset
+from sharding import SHARDS, run_shards
+import execution
+from control_api import serve_control_api
 from telegram_commands import build_telegram_app
+from utils import (
+    get_all_usdt_symbols, get_klines, get_market_filters, get_full_market_filters,
+    send_telegram_message,
+)
 
 # fases
+from fases.fase0 import run_fase0
 from fases.fase1 import phase1_search_20_candidates
 from fases.fase2 import phase2_monitor
+from fases.fase3 import phase3_listener
 from fases.position_sync import sync_positions
-from fases.manual_watcher import watch_manual_file
+from fases.position_engine import run_engine
 
 # ─── Estados compartidos ─────────────────────────────────────
-state_dict, exclusion_dict = {}, {}
-
-# ─── sync_positions con retardo ──────────────────────────────
-async def delayed_sync():
-    await asyncio.sleep(30)
-    asyncio.create_task(
-        supervise(sync_positions,
-                  state_dict, client, exclusion_dict, SYNC_POS_INTERVAL)
+state_dict, exclusion_dict = {}, CooldownStore("main")
+accounts = load_accounts(state_dict, exclusion_dict)   # [0] = principal
+cooldowns.load_all()                                   # bloqueos previos al reinicio
+
+# ─── warm-up concurrente (sustituye las esperas fijas) ───────
+async def _account_balances(acc) -> list[dict]:
+    client = await lanes.run("account", lambda: acc.client)   # ping fuera del loop
+    info = await lanes.run("account", client.get_account)
+    return info["balances"]
+
+
+async def warm_up() -> float:
+    """Construye los clientes y precarga universo, filtros y klines.
+
+    Los símbolos con saldo (en cualquier cuenta) son los que
+    ``sync_positions`` va a gestionar, así que sus filtros y klines quedan
+    en caché antes de la primera pasada.  Devuelve los segundos
+    transcurridos desde el arranque.
+    """
+    symbols, *balances = await asyncio.gather(
+        get_all_usdt_symbols(),
+        *[_account_balances(a) for a in accounts],
+        return_exceptions=True,
+    )
+    if isinstance(symbols, Exception):
+        logger.warning(f"[warm-up] universo: {symbols}")
+        symbols = []
+
+    universe = set(symbols)
+    tracked = set()
+    for acc, bals in zip(accounts, balances):
+        if isinstance(bals, Exception):
+            logger.warning(f"[warm-up] {acc.tag}cuenta: {bals}")
+            continue
+        tracked.update(
+            sym for b in bals
+            if b["asset"] not in QUOTE_ASSETS
+            and float(b["free"]) + float(b["locked"]) > 0
+            and (sym := symbol_for_asset(b["asset"], universe))
+        )
+    await asyncio.gather(
+        *[get_market_filters(s) for s in tracked],
+        *[get_full_market_filters(accounts[0].client, s) for s in tracked],
+        *[get_klines(s, config.KLINE_INTERVAL_FASE2, 30) for s in tracked],
+        return_exceptions=True,
+    )
+
+    elapsed = time.perf_counter() - _T0
+    logger.info(
+        f"[warm-up] {len(universe)} símbolos, {len(tracked)} con saldo "
+        f"en {len(accounts)} cuenta(s); "
+        f"arranque en {elapsed:.2f}s"
     )
+    return elapsed
 
 # ─── main ────────────────────────────────────────────────────
-async def main():
-    app = build_telegram_app(state_dict, exclusion_dict, PAUSED, SHUTTING_DOWN)
-    await app.initialize(); await app.start()
-    asyncio.create_task(app.updater.start_polling())
+async def main(telegram: bool = True):
+    """``telegram=False``: sin polling de comandos (simulación, ``virtual_time``)."""
+    if WATCHDOG_ENABLED:
+        WATCHDOG.start()
+    if telegram:
+        app = build_telegram_app(state_dict, exclusion_dict, PAUSED, SHUTTING_DOWN,
+                                 accounts)
+        _, elapsed = await asyncio.gather(
+            _start_telegram(app),
+            warm_up(),
+        )
+    else:
+        elapsed = await warm_up()
 
-    asyncio.create_task(supervise(watch_manual_file, state_dict, exclusion_dict))
-    asyncio.create_task(delayed_sync())
-    asyncio.create_task(supervise(phase2_monitor, state_dict, client, exclusion_dict))
-    asyncio.create_task(supervise(phase1_search_20_candidates, state_dict, exclusion_dict))
+    if SHARDS.enabled:
+        # el anillo debe conocer a los demás nodos antes del primer escaneo
+        await lanes.run("bulk", SHARDS.heartbeat)
+        _spawn(supervise(run_shards, accounts))
+    _spawn(supervise(serve_control_api, accounts))
+    # órdenes y balances: por cuenta
+    for acc in accounts:
+        _spawn(
+            supervise(sync_positions,
+                      acc.state, acc.client, acc.exclusion, SYNC_POS_INTERVAL, acc)
+        )
+        _spawn(
+            supervise(phase2_monitor, acc.state, acc.client, acc.exclusion, acc)
+        )
+    _spawn(supervise(execution.keep_warm, [a.client for a in accounts]))
+    _spawn(supervise(run_engine, accounts))
+    _spawn(supervise(cooldowns.run_reaper))
+    _spawn(supervise(phase3_listener, accounts))
+    # escaneo de mercado: uno solo para todas las cuentas
+    _spawn(supervise(phase1_search_20_candidates, accounts))
+    if config.FASE0_ENABLED:
+        _spawn(supervise(run_fase0, accounts))
+    execution.defer(send_telegram_message(f"🚀 Bot listo en {elapsed:.1f}s"))
 
     # Heart-beat
     while not SHUTTING_DOWN.is_set():
@@ -60,6 +166,11 @@ async def main():
         await asyncio.sleep(1800)
         logger.info(f"Heartbeat {datetime.utcnow().isoformat(timespec='seconds')}")
 
+
+async def _start_telegram(app):
+    await app.initialize(); await app.start()
+    _spawn(app.updater.start_polling())
+
 # ─── lanzamiento ─────────────────────────────────────────────
 if __name__ == "__main__":
     try:
@@ -0,0 +1,301 @@
+# market_data.py – demonio de datos de mercado en memoria compartida
+# =====================================================================
+"""
+Proceso independiente que descarga las klines una sola vez por host y las
+publica en segmentos ``multiprocessing.shared_memory`` para que varios bots
+las lean sin copiar ni pedir nada a Binance.
+
+Arranque del demonio::
+
+    python market_data.py            # refresca cada MD_REFRESH segundos
+
+Escribe su propio log (``MD_LOG_FILE``, por defecto ``market_data.log``) y
+sus eventos (``MD_EVENTS_FILE``), no los del bot.
+
+Los bots lo usan con ``MARKET_DATA_SHM=1`` en el entorno: ``utils``
+intenta primero :func:`read_klines` y sólo cae a REST si el segmento no
+existe o está viejo.
+
+Formato de cada segmento ``<prefijo>_<SYMBOL>_<interval>``:
+
+* cabecera de 9 ``int64``: versión, capacidad, nº columnas, slot activo,
+  secuencia, filas del slot 0, filas del slot 1, ``updated_ms``, generación;
+* dos slots de ``columnas × capacidad`` ``float64`` (doble buffer, por
+  columnas para que cada serie sea contigua).
+
+El demonio escribe siempre en el slot inactivo y luego cambia el activo,
+así que un lector que toma la vista del slot activo no la ve modificarse
+hasta el refresco siguiente.  El índice ``<prefijo>_index`` guarda en JSON
+el universo de símbolos, las capacidades por intervalo y la generación.
+
+Cada arranque del demonio tiene su propia generación (``time_ns`` del
+arranque) y recrea los segmentos; los lectores vuelven a abrirlos cuando la
+generación de la cabecera ya no es la del índice, cuando el demonio los marca
+como retirados (versión 0) al salir o cuando sus datos están viejos.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import config
+from config import logger
+from klines import COLUMNS, Klines
+
+SHM_PREFIX = os.getenv("MARKET_DATA_PREFIX", "ccmd")
+MD_REFRESH = int(os.getenv("MD_REFRESH", "120"))       # seg entre refrescos
+MD_STALE   = 3 * MD_REFRESH                            # seg → lector cae a REST
+# logs propios: el bot rota los suyos y dos procesos no pueden rotar el mismo
+MD_LOG_FILE    = os.getenv("MD_LOG_FILE", "market_data.log")
+MD_EVENTS_FILE = os.getenv("MD_EVENTS_FILE", "market_data_events.jsonl")
+# intervalos publicados y nº de barras (el mayor ``limit`` que piden las fases)
+MD_INTERVALS = {config.KLINE_INTERVAL_FASE2: 250}
+
+_VERSION = 2
+_HDR = 9                        # int64 de cabecera
+_GEN_TTL = 5.0                  # seg que un lector reutiliza la generación del índice
+_INDEX_SIZE = 256 * 1024        # bytes para el JSON del índice
+
+# ─────────────────────────────────────────────────────────────
+#  Segmentos
+# ─────────────────────────────────────────────────────────────
+def segment_name(symbol: str, interval: str) -> str:
+    return f"{SHM_PREFIX}_{symbol}_{interval}"
+
+
+def _segment_size(capacity: int) -> int:
+    return 8 * (_HDR + 2 * capacity * len(COLUMNS))
+
+
+def _views(shm: shared_memory.SharedMemory):
+    import numpy as np
+    hdr = np.ndarray((_HDR,), dtype=np.int64, buffer=shm.buf)
+    cap, ncol = int(hdr[1]), int(hdr[2])
+    data = np.ndarray((2, ncol, cap), dtype=np.float64, buffer=shm.buf, offset=8 * _HDR)
+    return hdr, data
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Abre un segmento existente sin que el resource_tracker lo borre al salir."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+# ─────────────────────────────────────────────────────────────
+#  Lado lector (bots)
+# ─────────────────────────────────────────────────────────────
+_ATTACHED: dict[str, shared_memory.SharedMemory] = {}
+_REFS: dict[int, int] = {}       # id(shm) → referencias a su mmap sin vistas
+_RETIRED: list[shared_memory.SharedMemory] = []      # con vistas aún en uso
+_GEN = {"checked": -_GEN_TTL, "value": None}
+
+
+def _drop(name: str):
+    """Olvida el segmento abierto; se cierra cuando nadie usa sus vistas.
+
+    ``close()`` no falla aunque queden arrays de numpy sobre el mapeo (se
+    quedarían apuntando a memoria liberada), así que sólo se cierra cuando
+    las referencias a su ``mmap`` vuelven a las del momento de abrirlo.
+    """
+    shm = _ATTACHED.pop(name, None)
+    if shm is not None:
+        _RETIRED.append(shm)
+    for old in list(_RETIRED):
+        if sys.getrefcount(old._mmap) > _REFS[id(old)]:
+            continue                     # hay Klines que aún lo leen
+        _RETIRED.remove(old)
+        del _REFS[id(old)]
+        old.close()
+
+
+def _open(name: str, fresh: bool) -> shared_memory.SharedMemory:
+    shm = None if fresh else _ATTACHED.get(name)
+    if shm is None:
+        shm = _ATTACHED[name] = _attach(name)
+        _REFS[id(shm)] = sys.getrefcount(shm._mmap)
+    return shm
+
+
+def read_index() -> Optional[dict]:
+    """Índice publicado por el demonio o ``None`` si no está corriendo."""
+    name = f"{SHM_PREFIX}_index"
+    for fresh in (False, True):          # el mapeo puede ser de un demonio anterior
+        try:
+            shm = _open(name, fresh)
+        except FileNotFoundError:
+            return None
+        try:
+            (size,) = struct.unpack_from("<I", shm.buf, 0)
+            idx = json.loads(bytes(shm.buf[4:4 + size]))
+        except ValueError:
+            idx = None
+        if idx is not None and time.time() - idx.get("updated", 0) <= MD_STALE:
+            return idx
+        _drop(name)
+    return None
+
+
+def _generation() -> Optional[int]:
+    """Generación del demonio en marcha (se relee cada ``_GEN_TTL`` s)."""
+    now = time.monotonic()
+    if now - _GEN["checked"] >= _GEN_TTL:
+        idx = read_index()
+        _GEN.update(checked=now, value=idx.get("generation") if idx else None)
+    return _GEN["value"]
+
+
+def read_klines(symbol: str, interval: str, limit: int):
+    """:class:`klines.Klines` con las últimas ``limit`` barras, sin copia.
+
+    Devuelve ``None`` si el demonio no corre, el segmento no existe, no
+    alcanza ``limit`` barras o lleva más de ``MD_STALE`` segundos sin
+    refrescarse.
+    """
+    generation = _generation()
+    if generation is None:
+        return None
+    name = segment_name(symbol, interval)
+    for fresh in (False, True):
+        try:
+            shm = _open(name, fresh)
+        except FileNotFoundError:
+            return None
+        hdr, data = _views(shm)
+        if (int(hdr[0]) == _VERSION and int(hdr[8]) == generation
+                and time.time() * 1000 - int(hdr[7]) <= MD_STALE * 1000):
+            break
+        _drop(name)                      # retirado, de otra generación o viejo
+    else:
+        return None
+
+    slot = int(hdr[3])
+    rows = int(hdr[5 + slot])
+    if rows < limit:
+        return None
+    return Klines.from_matrix(data[slot, :, rows - limit:rows])   # vistas
+
+# ─────────────────────────────────────────────────────────────
+#  Lado escritor (demonio)
+# ─────────────────────────────────────────────────────────────
+class _Publisher:
+    def __init__(self):
+        self.segments: dict[str, shared_memory.SharedMemory] = {}
+        self.generation = time.time_ns()
+        self.index = self._create(f"{SHM_PREFIX}_index", _INDEX_SIZE)
+
+    def _create(self, name: str, size: int) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:          # restos de un demonio anterior
+            old = shared_memory.SharedMemory(name=name)
+            old.close(); old.unlink()
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def publish(self, symbol: str, interval: str, capacity: int, klines: list):
+        import numpy as np
+        name = segment_name(symbol, interval)
+        shm = self.segments.get(name)
+        if shm is None:
+            shm = self.segments[name] = self._create(name, _segment_size(capacity))
+            hdr = np.ndarray((_HDR,), dtype=np.int64, buffer=shm.buf)
+            hdr[:] = (_VERSION, capacity, len(COLUMNS), 0, 0, 0, 0, 0, self.generation)
+        hdr, data = _views(shm)
+
+        rows = min(len(klines), capacity)
+        slot = 1 - int(hdr[3])
+        arr = np.asarray([k[:len(COLUMNS)] for k in klines[-rows:]], dtype=np.float64)
+        data[slot, :, :rows] = arr.T
+        hdr[5 + slot] = rows
+        hdr[7] = int(time.time() * 1000)
+        hdr[3] = slot                                  # cambio de slot activo
+        hdr[4] += 1
+
+    def publish_index(self, symbols: list[str]):
+        raw = json.dumps({
+            "symbols": symbols,
+            "intervals": MD_INTERVALS,
+            "pid": os.getpid(),
+            "generation": self.generation,
+            "updated": time.time(),
+        }).encode()
+        if len(raw) + 4 > _INDEX_SIZE:
+            raise ValueError("índice de market data demasiado grande")
+        self.index.buf[4:4 + len(raw)] = raw
+        struct.pack_into("<I", self.index.buf, 0, len(raw))
+
+    def close(self):
+        import numpy as np
+        for shm in self.segments.values():
+            np.ndarray((_HDR,), dtype=np.int64, buffer=shm.buf)[0] = 0   # retirado
+        struct.pack_into("<I", self.index.buf, 0, 0)
+        for shm in [*self.segments.values(), self.index]:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+async def run_daemon(stop: asyncio.Event):
+    """Descarga el universo y sus klines cada ``MD_REFRESH`` segundos."""
+    from utils import _bin_sem, get_all_usdt_symbols
+
+    pub = _Publisher()
+    client = await asyncio.to_thread(config.get_client)
+
+    async def _refresh(sym: str, interval: str, cap: int):
+        try:
+            async with await _bin_sem():
+                kl = await asyncio.to_thread(
+                    client.get_klines, symbol=sym, interval=interval, limit=cap)
+            pub.publish(sym, interval, cap, kl)
+        except Exception as e:
+            logger.error(f"[market_data] {sym} {interval}: {e}")
+
+    try:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            symbols = await get_all_usdt_symbols()
+            await asyncio.gather(*[
+                _refresh(s, iv, cap)
+                for iv, cap in MD_INTERVALS.items() for s in symbols
+            ])
+            pub.publish_index(symbols)
+            logger.info(
+                f"[market_data] {len(symbols)} símbolos publicados en "
+                f"{time.perf_counter() - t0:.1f}s"
+            )
+            try:
+                await asyncio.wait_for(stop.wait(), MD_REFRESH)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        pub.close()
+
+
+def main():
+    from logging_setup import setup_logging
+    setup_logging(MD_LOG_FILE, MD_EVENTS_FILE)
+    config.MARKET_DATA_SHM = False          # el demonio siempre va a REST
+
+    async def _run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run_daemon(stop)
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# quotes.py – universo multi-quote y tipos de cambio a USDT
+# =====================================================================
+"""
+El bot puede operar pares de varias monedas de cotización
+(``QUOTE_ASSETS=USDT,FDUSD,USDC,BTC``; por defecto sólo USDT).  Volúmenes,
+stops y PnL se siguen expresando en USDT: :data:`CROSS_RATES` guarda cuántos
+USDT vale una unidad de cada activo y se rellena con la misma foto de
+precios en bloque del ``position_engine`` (ninguna petición extra).
+
+* :func:`split_symbol` – ``"ETHBTC"`` → ``("ETH", "BTC")`` (metadatos del
+  ``exchangeInfo``; si faltan, por sufijo) en lugar de ``symbol[:-4]``.
+* :func:`symbol_for_asset` – par con el que se gestiona un balance.
+* :func:`normalize_symbol` – ``/add BTC`` o la API → ``BTCUSDT``.
+"""
+import os
+import time
+from typing import Iterable, Optional
+
+QUOTE_ASSETS = tuple(
+    q.strip().upper() for q in os.getenv("QUOTE_ASSETS", "USDT").split(",") if q.strip()
+)
+RATES_MAX_AGE = 300              # seg – antigüedad máx. de la tabla de cambios
+
+_SYMBOL_META: dict[str, tuple[str, str]] = {}          # símbolo → (base, quote)
+_BY_LENGTH = sorted(set(QUOTE_ASSETS) | {"USDT"}, key=len, reverse=True)
+
+
+def register(symbol: str, base: str, quote: str):
+    _SYMBOL_META[symbol] = (base, quote)
+
+
+def split_symbol(symbol: str) -> tuple[str, str]:
+    """``(base, quote)`` de ``symbol``."""
+    meta = _SYMBOL_META.get(symbol)
+    if meta:
+        return meta
+    for quote in _BY_LENGTH:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    raise ValueError(f"cotización desconocida: {symbol}")
+
+
+def quote_of(symbol: str) -> str:
+    return split_symbol(symbol)[1]
+
+
+def base_of(symbol: str) -> str:
+    return split_symbol(symbol)[0]
+
+
+def normalize_symbol(raw: str) -> str:
+    """``"btc"`` → ``"BTCUSDT"``; un par con cotización conocida no cambia.
+    Sin cotización se usa la primera de ``QUOTE_ASSETS``."""
+    sym = str(raw).strip().upper()
+    if sym in _SYMBOL_META:
+        return sym
+    for quote in _BY_LENGTH:
+        if sym.endswith(quote) and len(sym) > len(quote):
+            return sym
+    return f"{sym}{QUOTE_ASSETS[0] if QUOTE_ASSETS else 'USDT'}"
+
+
+def symbol_for_asset(asset: str, universe: Iterable[str],
+                     held: Iterable[str] = ()) -> Optional[str]:
+    """Par con el que se gestiona ``asset``: el que ya está en ``held`` o,
+    si no, el de la primera cotización de ``QUOTE_ASSETS`` que exista."""
+    for sym in held:
+        if sym in _SYMBOL_META and _SYMBOL_META[sym][0] == asset:
+            return sym
+    universe = universe if isinstance(universe, (set, frozenset, dict)) else set(universe)
+    for quote in QUOTE_ASSETS:
+        sym = f"{asset}{quote}"
+        if sym in universe:
+            return sym
+    return None
+
+
+class CrossRates:
+    """USDT por unidad de cada activo, a partir de una foto de precios."""
+
+    def __init__(self):
+        self._rates: dict[str, float] = {"USDT": 1.0}
+        self.ts = 0.0
+
+    def update(self, prices: dict[str, float], ts: Optional[float] = None):
+        rates = {"USDT": 1.0}
+        for sym, price in prices.items():
+            if sym.endswith("USDT") and price > 0:
+                rates[sym[:-4]] = price
+        for sym, price in prices.items():       # USDT<X> (p. ej. USDTBRL)
+            if sym.startswith("USDT") and price > 0 and sym[4:] not in rates:
+                rates[sym[4:]] = 1 / price
+        self._rates = rates
+        self.ts = ts or time.time()
+
+    def rate(self, asset: str) -> Optional[float]:
+        return self._rates.get(asset)
+
+    def to_usdt(self, amount: float, asset: str) -> Optional[float]:
+        r = self._rates.get(asset)
+        return amount * r if r is not None else None
+
+    def fresh(self, max_age: float = RATES_MAX_AGE) -> bool:
+        return time.time() - self.ts < max_age
+
+
+CROSS_RATES = CrossRates()
+
+
+async def usdt_rate(asset: str) -> float:
+    """Tipo de ``asset`` a USDT; refresca la foto si la tabla está vieja."""
+    if asset == "USDT":
+        return 1.0
+    if not CROSS_RATES.fresh() or CROSS_RATES.rate(asset) is None:
+        from fases.position_engine import snapshot      # evita import circular
+        await snapshot(max_age=RATES_MAX_AGE)
+    rate = CROSS_RATES.rate(asset)
+    if rate is None:
+        raise ValueError(f"sin tipo de cambio para {asset}")
+    return rate
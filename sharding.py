@@ -0,0 +1,313 @@
+# sharding.py – reparto del universo entre varios nodos del bot
+# =====================================================================
+"""
+Modo por shards: varios procesos del bot (en máquinas/IPs distintas) se
+reparten el universo de ``get_all_usdt_symbols`` con hashing consistente y
+se coordinan a través de un fichero SQLite en un volumen compartido
+(``SHARD_STORE=/compartido/shards.db``; sin la variable el modo está
+apagado y todo funciona como siempre).
+
+* **Leases**: cada nodo renueva su fila en ``nodes`` cada
+  ``SHARD_HEARTBEAT`` segundos; si no renueva en ``SHARD_LEASE_TTL`` se da
+  por muerto y el anillo se recalcula sin él.  Con ``SHARD_VNODES`` nodos
+  virtuales por nodo, sólo cambia de dueño la parte del anillo del caído.
+* **Escaneo**: Fase 0, Fase 1 y el respaldo de Fase 3 sólo miran
+  :meth:`ShardCoordinator.mine`; sync sólo adopta balances de su shard.
+* **Candidatos**: cada ruptura se ofrece en ``candidates`` (el primero que
+  la ofrece se la queda).  Los candidatos de un nodo muerto los adopta el
+  nuevo dueño de su símbolo y los reserva en sus cuentas.
+* **Presupuesto**: ``positions`` lleva las posiciones abiertas de todos los
+  nodos por cuenta; :meth:`ShardCoordinator.acquire` reserva un hueco de
+  ``MAX_OPERACIONES_ACTIVAS`` de forma atómica antes de cada compra.
+
+Las tablas se concilian con el estado local en cada latido, así que ventas,
+descartes y compras fallidas liberan su fila sin ganchos extra.
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+import lanes
+from config import logger, SHUTTING_DOWN
+
+SHARD_STORE     = os.getenv("SHARD_STORE")
+SHARD_NODE_ID   = os.getenv("SHARD_NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+SHARD_HEARTBEAT = float(os.getenv("SHARD_HEARTBEAT", "10"))     # seg
+SHARD_LEASE_TTL = float(os.getenv("SHARD_LEASE_TTL", "30"))     # seg sin latido → caído
+SHARD_VNODES    = int(os.getenv("SHARD_VNODES", "64"))
+# tiempo que la posición de un nodo caído sigue contando en el presupuesto
+# mientras el sync del nuevo dueño la adopta (= SYNC_POS_INTERVAL)
+SHARD_ORPHAN_GRACE = float(os.getenv("SHARD_ORPHAN_GRACE", "900"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY, expires REAL NOT NULL, joined REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS candidates (
+    account TEXT NOT NULL, symbol TEXT NOT NULL, node_id TEXT NOT NULL,
+    source TEXT, ts REAL NOT NULL, PRIMARY KEY (account, symbol));
+CREATE TABLE IF NOT EXISTS positions (
+    account TEXT NOT NULL, symbol TEXT NOT NULL, node_id TEXT NOT NULL,
+    ts REAL NOT NULL, PRIMARY KEY (account, symbol));
+"""
+
+# ─────────────────────────────────────────────────────────────
+#  Anillo de hashing consistente
+# ─────────────────────────────────────────────────────────────
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Asigna cada símbolo a un nodo; ``vnodes`` puntos por nodo."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = SHARD_VNODES):
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted((_hash(f"{n}#{i}"), n) for n in self.nodes for i in range(vnodes))
+        self._keys = [h for h, _ in points]
+        self._owners = [n for _, n in points]
+
+    def owner(self, symbol: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(symbol)) % len(self._keys)
+        return self._owners[i]
+
+# ─────────────────────────────────────────────────────────────
+#  Coordinador
+# ─────────────────────────────────────────────────────────────
+class ShardCoordinator:
+    def __init__(self, path: Optional[str] = SHARD_STORE, node_id: str = SHARD_NODE_ID):
+        self.path = path
+        self.node_id = node_id
+        self.ring = HashRing([node_id])
+        self.open_counts: dict[str, int] = {}    # cuenta → posiciones de todos los nodos
+        self._schema_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # ───── SQLite ────────────────────────────────────────────────
+    def _connect(self) -> sqlite3.Connection:
+        # una conexión por operación: se usa desde hilos (carril ``bulk``)
+        con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        if not self._schema_ready:
+            con.executescript(_SCHEMA)
+            self._schema_ready = True
+        return con
+
+    # ───── shards ────────────────────────────────────────────────
+    def owns(self, symbol: str) -> bool:
+        return not self.enabled or self.ring.owner(symbol) == self.node_id
+
+    def mine(self, symbols: Iterable[str]) -> list[str]:
+        """Los ``symbols`` de este nodo (todos si el modo está apagado)."""
+        if not self.enabled:
+            return list(symbols)
+        return [s for s in symbols if self.ring.owner(s) == self.node_id]
+
+    def heartbeat(self, now: Optional[float] = None) -> list[str]:
+        """Renueva el lease y recalcula el anillo con los nodos vivos."""
+        now = now or time.time()
+        con = self._connect()
+        try:
+            con.execute(
+                "INSERT INTO nodes (node_id, expires, joined) VALUES (?, ?, ?) "
+                "ON CONFLICT(node_id) DO UPDATE SET expires = excluded.expires",
+                (self.node_id, now + SHARD_LEASE_TTL, now),
+            )
+            alive = [r[0] for r in con.execute(
+                "SELECT node_id FROM nodes WHERE expires > ?", (now,))]
+            counts = dict(con.execute(
+                "SELECT account, COUNT(*) FROM positions GROUP BY account"))
+        finally:
+            con.close()
+        if tuple(sorted(alive)) != self.ring.nodes:
+            logger.info(f"[shards] nodos vivos: {', '.join(sorted(alive))}")
+            self.ring = HashRing(alive)
+        self.open_counts = counts
+        return alive
+
+    def leave(self):
+        """Suelta el lease al apagar: el resto rebalancea sin esperar al TTL."""
+        con = self._connect()
+        try:
+            con.execute("UPDATE nodes SET expires = 0 WHERE node_id = ?", (self.node_id,))
+        finally:
+            con.close()
+
+    # ───── candidatos ────────────────────────────────────────────
+    def offer(self, account: str, symbol: str, source: str = "fase1") -> bool:
+        """Registra el candidato; ``False`` si otro nodo ya lo tiene."""
+        if not self.enabled:
+            return True
+        con = self._connect()
+        try:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO candidates VALUES (?, ?, ?, ?, ?)",
+                (account, symbol, self.node_id, source, time.time()),
+            )
+            if cur.rowcount:
+                return True
+            row = con.execute(
+                "SELECT node_id FROM candidates WHERE account = ? AND symbol = ?",
+                (account, symbol)).fetchone()
+            return row is not None and row[0] == self.node_id
+        finally:
+            con.close()
+
+    def adopt_orphans(self, now: Optional[float] = None) -> list[tuple[str, str, str]]:
+        """``(cuenta, símbolo, origen)`` de nodos caídos que ahora son de este nodo."""
+        now = now or time.time()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            rows = con.execute(
+                "SELECT c.account, c.symbol, c.source FROM candidates c "
+                "LEFT JOIN nodes n ON n.node_id = c.node_id "
+                "WHERE c.node_id != ? AND (n.expires IS NULL OR n.expires <= ?)",
+                (self.node_id, now),
+            ).fetchall()
+            mine = [r for r in rows if self.owns(r[1])]
+            con.executemany(
+                "UPDATE candidates SET node_id = ?, ts = ? WHERE account = ? AND symbol = ?",
+                [(self.node_id, now, a, s) for a, s, _ in mine],
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+        return mine
+
+    # ───── presupuesto global ────────────────────────────────────
+    def acquire(self, account: str, symbol: str, limit: int) -> bool:
+        """Reserva un hueco de ``limit`` para comprar ``symbol`` (atómico)."""
+        if not self.enabled:
+            return True
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            used = con.execute(
+                "SELECT COUNT(*) FROM positions WHERE account = ? AND symbol != ?",
+                (account, symbol)).fetchone()[0]
+            ok = used < limit
+            if ok:
+                con.execute("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?)",
+                            (account, symbol, self.node_id, time.time()))
+            con.execute("COMMIT")
+            return ok
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def release(self, account: str, symbol: str):
+        if not self.enabled:
+            return
+        con = self._connect()
+        try:
+            con.execute("DELETE FROM positions WHERE account = ? AND symbol = ? AND node_id = ?",
+                        (account, symbol, self.node_id))
+        finally:
+            con.close()
+
+    def global_open(self, account: str) -> int:
+        """Posiciones abiertas de ``account`` en todos los nodos (último latido)."""
+        return self.open_counts.get(account, 0)
+
+    # ───── conciliación con el estado local ──────────────────────
+    def reconcile(self, held: dict[str, tuple[set[str], set[str]]],
+                  now: Optional[float] = None):
+        """``held``: cuenta → ``(candidatos, posiciones)`` de este nodo.
+
+        Borra las filas propias que ya no existen en local, registra los
+        candidatos y las posiciones abiertas (también las adoptadas por sync)
+        y libera las posiciones de
+        nodos caídos hace más de ``SHARD_ORPHAN_GRACE`` que nadie adoptó.
+        """
+        now = now or time.time()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            for table, idx in (("candidates", 0), ("positions", 1)):
+                rows = con.execute(
+                    f"SELECT account, symbol, ts FROM {table} WHERE node_id = ?",
+                    (self.node_id,)).fetchall()
+                # un hueco recién reservado por ``acquire`` aún no es COMPRADA
+                fresh = now - SHARD_LEASE_TTL if table == "positions" else now
+                stale = [(a, s) for a, s, ts in rows
+                         if s not in held.get(a, (set(), set()))[idx] and ts <= fresh]
+                con.executemany(
+                    f"DELETE FROM {table} WHERE account = ? AND symbol = ? AND node_id = ?",
+                    [(a, s, self.node_id) for a, s in stale])
+            for account, (cands, positions) in held.items():
+                # /add, Fase 0 y Fase 3 también: así todo candidato es adoptable
+                con.executemany(
+                    "INSERT OR IGNORE INTO candidates VALUES (?, ?, ?, ?, ?)",
+                    [(account, s, self.node_id, "local", now) for s in cands])
+                con.executemany(
+                    "INSERT INTO positions VALUES (?, ?, ?, ?) ON CONFLICT(account, symbol) "
+                    "DO UPDATE SET node_id = excluded.node_id",
+                    [(account, s, self.node_id, now) for s in positions])
+            con.execute(
+                "DELETE FROM positions WHERE node_id != ? AND (node_id IN "
+                "(SELECT node_id FROM nodes WHERE expires <= ?) OR node_id NOT IN "
+                "(SELECT node_id FROM nodes))",
+                (self.node_id, now - SHARD_ORPHAN_GRACE))
+            con.execute("DELETE FROM nodes WHERE expires <= ?", (now - 2 * SHARD_ORPHAN_GRACE,))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+
+SHARDS = ShardCoordinator()
+
+# ─────────────────────────────────────────────────────────────
+#  Bucle de latido
+# ─────────────────────────────────────────────────────────────
+def _held(accounts) -> dict[str, tuple[set[str], set[str]]]:
+    out = {}
+    for acc in accounts:
+        cands, positions = set(), set()
+        for sym, rec in list(acc.state.items()):
+            status = rec if isinstance(rec, str) else rec.get("status", "")
+            if str(status).startswith("RESERVADA"):
+                cands.add(sym)
+            elif str(status).startswith(("COMPRADA", "VENDIENDO")):
+                positions.add(sym)
+        out[acc.name] = (cands, positions)
+    return out
+
+
+async def run_shards(accounts):
+    """Latido, rebalanceo y adopción de candidatos de nodos caídos."""
+    from event_bus import BUS, CandidateAdded
+    by_name = {acc.name: acc for acc in accounts}
+    try:
+        while not SHUTTING_DOWN.is_set():
+            try:
+                await lanes.run("bulk", SHARDS.heartbeat)
+                for name, sym, source in await lanes.run("bulk", SHARDS.adopt_orphans):
+                    acc = by_name.get(name)
+                    if acc is None or sym in acc.state:
+                        continue
+                    acc.state[sym] = {"status": "RESERVADA_PRE", "source": source or "shard"}
+                    BUS.publish(CandidateAdded(account=name, symbol=sym, source="shard"))
+                    logger.info(f"[shards] {acc.tag}candidato {sym} adoptado de un nodo caído")
+                await lanes.run("bulk", SHARDS.reconcile, _held(accounts))
+            except sqlite3.Error as e:
+                logger.warning(f"[shards] almacén compartido: {e}")
+            await asyncio.sleep(SHARD_HEARTBEAT)
+    finally:
+        await lanes.run("bulk", SHARDS.leave)
@@ -1,6 +1,7 @@
 # telegram_commands.py – control por Telegram
 # ==========================================
 import asyncio, os, sys, signal, subprocess, config
+import lanes
 
 from telegram import Update
 from telegram.ext import (
@@ -13,31 +14,35 @@ from config import (
     TELEGRAM_TOKEN,
     logger,
     FASE0_SETTINGS,
-    update_fase0_setting,
     update_min_entry_usdt,
     update_max_operaciones_activas,
 )
 
-from utils import get_step_size, send_telegram_message
-from binance.helpers import round_step_size
-from binance import exceptions as bexc
+from utils import get_step_size, send_telegram_message, get_all_usdt_symbols
+from accounts import PRIMARY, Account
+from event_bus import BUS, CandidateAdded
+from quotes import QUOTE_ASSETS, CrossRates, normalize_symbol, quote_of, symbol_for_asset
 
 
 # ────────────────────────────────────────────────────────────────
-async def _liquidate_all(client):
-    """Vende todo el balance spot (excepto USDT) y reporta fallos."""
-    account = await asyncio.to_thread(client.get_account)
+async def _liquidate_all(client, tag: str = ""):
+    """Vende todo el balance spot (excepto las cotizaciones) y reporta fallos."""
+    from binance.helpers import round_step_size
+    account = await lanes.run("account", client.get_account)
+    universe = set(await get_all_usdt_symbols())
     tasks = []
     for bal in account["balances"]:
         asset = bal["asset"]
         qty   = float(bal["free"]) + float(bal["locked"])
-        if asset == "USDT" or qty == 0:
+        if asset in QUOTE_ASSETS or qty == 0:
+            continue
+        sym  = symbol_for_asset(asset, universe)
+        if sym is None:
             continue
-        sym  = f"{asset}USDT"
         step = await get_step_size(sym)
         qty  = round_step_size(qty, step)
-        tasks.append(asyncio.to_thread(
-            client.create_order,
+        tasks.append(lanes.run(
+            "orders", client.create_order,
             symbol=sym, side="SELL", type="MARKET", quantity=qty
         ))
 
@@ -50,9 +55,9 @@ async def _liquidate_all(client):
             failed.append(str(res))
 
     if sold:
-        await send_telegram_message("✅ Vendido: " + ", ".join(sold))
+        await send_telegram_message(f"✅ {tag}Vendido: " + ", ".join(sold))
     if failed:
-        await send_telegram_message("⚠️ Falló venta de algunas posiciones:\n" +
+        await send_telegram_message(f"⚠️ {tag}Falló venta de algunas posiciones:\n" +
                                     "\n".join(failed))
     return not failed          # True si todo OK
 
@@ -61,11 +66,24 @@ def build_telegram_app(
         state_dict: dict,
         exclusion_dict: dict,
         paused_event,             # ← PAUSED  (asyncio.Event)
-        shutdown_event):          # ← SHUTTING_DOWN (asyncio.Event)
+        shutdown_event,           # ← SHUTTING_DOWN (asyncio.Event)
+        accounts=None):           # ← lista de accounts.Account (opcional)
     """
     Devuelve la Application de python-telegram-bot con todos los handlers.
+    ``/add``, ``/elimina``, ``/listar`` y ``/fase3`` aceptan el nombre de la
+    cuenta como último argumento (por defecto la principal); ``/apagar``
+    liquida todas y ``/cuentas`` las resume.
     """
     app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    primary = (accounts[0] if accounts
+               else Account(PRIMARY, state=state_dict, exclusion=exclusion_dict))
+    by_name = {a.name.lower(): a for a in accounts or [primary]}
+
+    def _account(ctx, idx: int):
+        """Cuenta nombrada en ``ctx.args[idx]`` (la principal si falta); ``None`` si no existe."""
+        if len(ctx.args) <= idx:
+            return primary
+        return by_name.get(ctx.args[idx].lower())
 
     # ---------- errores de red ----------
     from telegram.error import NetworkError
@@ -94,10 +112,14 @@ def build_telegram_app(
     async def shutdown_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("♻️ Vendiendo todo y apagando…")
         shutdown_event.set()             # avisa a los loops que salgan
-        try:
-            await _liquidate_all(config.client)
-        except Exception as e:
-            await update.message.reply_text(f"Error vendiendo: {e}")
+        targets = list(by_name.values())
+        results = await asyncio.gather(
+            *[_liquidate_all(acc.client, acc.tag) for acc in targets],
+            return_exceptions=True,
+        )
+        for acc, res in zip(targets, results):
+            if isinstance(res, Exception):
+                await update.message.reply_text(f"{acc.tag}Error vendiendo: {res}")
         await asyncio.sleep(2)
         sys.exit(0)                      # proceso terminará; tmux / systemd lo maneja
 
@@ -109,44 +131,62 @@ def build_telegram_app(
     # ---------- /add ----------
     async def add_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         if not ctx.args:
-            return await update.message.reply_text("Uso: /add BTC   (o BTCUSDT)")
+            return await update.message.reply_text("Uso: /add BTC [cuenta]   (o BTCUSDT)")
+        acc = _account(ctx, 1)
+        if acc is None:
+            return await update.message.reply_text(f"Cuenta desconocida: {ctx.args[1]}")
         raw = ctx.args[0].upper()
-        sym = raw if raw.endswith("USDT") else f"{raw}USDT"
-        if sym in state_dict:
-            msg = f"{sym} ya está en lista."
-        else:
-            state_dict[sym] = "RESERVADA"
-            msg = f"{sym} añadido a Fase 2."
+        sym = normalize_symbol(raw)
+        if sym in acc.state:
+            msg = f"{acc.tag}{sym} ya está en lista."
+        else:                            # igual que POST /candidates
+            acc.state[sym] = {"status": "RESERVADA_PRE", "manual": True}
+            BUS.publish(CandidateAdded(account=acc.name, symbol=sym, source="telegram"))
+            msg = f"{acc.tag}{sym} añadido a Fase 2."
         await update.message.reply_text(msg)
-        logger.info(f"/add {sym}")
+        logger.info(f"/add {acc.tag}{sym}")
 
     # ---------- /elimina ----------
     async def del_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         if not ctx.args:
-            return await update.message.reply_text("Uso: /elimina BTC")
+            return await update.message.reply_text("Uso: /elimina BTC [cuenta]")
+        acc = _account(ctx, 1)
+        if acc is None:
+            return await update.message.reply_text(f"Cuenta desconocida: {ctx.args[1]}")
         raw = ctx.args[0].upper()
-        sym = raw if raw.endswith("USDT") else f"{raw}USDT"
-        if state_dict.pop(sym, None) is not None:
-            exclusion_dict.pop(sym, None)
-            msg = f"{sym} eliminado."
+        sym = normalize_symbol(raw)
+        tag = acc.tag
+        # el bloqueo se levanta aunque el símbolo ya no esté en la lista
+        removed = acc.state.pop(sym, None) is not None
+        unblocked = acc.exclusion.unblock(sym)
+        if removed:
+            msg = f"{tag}{sym} eliminado."
+        elif unblocked:
+            msg = f"{tag}{sym} desbloqueado."
         else:
-            msg = f"{sym} no estaba en lista."
+            msg = f"{tag}{sym} no estaba en lista."
         await update.message.reply_text(msg)
-        logger.info(f"/elimina {sym}")
+        logger.info(f"/elimina {tag}{sym}")
     # ---------- /listar ----------
     async def listar_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        acc = _account(ctx, 0)
+        if acc is None:
+            return await update.message.reply_text(f"Cuenta desconocida: {ctx.args[0]}")
+        client = acc.client
         activos = [
-            (sym, rec) for sym, rec in state_dict.items()
+            (sym, rec) for sym, rec in acc.state.items()
             if isinstance(rec, dict) and rec.get("status", "").startswith("COMPRADA")
         ]
         reservadas = [
-            s for s, r in state_dict.items()
+            s for s, r in acc.state.items()
             if isinstance(r, dict) and r.get("status") == "RESERVADA_PRE"
         ]
 
-        all_tickers = await asyncio.to_thread(config.client.get_all_tickers)
+        all_tickers = await lanes.run("market", client.get_all_tickers)
         prices = {ticker['symbol']: float(ticker['price']) for ticker in all_tickers}
-        account = await asyncio.to_thread(config.client.get_account)
+        rates = CrossRates()
+        rates.update(prices)
+        account = await lanes.run("account", client.get_account)
         free_usdt_balance = 0.0
         total_usdt_value = 0.0
         for bal in account["balances"]:
@@ -158,15 +198,15 @@ def build_telegram_app(
                 free_usdt_balance = float(bal["free"])
                 total_usdt_value += total_qty
             else:
-                price = prices.get(f"{asset}USDT")
-                if price:
-                    total_usdt_value += total_qty * price
+                value = rates.to_usdt(total_qty, asset)
+                if value:
+                    total_usdt_value += value
 
         header = (
-            f"🎯 {len(activos)}/{config.MAX_OPERACIONES_ACTIVAS} operaciones activas\n"
+            f"🎯 {acc.tag}{len(activos)}/{acc.get('MAX_OPERACIONES_ACTIVAS')} operaciones activas\n"
             f"💵 Saldo Libre: {free_usdt_balance:.2f} USDT\n"
             f"💰 Saldo Total: ~{total_usdt_value:.2f} USDT\n"
-            f"Δ‑stop={config.STOP_DELTA_USDT} USDT  stop_abs={config.STOP_ABS_USDT} USDT"
+            f"Δ‑stop={acc.get('STOP_DELTA_USDT')} USDT  stop_abs={acc.get('STOP_ABS_USDT')} USDT"
         )
 
         body = []
@@ -174,9 +214,13 @@ def build_telegram_app(
             body.append("💰 Posiciones abiertas:")
             for sym, rec in activos:
                 qty = rec["quantity"]
-                tkr = await asyncio.to_thread(config.client.get_symbol_ticker, symbol=sym)
-                last = float(tkr["price"])
-                pnl = last * qty - rec["entry_cost"]
+                last = prices.get(sym)
+                if last is None:
+                    continue
+                value = rates.to_usdt(last * qty, quote_of(sym))
+                if value is None:
+                    continue
+                pnl = value - rec["entry_cost"]
                 pct = 100 * pnl / rec["entry_cost"]
                 body.append(
                     f"{sym}: PnL={pnl:+.2f}\u202F({pct:+.2f}\u202F%) | "
@@ -188,12 +232,51 @@ def build_telegram_app(
             body.append("  " + ", ".join(reservadas))
 
         await update.message.reply_text("\n".join([header, *body]))
+    # ---------- /cuentas ----------
+    async def cuentas_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        if not accounts:
+            return await update.message.reply_text("Sólo la cuenta principal.")
+        lines = []
+        for acc in accounts:
+            activas = sum(
+                1 for r in acc.state.values()
+                if isinstance(r, dict) and r.get("status", "").startswith("COMPRADA")
+            )
+            lines.append(
+                f"{acc.name}: {activas}/{acc.get('MAX_OPERACIONES_ACTIVAS')} activas • "
+                f"Δ‑stop={acc.get('STOP_DELTA_USDT')} stop_abs={acc.get('STOP_ABS_USDT')} "
+                f"entry={acc.get('MIN_ENTRY_USDT')}"
+            )
+        await update.message.reply_text("\n".join(lines))
+
+    # ---------- /latencia ----------
+    async def latencia_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        import execution
+        await update.message.reply_text(execution.latency_report())
+
+    # ---------- /stops ----------
+    async def stops_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        from fases.position_engine import stops_report
+        await update.message.reply_text(stops_report())
+
+    # ---------- /lanes ----------
+    async def lanes_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        await update.message.reply_text(lanes.lanes_report())
+
+    # ---------- /lag ----------
+    async def lag_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+        from loop_watchdog import watchdog_report
+        await update.message.reply_text(watchdog_report())
+
     # ---------- /fase3 ----------
     async def phase3_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
-        from fases.fase3 import phase3_search_new_candidates
-        await phase3_search_new_candidates(state_dict, 1, exclusion_dict)
-        await update.message.reply_text("Fase 3 encolada / ejecutada.")
-        logger.info("/fase3 manual")
+        from fases.fase3 import phase3_replenish
+        acc = _account(ctx, 0)
+        if acc is None:
+            return await update.message.reply_text(f"Cuenta desconocida: {ctx.args[0]}")
+        await phase3_replenish(acc.state, acc.exclusion, 1, acc)
+        await update.message.reply_text(f"{acc.tag}Fase 3 encolada / ejecutada.")
+        logger.info(f"/fase3 manual {acc.name}")
 
     # ---------- /set ----------
     async def set_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
@@ -209,51 +292,35 @@ def build_telegram_app(
             )
         sub = ctx.args[0].lower()
 
-         # dentro de set_cmd
-        # activar / desactivar DRY_RUN
-        if sub == "dry" and ctx.args[1].lower() in {"on", "off"}:
-            config.DRY_RUN = ctx.args[1].lower() == "on"
-            await update.message.reply_text(f"✅ DRY_RUN = {config.DRY_RUN}")
-            logger.info(f"/set dry {config.DRY_RUN}")
+        # activar / desactivar DRY_RUN, modo ligero
+        # (todo pasa por config.update_setting → SettingsChanged en el bus)
+        if sub in {"dry", "light"} and ctx.args[1].lower() in {"on", "off"}:
+            key = "DRY_RUN" if sub == "dry" else "LIGHT_MODE"
+            config.update_setting(key, ctx.args[1])
+            await update.message.reply_text(f"✅ {key} = {getattr(config, key)}")
+            logger.info(f"/set {sub} {getattr(config, key)}")
             return
         # stop_delta / stop_abs
         if sub in {"stop_delta", "stop_abs"} and len(ctx.args) == 2:
-            try:
-                val = float(ctx.args[1])
-            except ValueError:
+            key = "STOP_DELTA_USDT" if sub == "stop_delta" else "STOP_ABS_USDT"
+            if config.update_setting(key, ctx.args[1]):
                 return await update.message.reply_text("Debe ser numérico.")
-            if sub == "stop_delta":
-                config.STOP_DELTA_USDT = val
-            else:
-                config.STOP_ABS_USDT = val
+            val = getattr(config, key)
             await update.message.reply_text(f"✅ {sub} = {val}")
             logger.info(f"/set {sub} {val}")
             return
 
-        # light mode
-        if sub == "light" and ctx.args[1].lower() in {"on", "off"}:
-            config.LIGHT_MODE = ctx.args[1].lower() == "on"
-            await update.message.reply_text(f"✅ LIGHT_MODE = {config.LIGHT_MODE}")
-            logger.info(f"/set light {config.LIGHT_MODE}")
-            return
-
         # tamaño de entrada
         if sub in {"entry", "size"} and len(ctx.args) == 2:
-            try:
-                val = float(ctx.args[1])
-                if val < 5:
-                    raise ValueError
-            except ValueError:
+            if config.update_setting("MIN_ENTRY_USDT", ctx.args[1]):
                 return await update.message.reply_text("Debe ser un número ≥ 5 USDT.")
-
-            config.MIN_ENTRY_USDT = val   # cambia en caliente
             await update.message.reply_text(f"✅ Tamaño entrada = {config.MIN_ENTRY_USDT}")
-            logger.info(f"/set entry {val}")
+            logger.info(f"/set entry {config.MIN_ENTRY_USDT}")
             return
 
         # parámetros de Fase 0
         if sub == "fase0" and len(ctx.args) == 3:
-            err = update_fase0_setting(ctx.args[1], ctx.args[2])
+            err = config.update_setting(f"fase0.{ctx.args[1]}", ctx.args[2])
             val = FASE0_SETTINGS.get(ctx.args[1], "?")
             msg = "❌ " + err if err else f"✅ Fase0 {ctx.args[1]} = {val}"
             return await update.message.reply_text(msg)
@@ -279,8 +346,8 @@ def build_telegram_app(
     # ---------- /gitpull ----------
     async def gitpull_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⏳ Actualizando código…")
-        proc = await asyncio.to_thread(
-            subprocess.run,
+        proc = await lanes.run(
+            "bulk", subprocess.run,
             ["git", "pull", "origin", "main"],
             capture_output=True,
             text=True,
@@ -298,6 +365,11 @@ def build_telegram_app(
     app.add_handler(CommandHandler("maxcandidatos", maxcandidatos_cmd))
     app.add_handler(CommandHandler("gitpull",  gitpull_cmd))
     app.add_handler(CommandHandler("fase3",    phase3_cmd))
+    app.add_handler(CommandHandler("cuentas",  cuentas_cmd))
+    app.add_handler(CommandHandler("latencia", latencia_cmd))
+    app.add_handler(CommandHandler("stops",    stops_cmd))
+    app.add_handler(CommandHandler("lanes",    lanes_cmd))
+    app.add_handler(CommandHandler("lag",      lag_cmd))
     app.add_handler(CommandHandler("set",      set_cmd))
 
     app.add_handler(CommandHandler("pausa",    pause_cmd))
@@ -8,27 +8,66 @@ pequeños cachés con TTL para reducir peticiones repetitivas.
 
 # utils.py – indicadores, Binance helpers y antiflood Telegram
 # ============================================================
+from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import contextlib
+import importlib
+import sys
+from types import ModuleType
+from typing import Optional, TYPE_CHECKING
 
-import numpy as np
-import pandas as pd
-import telegram.error
-from binance import exceptions as bexc
-from binance.client import Client
 import math
+import time
+import config
+from logging_setup import log_event
+import quotes
+import cooldowns
+import lanes
 from config import (
-    client, logger, telegram_bot, TELEGRAM_CHAT_ID,
+    logger, TELEGRAM_CHAT_ID,
     STOP_ABS_HIGH_FACTOR, STOP_ABS_HIGH_THRESHOLD,
 )
 
+if TYPE_CHECKING:
+    from binance.client import Client
+    from klines import Klines
+
+# ─────────────────────────────────────────────────────────────
+#  Importes perezosos (pandas / numpy / binance / telegram)
+# ─────────────────────────────────────────────────────────────
+class _LazyModule(ModuleType):
+    """Módulo que se importa de verdad en el primer acceso a un atributo."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_mod"] = None
+
+    def __getattr__(self, attr: str):
+        mod = self.__dict__["_mod"]
+        if mod is None:
+            mod = importlib.import_module(self.__name__)
+            self.__dict__["_mod"] = mod
+        return getattr(mod, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Devuelve ``name`` ya importado o un proxy que lo importa al usarse."""
+    return sys.modules.get(name) or _LazyModule(name)
+
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+bexc = lazy_import("binance.exceptions")
+_tg_error = lazy_import("telegram.error")
+
 # ─────────────────────────────────────────────────────────────
 #  Cachés simples con TTL
 # ─────────────────────────────────────────────────────────────
 
 _SYMBOLS_CACHE: dict[str, tuple[float, list[str]]] = {}
-_HIST_CACHE: dict[tuple[str, str, int], tuple[float, pd.DataFrame]] = {}
+# (symbol, interval) → (ts, limit descargado, Klines)
+_HIST_CACHE: dict[tuple[str, str], tuple[float, int, "Klines"]] = {}
 
 # TTL por defecto
 SYMBOLS_TTL = 1800  # seg – listado de pares USDT
@@ -47,9 +86,9 @@ async def send_telegram_message(msg: str):
     async with await _tg_lock():
         for att in range(3):
             try:
-                await telegram_bot.send_message(TELEGRAM_CHAT_ID, text=msg)
+                await config.get_telegram_bot().send_message(TELEGRAM_CHAT_ID, text=msg)
                 break
-            except telegram.error.TimedOut:
+            except _tg_error.TimedOut:
                 logger.warning(f"TG TimedOut {att+1}/3")
                 await asyncio.sleep(4)
             except Exception as e:
@@ -74,70 +113,105 @@ async def _bin_sem() -> asyncio.Semaphore:
 #  Binance helpers
 # ─────────────────────────────────────────────────────────────
 async def get_all_usdt_symbols(ttl: int = SYMBOLS_TTL) -> list[str]:
-    """Lista de pares *USDT* filtrados. Usa caché con TTL en segundos."""
+    """Pares de las cotizaciones ``QUOTE_ASSETS`` (por defecto sólo USDT)
+    filtrados. Usa caché con TTL en segundos."""
     now = asyncio.get_event_loop().time()
     ts, cached = _SYMBOLS_CACHE.get("ts", 0.0), _SYMBOLS_CACHE.get("data")
     if cached and now - ts < ttl:
         return cached
 
+    if config.MARKET_DATA_SHM:
+        import market_data
+        idx = market_data.read_index()
+        if idx:
+            return idx["symbols"]
+
     async with await _bin_sem():
-        info = await asyncio.to_thread(client.get_exchange_info)
+        info = await lanes.run("bulk", config.get_client().get_exchange_info)
 
     excluded = {"BUSD", "USDC", "TUSD", "EUR", "AUD", "BRL", "IDRT",
                 "PAX", "USDP", "DAI", "XUSD", "USD1", "VIDT", "FDUSD","EURI"}
 
-    symbols = [
-        s["symbol"] for s in info["symbols"]
+    symbols = []
+    for s in info["symbols"]:
         if (
             s["status"] == "TRADING"
             and s["isSpotTradingAllowed"]
-            and s["quoteAsset"] == "USDT"
+            and s["quoteAsset"] in quotes.QUOTE_ASSETS
+            # un saldo de una cotización (p. ej. BTC) es para comprar, no una
+            # posición: sync no lo adopta, así que tampoco se opera su par
+            and s["baseAsset"] not in quotes.QUOTE_ASSETS
             and s["baseAsset"] not in excluded
-        )
-    ]
+        ):
+            quotes.register(s["symbol"], s["baseAsset"], s["quoteAsset"])
+            symbols.append(s["symbol"])
     _SYMBOLS_CACHE["ts"] = now
     _SYMBOLS_CACHE["data"] = symbols
     return symbols
 
-async def get_historical_data(symbol: str, interval: str, limit: int = 100,
-                              ttl: int = HIST_TTL) -> Optional[pd.DataFrame]:
-    """Obtiene klines de Binance usando caché con TTL."""
-    key = (symbol, interval, limit)
+_INTERVAL_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def interval_seconds(interval: str) -> int:
+    """Duración de una vela de Binance: ``"4h"`` → 14400."""
+    return int(interval[:-1]) * _INTERVAL_UNITS[interval[-1]]
+
+
+async def get_klines(symbol: str, interval: str, limit: int = 100,
+                     ttl: int = HIST_TTL, lane: str = "bulk") -> Optional["Klines"]:
+    """Obtiene klines de Binance como :class:`klines.Klines` con caché TTL.
+
+    La caché guarda una sola serie por ``(symbol, interval)``: una petición
+    con ``limit`` menor que la ya descargada devuelve una rebanada (vista)
+    de ésta.  Con ``MARKET_DATA_SHM`` lee primero del demonio
+    ``market_data`` (sin copia, no se cachea) y sólo cae a REST si no hay
+    segmento fresco.  Los escaneos van por el carril ``bulk`` (con el
+    semáforo de Binance); lo que decide una salida pasa ``lane="market"``.
+    """
+    if config.MARKET_DATA_SHM:
+        import market_data
+        kl = market_data.read_klines(symbol, interval, limit)
+        if kl is not None:
+            return kl
+
+    from klines import Klines
+    key = (symbol, interval)
     now = asyncio.get_event_loop().time()
     if key in _HIST_CACHE:
-        ts, cached = _HIST_CACHE[key]
-        if now - ts < ttl:
-            return cached
+        ts, fetched, cached = _HIST_CACHE[key]
+        if now - ts < ttl and fetched >= limit:
+            return cached[-limit:]
 
     try:
-        async with await _bin_sem():
-            klines = await asyncio.to_thread(
-                client.get_klines,
+        sem = await _bin_sem() if lane == "bulk" else contextlib.nullcontext()
+        async with sem:
+            payload = await lanes.run(
+                lane,
+                config.get_client().get_klines,
                 symbol=symbol,
                 interval=interval,
                 limit=limit,
             )
 
-        df = pd.DataFrame(klines, columns=[
-            "open_time", "open", "high", "low", "close", "volume",
-            "close_time", "qav", "num_trades", "tbbav", "tbqav", "ignore"
-        ])
-        df[["open", "high", "low", "close", "volume"]] = (
-            df[["open", "high", "low", "close", "volume"]].astype(float)
-        )
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-        df.set_index("open_time", inplace=True)
-        _HIST_CACHE[key] = (now, df)
-        return df
+        kl = Klines.from_payload(payload)
+        _HIST_CACHE[key] = (now, limit, kl)
+        return kl
 
     except bexc.BinanceAPIException as e:
-        logger.error(f"BinanceAPIException {symbol}: {e}")
+        logger.error(f"BinanceAPIException {symbol}: {e}", extra={"symbol": symbol})
     except Exception as e:
-        logger.error(f"Históricos {symbol}: {e}")
+        logger.error(f"Históricos {symbol}: {e}", extra={"symbol": symbol})
 
     return None
 
 
+async def get_historical_data(symbol: str, interval: str, limit: int = 100,
+                              ttl: int = HIST_TTL) -> Optional[pd.DataFrame]:
+    """Como :func:`get_klines` pero devuelve un DataFrame (formato antiguo)."""
+    kl = await get_klines(symbol, interval, limit, ttl)
+    return kl.to_frame() if kl is not None else None
+
+
 # ─────────────────────────────────────────────────────────────
 #  Indicadores técnicos
 # ─────────────────────────────────────────────────────────────
@@ -196,6 +270,23 @@ def get_volume_avg(volume_series: pd.Series, period: int = 20) -> float:
         return float(volume_series.mean())
     return float(volume_series.tail(period).mean())
 
+
+def get_rvol(volume, period: int = 20) -> float:
+    """Volumen relativo: última barra / media de las ``period`` anteriores."""
+    v = np.asarray(volume, dtype=np.float64)
+    base = v[-period - 1:-1]
+    mean = base.mean() if len(base) else 0.0
+    return float(v[-1] / mean) if mean > 0 else 0.0
+
+
+def get_cvd(kl: "Klines", bars: int) -> float:
+    """Delta de volumen acumulado (en la cotización del par) de las últimas ``bars`` velas.
+
+    Sale de las columnas taker que ya trae cada kline (sin peticiones):
+    compras taker − ventas taker = ``2·tbqav − qav``.
+    """
+    return float(np.sum(2 * kl.tbqav[-bars:] - kl.qav[-bars:]))
+
 # ─────────────────────────────────────────────────────────────
 #  Stops y triggers
 # ─────────────────────────────────────────────────────────────
@@ -250,13 +341,19 @@ def update_light_stops(rec: dict, qty: float, last_price: float,
 _STEP_CACHE: dict[str, float] = {}
 
 _FILTER_CACHE: dict[str, tuple[float, float]] = {}
+_FULL_FILTER_CACHE: dict[str, tuple[float, float, float]] = {}
+
+
+def filters_cached(symbol: str) -> bool:
+    """True si los filtros de ``symbol`` ya están en caché (ruta de órdenes)."""
+    return symbol in _FILTER_CACHE and symbol in _FULL_FILTER_CACHE
 
 async def get_step_size(symbol: str) -> float:
     if symbol in _STEP_CACHE:
         return _STEP_CACHE[symbol]
 
-    async with await _bin_sem():
-        info = await asyncio.to_thread(client.get_symbol_info, symbol=symbol)
+    # carril "market", sin el semáforo del escaneo: esto está en la ruta de órdenes
+    info = await lanes.run("market", config.get_client().get_symbol_info, symbol=symbol)
 
     for flt in info["filters"]:
         if flt["filterType"] == "LOT_SIZE":
@@ -270,8 +367,8 @@ async def get_market_filters(symbol: str) -> tuple[float, float]:
     if symbol in _FILTER_CACHE:
         return _FILTER_CACHE[symbol]
 
-    async with await _bin_sem():
-        info = await asyncio.to_thread(client.get_symbol_info, symbol=symbol)
+    # carril "market", sin el semáforo del escaneo: esto está en la ruta de órdenes
+    info = await lanes.run("market", config.get_client().get_symbol_info, symbol=symbol)
 
     step, min_notional = 0.000001, 0.0
     for flt in info["filters"]:
@@ -290,28 +387,39 @@ async def get_market_filters(symbol: str) -> tuple[float, float]:
 
 async def get_available_qty(client: Client, symbol: str) -> float:
     """Return free balance for ``symbol`` base asset."""
-    asset = symbol[:-4]
-    bal = await asyncio.to_thread(client.get_asset_balance, asset=asset)
+    asset = quotes.base_of(symbol)
+    bal = await lanes.run("account", client.get_asset_balance, asset=asset)
     return float(bal["free"])
 
 
 async def get_full_market_filters(client: Client, symbol: str):
-    """Return ``(stepSize, minQty, minNotional)`` for ``symbol``."""
-    info = await asyncio.to_thread(client.get_symbol_info, symbol=symbol)
+    """Return ``(stepSize, minQty, minNotional)`` for ``symbol`` (cached)."""
+    if symbol in _FULL_FILTER_CACHE:
+        return _FULL_FILTER_CACHE[symbol]
+    info = await lanes.run("market", client.get_symbol_info, symbol=symbol)
     lot = next(f for f in info["filters"] if f["filterType"] == "LOT_SIZE")
     min_notional = next(
         (f for f in info["filters"] if f["filterType"] == "MIN_NOTIONAL"), None
     )
-    return (
+    out = (
         float(lot["stepSize"]),
         float(lot["minQty"]),
         float(min_notional["minNotional"]) if min_notional else 0.0,
     )
+    _FULL_FILTER_CACHE[symbol] = out
+    return out
 
 
-async def safe_market_sell(client: Client, symbol: str, raw_qty: float):
-    """Safely execute a market sell respecting filters."""
+async def safe_market_sell(client: Client, symbol: str, raw_qty: float,
+                           hint_price: Optional[float] = None,
+                           signal_ts: Optional[float] = None):
+    """Safely execute a market sell respecting filters.
+
+    ``hint_price`` (the price that triggered the exit) avoids a ticker call
+    for the MIN_NOTIONAL check; ``signal_ts`` feeds the latency tracker.
+    """
     from config import DRY_RUN
+    import execution
     step, min_qty, min_notional = await get_full_market_filters(client, symbol)
     available = min(raw_qty, await get_available_qty(client, symbol))
 
@@ -322,12 +430,12 @@ async def safe_market_sell(client: Client, symbol: str, raw_qty: float):
     if qty < min_qty - 1e-12:
         return False, f"qty<{min_qty} LOT_SIZE (dust)"
 
-    price = 0.0
+    price = hint_price or 0.0
     # Se necesita el precio para la simulación en DRY_RUN o para el filtro MIN_NOTIONAL
-    if DRY_RUN or min_notional:
+    if not price and (DRY_RUN or min_notional):
         try:
-            price = float((await asyncio.to_thread(
-                client.get_symbol_ticker, symbol=symbol))["price"])
+            price = float((await lanes.run(
+                "market", client.get_symbol_ticker, symbol=symbol))["price"])
         except bexc.BinanceAPIException as e:
             return False, f"error al obtener ticker para venta: {e.code}:{e.message}"
 
@@ -343,63 +451,105 @@ async def safe_market_sell(client: Client, symbol: str, raw_qty: float):
             "fills": []
         }
     try:
-        order = await asyncio.to_thread(
-            client.create_order,
-            symbol=symbol, side="SELL", type="MARKET", quantity=qty
+        order = await execution.submit_market_order(
+            client, symbol, "SELL", signal_ts, quantity=qty
         )
         return True, order
     except bexc.BinanceAPIException as e:
         return False, f"error {e.code}:{e.message}"
 
 
+_BNB_PRICE: dict[str, float] = {}
+BNB_TTL = 600       # seg – precio BNB para comisiones
+
+
+async def get_bnb_price(client, force: bool = False) -> float:
+    """Precio BNBUSDT con caché (``execution.keep_warm`` lo refresca)."""
+    now = time.time()
+    if not force and now - _BNB_PRICE.get("ts", 0.0) < BNB_TTL:
+        return _BNB_PRICE["price"]
+    price = float((await lanes.run(
+        "market", client.get_symbol_ticker, symbol="BNBUSDT"))["price"])
+    _BNB_PRICE.update(ts=now, price=price)
+    return price
+
+
 async def fee_to_usdt(client, fills, quote="USDT") -> float:
-    """Calcula la comisión total de una orden en USDT."""
+    """Calcula la comisión total de una orden en USDT.
+
+    ``quote`` es la cotización del par; las comisiones en ``quote`` o en el
+    activo base se pasan a USDT con :data:`quotes.CROSS_RATES`.
+    """
     total = 0.0
     for f in fills:
         comm = float(f["commission"])
         asset = f["commissionAsset"]
         if comm == 0:
             continue
-        if asset == quote:
+        if asset == "USDT":
             total += comm
         elif asset == "BNB":
-            bnb_price = float((await asyncio.to_thread(
-                client.get_symbol_ticker, symbol="BNBUSDT"))["price"])
-            total += comm * bnb_price
+            total += comm * await get_bnb_price(client)
+        elif asset == quote:
+            total += comm * await quotes.usdt_rate(quote)
         else:
-            # Para ventas, el precio del fill es en USDT
-            total += comm * float(f["price"])
+            # comisión en el activo base: el precio del fill va en ``quote``
+            total += comm * float(f["price"]) * await quotes.usdt_rate(quote)
     return total
 
 
-async def process_sell_and_notify(client, symbol: str, rec: dict, exit_price: float, exit_reason: str, exclusion_dict: dict):
+async def process_sell_and_notify(client, symbol: str, rec: dict, exit_price: float, exit_reason: str, exclusion_dict: dict,
+                                  tag: str = "", signal_ts: Optional[float] = None) -> bool:
     """
     Procesa una venta: ejecuta la orden, calcula PnL, notifica y registra.
+    ``tag`` prefija los mensajes (p. ej. ``"[CUENTA1] "`` en multi-cuenta).
+
+    La orden y el cooldown van primero; comisión, Telegram y Excel se
+    completan en segundo plano (``execution.defer``) para que el llamador
+    libere el símbolo de inmediato.  ``signal_ts`` es el instante del
+    disparo (por defecto, ahora).  Devuelve ``True`` si se vendió.
     """
-    from config import DRY_RUN, COOLDOWN_HOURS
+    from config import DRY_RUN, COOLDOWN_HOURS, SELL_RETRY_MINUTES
+    import execution
 
+    signal_ts = signal_ts or time.time()
     qty = rec["quantity"]
     entry_cost = rec.get("entry_cost", 0.0)
     if entry_cost == 0:
         logger.error(f"Venta {symbol} abortada: entry_cost es cero.")
-        return
+        return False
 
-    ok, sell = await safe_market_sell(client, symbol, qty)
+    ok, sell = await safe_market_sell(client, symbol, qty, exit_price, signal_ts)
     if not ok:
         logger.warning(f"Venta {symbol} falló: {sell}")
-        await send_telegram_message(f"⚠️ Venta {symbol} cancelada: {sell}")
-        exclusion_dict[symbol] = True # Evitar reintentos
-        return
+        # pausa los reintentos del motor; /elimina o POST /unblock la levantan
+        exclusion_dict.block(symbol, SELL_RETRY_MINUTES * 60, cooldowns.SELL_FAILED)
+        execution.defer(send_telegram_message(f"⚠️ {tag}Venta {symbol} cancelada: {sell}"))
+        return False
 
-    value = float(sell.get("cummulativeQuoteQty", 0.0))
-    fee = await fee_to_usdt(client, sell.get("fills", []))
+    if not DRY_RUN:
+        exclusion_dict.block(symbol, COOLDOWN_HOURS * 3600, cooldowns.SOLD)
+    execution.defer(_report_sale(client, symbol, sell, entry_cost, exit_price,
+                                 exit_reason, tag))
+    return True
+
+
+async def _report_sale(client, symbol: str, sell: dict, entry_cost: float,
+                       exit_price: float, exit_reason: str, tag: str):
+    """Comisión, PnL, aviso por Telegram y registro en Excel de una venta."""
+    from config import DRY_RUN
+
+    quote = quotes.quote_of(symbol)
+    quote_value = float(sell.get("cummulativeQuoteQty", 0.0))
+    value = quote_value * await quotes.usdt_rate(quote)
+    fee = await fee_to_usdt(client, sell.get("fills", []), quote)
     pnl = value - fee - entry_cost
     pct = (100 * pnl / entry_cost) if entry_cost else 0
     sold_qty = float(sell.get("executedQty", 0.0))
-    display_price = (value / sold_qty) if sold_qty > 0 else exit_price
+    display_price = (quote_value / sold_qty) if sold_qty > 0 else exit_price
 
     texto = (
-        f"🚨 {exit_reason} {symbol} @ {display_price:.4f}\n"
+        f"🚨 {tag}{exit_reason} {symbol} @ {display_price:.4f}\u202F{quote}\n"
         f"🔻 Valor vendido: {value:.2f}\u202FUSDT\n"
         f"🧾 Fee: {fee:.4f}\u202FUSDT\n"
         f"📊 PnL: {pnl:.2f}\u202FUSDT ({pct:.2f}\u202F%)"
@@ -408,15 +558,13 @@ async def process_sell_and_notify(client, symbol: str, rec: dict, exit_price: fl
 
     if not DRY_RUN:
         await log_sale_to_excel(symbol, value, pnl, pct)
-        set_cooldown(exclusion_dict, symbol, COOLDOWN_HOURS)
 
-    logger.info(f"SELL {symbol} pnl={pnl:.4f} pct={pct:.2f} reason={exit_reason}")
+    log_event("sell", account=tag.strip(" []") or "main", symbol=symbol,
+              value=value, fee=fee, pnl=pnl, pct=pct, reason=exit_reason)
 
 
-import pandas as pd, asyncio, logging
 from datetime import datetime
 from pathlib import Path
-from config import logger
 
 async def log_sale_to_excel(symbol: str, value: float,
                             pnl: float, pct: float):
@@ -457,25 +605,3 @@ def trail_stop_delta(rec: dict, value_now: float, delta_usdt: float) -> bool:
         rec["stop_delta"] = new_stop
         return True
     return False
-
-
-from datetime import datetime, timedelta
-
-
-def set_cooldown(exclusion_dict: dict, symbol: str, hours: int):
-    """Guarda en exclusion_dict[symbol] un timestamp ISO-8601 indicando
-    hasta cuándo el símbolo queda bloqueado."""
-    until = datetime.utcnow() + timedelta(hours=hours)
-    exclusion_dict[symbol] = until.isoformat()
-
-
-def cooldown_active(exclusion_dict: dict, symbol: str) -> bool:
-    """Devuelve True si el símbolo sigue bloqueado.
-    Limpia la entrada cuando el cooldown ha expirado."""
-    ts = exclusion_dict.get(symbol)
-    if not ts:
-        return False
-    if datetime.utcnow() > datetime.fromisoformat(ts):
-        exclusion_dict.pop(symbol, None)
-        return False
-    return True
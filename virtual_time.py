@@ -0,0 +1,233 @@
+# virtual_time.py – ejecuta el orquestador real con reloj virtual
+# =====================================================================
+"""
+Todos los bucles (``main.main``, Fase 0‑3, sync, motor, reaper…) duermen con
+``asyncio.sleep`` entre 30 s y 1800 s, así que simular un día de
+orquestación tardaba un día.  Aquí el event-loop corre sobre un
+:class:`VirtualClock`:
+
+* cuando el loop no tiene nada listo y esperaría al siguiente temporizador,
+  el reloj salta hasta él en lugar de dormir (:class:`VirtualTimeLoop`);
+* ``loop.time()`` (TTL de las cachés), ``time.time``, ``time.monotonic``,
+  ``time.perf_counter``, ``datetime.now``/``utcnow`` siguen al reloj, y
+  ``time.sleep`` lo avanza (la latencia grabada de un cassette cuesta
+  tiempo virtual, no real);
+* ``run_in_executor``/``asyncio.to_thread`` (los carriles de ``lanes``) se
+  ejecutan en línea: cada llamada al cliente ocupa el loop durante su
+  ``time.sleep`` virtual, de forma determinista.
+
+Uso, con el tráfico grabado por ``cassette.py`` como cliente falso::
+
+    python virtual_time.py --cassette ciclo.cassette.gz --days 14
+    python virtual_time.py --client simulacion:cliente --days 7 --start 2026-01-05
+
+El runner trabaja en ``--workdir`` (``app.log``, ``events.jsonl``,
+``cooldowns.json`` propios), fuerza ``DRY_RUN``, desactiva Fase 0 por
+websocket, el pool de procesos y el watchdog, y sustituye el bot de Telegram
+por uno que sólo escribe en el log.  Al terminar imprime los carriles
+(``lanes_report``) y el ritmo de la simulación.
+"""
+import argparse
+import asyncio
+import datetime as _dt
+import importlib
+import os
+import selectors
+import sys
+import time as _time
+from typing import Optional
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_REAL_DATETIME = _dt.datetime
+_REAL = {name: getattr(_time, name)
+         for name in ("time", "time_ns", "monotonic", "perf_counter", "sleep")}
+
+
+class VirtualClock:
+    """Reloj que sólo avanza cuando se le pide."""
+
+    def __init__(self, start: Optional[float] = None):
+        self.epoch = _REAL["time"]() if start is None else start
+        self.mono = 1_000_000.0          # lejos de 0: las cachés usan ts=0 como "nunca"
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.epoch += seconds
+            self.mono += seconds
+
+    def time(self) -> float:
+        return self.epoch
+
+    def monotonic(self) -> float:
+        return self.mono
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+# ─────────────────────────────────────────────────────────────
+#  Event-loop
+# ─────────────────────────────────────────────────────────────
+class _VirtualSelector:
+    """Consulta la E/S real sin esperar; si no hay nada, salta el reloj."""
+
+    def __init__(self, selector: selectors.BaseSelector, clock: VirtualClock):
+        self._selector = selector
+        self._clock = clock
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:              # sin temporizadores: sólo E/S real
+            return self._selector.select(None)
+        self._clock.advance(timeout)
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock):
+        super().__init__(_VirtualSelector(selectors.DefaultSelector(), clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+    def run_in_executor(self, executor, func, *args):
+        fut = self.create_future()
+        try:
+            fut.set_result(func(*args))
+        except BaseException as e:      # noqa: BLE001 – se entrega al que espera
+            fut.set_exception(e)
+        return fut
+
+
+def install(clock: VirtualClock):
+    """Hace que el módulo ``time`` siga a ``clock``.
+
+    Hay que llamarlo antes de importar los módulos del bot, que usan
+    ``time.time()``/``time.perf_counter()`` a través del módulo.
+    """
+    _time.time = clock.time
+    _time.time_ns = lambda: int(clock.time() * 1e9)
+    _time.monotonic = clock.monotonic
+    _time.perf_counter = clock.monotonic
+    _time.sleep = clock.sleep
+
+
+def patch_datetime(clock: VirtualClock, root: str = _ROOT):
+    """``datetime.now``/``utcnow`` virtuales en los módulos del bot.
+
+    Sólo se sustituye el nombre ``datetime`` importado en los módulos de
+    ``root``: cambiar ``datetime.datetime`` para todo el proceso rompería
+    pandas y los ``isinstance`` de las librerías.
+    """
+    class VirtualDatetime(_REAL_DATETIME):
+        @classmethod
+        def now(cls, tz=None):
+            return _REAL_DATETIME.fromtimestamp(clock.time(), tz)
+
+        @classmethod
+        def utcnow(cls):
+            return _REAL_DATETIME.utcfromtimestamp(clock.time())
+
+    for mod in list(sys.modules.values()):
+        path = getattr(mod, "__file__", None) or ""
+        if path.startswith(root) and getattr(mod, "datetime", None) is _REAL_DATETIME:
+            mod.datetime = VirtualDatetime
+
+
+def uninstall():
+    for name, fn in _REAL.items():
+        setattr(_time, name, fn)
+
+
+# ─────────────────────────────────────────────────────────────
+#  Runner
+# ─────────────────────────────────────────────────────────────
+class _LogBot:
+    """Bot de Telegram de la simulación: los mensajes van al log."""
+
+    async def send_message(self, chat_id, text, **_):
+        import config
+        config.logger.info(f"[sim-telegram] {text}")
+
+
+def _prepare_env(args):
+    if args.cassette:
+        os.environ["BINANCE_CASSETTE_REPLAY"] = os.path.abspath(args.cassette)
+        os.environ["BINANCE_REPLAY_SPEED"] = "recorded"
+    os.environ["FASE0_ENABLED"] = "0"
+    os.environ["FASE1_PROCESS_WORKERS"] = "0"
+    os.environ["WATCHDOG_ENABLED"] = "0"
+    os.makedirs(args.workdir, exist_ok=True)
+    os.environ.setdefault("CONTROL_API_SOCKET", os.path.join(
+        os.path.abspath(args.workdir), "control.sock"))
+    sys.path.insert(0, _ROOT)
+    os.chdir(args.workdir)
+
+
+def simulate(seconds: float, clock: VirtualClock, client=None) -> float:
+    """Corre ``main.main`` durante ``seconds`` virtuales; devuelve segundos reales."""
+    from logging_setup import setup_logging
+    setup_logging("app.log", "events.jsonl")
+    import config
+    config.DRY_RUN = True
+    config._telegram_bot = _LogBot()
+    if client is not None:
+        config._client = client
+    import main
+    from lanes import lanes_report
+    patch_datetime(clock)
+
+    loop = VirtualTimeLoop(clock)
+    asyncio.set_event_loop(loop)
+    wall = _REAL["perf_counter"]()
+    loop.call_later(seconds, config.SHUTTING_DOWN.set)
+    try:
+        loop.run_until_complete(main.main(telegram=False))
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    finally:
+        loop.close()
+    wall = _REAL["perf_counter"]() - wall
+    config.logger.info(f"[sim] {seconds / 86400:.2f} días en {wall:.1f}s reales")
+    print(lanes_report())
+    return wall
+
+
+def _cli():
+    ap = argparse.ArgumentParser(description="Orquestador con reloj virtual")
+    ap.add_argument("--days", type=float, default=1.0)
+    ap.add_argument("--start", help="fecha inicial ISO (por defecto, ahora)")
+    ap.add_argument("--cassette", help="tráfico grabado con BINANCE_CASSETTE_RECORD")
+    ap.add_argument("--client", help="cliente falso como modulo:atributo")
+    ap.add_argument("--workdir", default="sim_run")
+    args = ap.parse_args()
+    if not (args.cassette or args.client):
+        ap.error("hace falta --cassette o --client")
+
+    start = _REAL_DATETIME.fromisoformat(args.start).timestamp() if args.start else None
+    clock = VirtualClock(start)
+    client = None
+    if args.client:
+        mod, _, attr = args.client.partition(":")
+        sys.path.insert(0, os.getcwd())
+        client = getattr(importlib.import_module(mod), attr or "client")
+        client = client() if callable(client) and not hasattr(client, "get_klines") else client
+    _prepare_env(args)
+    install(clock)
+    try:
+        wall = simulate(args.days * 86400, clock, client)
+    finally:
+        uninstall()
+    print(f"{args.days:g} días simulados en {wall:.1f}s "
+          f"(x{args.days * 86400 / max(wall, 1e-9):,.0f})")
+
+
+if __name__ == "__main__":
+    _cli()